@@ -1,26 +1,324 @@
 import ast
+import io
 import re
+import time
+import tokenize
+from collections.abc import MutableMapping
+
+
+class ArgumentRequest(MutableMapping):
+    """
+    Compact AR that references a shared source buffer by (start, end) offsets.
+    'P' and 'mcall' are sliced from the source when accessed, so all ARs of a
+    file share one copy of the code instead of holding one prefix each.
+    Behaves like the {'P', 'mcall', 'Args'} dict used by the other components.
+    """
+    __slots__ = ('source', 'start', 'end', 'Args', '_mcall', '_extra')
+
+    _CORE_KEYS = ('P', 'mcall', 'Args')
+
+    def __init__(self, source, start, end, args, mcall=None):
+        self.source = source
+        self.start = start
+        self.end = end
+        self.Args = args
+        self._mcall = mcall
+        self._extra = None
+
+    @property
+    def P(self):
+        """Preceding code, materialized from the shared source on access"""
+        return self.source[:self.start]
+
+    @property
+    def mcall(self):
+        if self._mcall is not None:
+            return self._mcall
+        return self.source[self.start:self.end]
+
+    def __getitem__(self, key):
+        if key == 'P':
+            return self.P
+        if key == 'mcall':
+            return self.mcall
+        if key == 'Args':
+            return self.Args
+        if self._extra is not None and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key == 'P':
+            raise TypeError("'P' is a view of the shared source and cannot be assigned")
+        if key == 'mcall':
+            self._mcall = value
+        elif key == 'Args':
+            self.Args = value
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def __delitem__(self, key):
+        if key in self._CORE_KEYS:
+            raise TypeError(f"{key!r} is a core AR field and cannot be deleted")
+        if self._extra is None or key not in self._extra:
+            raise KeyError(key)
+        del self._extra[key]
+
+    def __iter__(self):
+        yield from self._CORE_KEYS
+        if self._extra:
+            yield from self._extra
+
+    def __len__(self):
+        return len(self._CORE_KEYS) + (len(self._extra) if self._extra else 0)
+
+    def __repr__(self):
+        return f"ArgumentRequest(start={self.start}, end={self.end}, mcall={self.mcall!r})"
+
+    def to_dict(self):
+        """Materialize a plain dict, e.g. for JSON serialization"""
+        return dict(self.items())
+
 
 class ARExtractor:
+    # Characters the Java scanner stops at; everything in between is skipped in bulk
+    _JAVA_SPECIAL = re.compile(r'[()\[\]{}<,"\'/]')
+    _JAVA_STRING_BODY = re.compile(r'(?:[^"\\\n]|\\.)*')
+    _JAVA_CHAR_BODY = re.compile(r"(?:[^'\\\n]|\\.)*")
+    _JAVA_TEXT_BLOCK_BODY = re.compile(r'(?:[^"\\]|\\.|"(?!""))*', re.S)
+    _GENERIC_CHARS = frozenset('.,?&[]@ \t\r\n')
+    _GENERIC_LOOKAHEAD = 256
+    _CLOSERS = {')': '(', ']': '[', '}': '{'}
+
     @staticmethod
-    def split_arguments(s):
-        args = []
-        current = []
-        level = 0
-        for c in s.strip():
-            if c == '(':
-                level += 1
-            elif c == ')':
-                level -= 1
-            if c == ',' and level == 0:
-                args.append(''.join(current).strip())
-                current = []
+    def _is_word(c):
+        return c.isalnum() or c in '_$'
+
+    @classmethod
+    def _qualified_name_start(cls, code, paren):
+        """
+        Start of the dotted name (at least one '.') right before paren, or -1.
+        Explicit type arguments before the method name, as in
+        obj.<T>call(u), are part of the name.
+        """
+        i = paren - 1
+        while i >= 0 and code[i].isspace():
+            i -= 1
+        start = -1
+        segments = 0
+        while True:
+            j = i
+            while j >= 0 and cls._is_word(code[j]):
+                j -= 1
+            if j == i:
+                break
+            segments += 1
+            start = j + 1
+            if j >= 0 and code[j] == '>':
+                j = cls._type_arguments_start(code, j)
+            if j >= 0 and code[j] == '.':
+                i = j - 1
+            else:
+                break
+        return start if segments >= 2 else -1
+
+    @classmethod
+    def _type_arguments_start(cls, code, close):
+        """
+        Index of the '.' before a '.<...>' type-argument list closed at close,
+        or -1. Lookbehind is bounded like the generic lookahead.
+        """
+        depth = 0
+        limit = max(-1, close - cls._GENERIC_LOOKAHEAD)
+        for k in range(close, limit, -1):
+            c = code[k]
+            if c == '>':
+                depth += 1
+            elif c == '<':
+                depth -= 1
+                if depth == 0:
+                    k -= 1
+                    while k >= 0 and code[k].isspace():
+                        k -= 1
+                    return k if k >= 0 and code[k] == '.' else -1
+            elif not (cls._is_word(c) or c in cls._GENERIC_CHARS):
+                return -1
+        return -1
+
+    @classmethod
+    def _generic_end(cls, code, pos):
+        """
+        Index of the '>' closing a type-argument list opened at pos, or -1 when
+        the '<' is a comparison/shift operator. Lookahead is bounded so the
+        scan stays linear.
+        """
+        i = pos - 1
+        while i >= 0 and code[i].isspace():
+            i -= 1
+        if i < 0:
+            return -1
+        if code[i] != '.':
+            j = i
+            while j >= 0 and cls._is_word(code[j]):
+                j -= 1
+            # Type names start with an upper-case letter; variables do not
+            if j == i or not code[j + 1].isupper():
+                return -1
+        depth = 0
+        limit = min(len(code), pos + cls._GENERIC_LOOKAHEAD)
+        for k in range(pos, limit):
+            c = code[k]
+            if c == '<':
+                depth += 1
+            elif c == '>':
+                depth -= 1
+                if depth == 0:
+                    return k
+            elif not (cls._is_word(c) or c in cls._GENERIC_CHARS):
+                return -1
+        return -1
+
+    @classmethod
+    def _scan_java(cls, code, every_paren=False):
+        """
+        Single linear pass over Java source that skips string/char literals,
+        text blocks, comments and generic type arguments.
+
+        Returns (calls, root_commas): calls is a list of
+        [start, open_paren, close_paren, commas] for every qualified call,
+        nested ones included, in order of start offset (close_paren is -1 for
+        calls left unbalanced); root_commas are commas outside any bracket.
+        With every_paren, every '(' is reported as a call starting at itself.
+        """
+        calls = []
+        root_commas = []
+        stack = []  # (opening char, index into calls or -1)
+        n = len(code)
+        pos = 0
+        special = cls._JAVA_SPECIAL
+        while True:
+            match = special.search(code, pos)
+            if match is None:
+                break
+            i = match.start()
+            c = code[i]
+            pos = i + 1
+            if c == '"':
+                if code.startswith('""', pos):
+                    pos = cls._JAVA_TEXT_BLOCK_BODY.match(code, pos + 2).end() + 3
+                else:
+                    pos = cls._JAVA_STRING_BODY.match(code, pos).end() + 1
+            elif c == "'":
+                pos = cls._JAVA_CHAR_BODY.match(code, pos).end() + 1
+            elif c == '/':
+                if code.startswith('/', pos):
+                    newline = code.find('\n', pos)
+                    pos = n if newline == -1 else newline + 1
+                elif code.startswith('*', pos):
+                    close = code.find('*/', pos + 1)
+                    pos = n if close == -1 else close + 2
+            elif c == '<':
+                end = cls._generic_end(code, i)
+                if end != -1:
+                    pos = end + 1
+            elif c == ',':
+                if not stack:
+                    root_commas.append(i)
+                else:
+                    opener, call_index = stack[-1]
+                    if call_index != -1:
+                        calls[call_index][3].append(i)
+            elif c in '([{':
+                call_index = -1
+                if c == '(':
+                    start = i if every_paren else cls._qualified_name_start(code, i)
+                    if start != -1:
+                        call_index = len(calls)
+                        calls.append([start, i, -1, []])
+                stack.append((c, call_index))
             else:
-                current.append(c)
-        if current:
-            args.append(''.join(current).strip())
+                opener = cls._CLOSERS[c]
+                # Recover from stray closers by unwinding to the matching opener
+                if any(frame[0] == opener for frame in stack):
+                    while True:
+                        frame_opener, call_index = stack.pop()
+                        if frame_opener == opener:
+                            break
+                    if call_index != -1:
+                        calls[call_index][2] = i
+        return calls, root_commas
+
+    @staticmethod
+    def _split_at(code, start, end, commas):
+        """Split code[start:end] at the given top-level comma offsets"""
+        if not commas:
+            arg = code[start:end].strip()
+            return [arg] if arg else []
+        args = []
+        for comma in commas:
+            args.append(code[start:comma].strip())
+            start = comma + 1
+        args.append(code[start:end].strip())
         return args
 
+    @classmethod
+    def split_arguments(cls, s):
+        """
+        Split an argument list at top-level commas, ignoring commas inside
+        brackets, braces, generic type arguments, lambdas, literals and comments
+        """
+        s = s.strip()
+        _, root_commas = cls._scan_java(s)
+        return cls._split_at(s, 0, len(s), root_commas)
+
+    @staticmethod
+    def _python_call_bounds(code):
+        """
+        (close_paren, top-level commas) of the call whose '(' is code[0], from
+        Python's tokenizer; close_paren is -1 when the call is left open
+        """
+        line_starts = ARExtractor._line_starts(code)
+        depth = 0
+        commas = []
+        try:
+            for token in tokenize.generate_tokens(io.StringIO(code).readline):
+                if token.type != tokenize.OP:
+                    continue
+                offset = line_starts[token.start[0] - 1] + token.start[1]
+                if token.string in ('(', '[', '{'):
+                    depth += 1
+                elif token.string in (')', ']', '}'):
+                    depth -= 1
+                    if depth == 0:
+                        return offset, commas
+                elif token.string == ',' and depth == 1:
+                    commas.append(offset)
+        except (tokenize.TokenError, SyntaxError):  # the call runs to the end of code
+            pass
+        return -1, commas
+
+    @classmethod
+    def call_arguments(cls, code, open_paren, language='java'):
+        """
+        Arguments of the call whose '(' is at code[open_paren], split at its
+        top-level commas by the language's lexer. A call left open, such as an
+        mcall cut at its missing arguments, runs to the end of code.
+
+        Returns:
+            list: The stripped argument strings; empty ones are missing arguments.
+        """
+        call = code[open_paren:]
+        if language == 'java':
+            calls, _ = cls._scan_java(call, every_paren=True)
+            _, _, close, commas = calls[0]
+        elif language == 'python':
+            close, commas = cls._python_call_bounds(call)
+        else:
+            raise ValueError(f"Unsupported language: {language}")
+        return cls._split_at(call, 1, len(call) if close == -1 else close, commas)
+
     @staticmethod
     def is_placeholder(arg):
         arg = arg.strip()
@@ -29,41 +327,50 @@ class ARExtractor:
     @classmethod
     def extract_java_ar(cls, java_code):
         ar_list = []
-        pattern = re.compile(r'(\w+\.\w+)\s*\(')
-        pos = 0
-        while pos < len(java_code):
-            match = pattern.search(java_code, pos)
-            if not match:
-                break
-            method_part = match.group(0)
-            start_method = match.start()
-            pos_call = start_method + len(method_part) - 1
-            paren_count = 1
-            end_pos = pos_call
-            while end_pos < len(java_code) and paren_count > 0:
-                end_pos += 1
-                char = java_code[end_pos] if end_pos < len(java_code) else ''
-                if char == '(':
-                    paren_count += 1
-                elif char == ')':
-                    paren_count -= 1
-            if paren_count != 0:
-                pos = end_pos + 1
+        calls, _ = cls._scan_java(java_code)
+        for start_method, open_paren, close_paren, commas in calls:
+            if close_paren == -1:
                 continue
-            arg_list_str = java_code[pos_call + 1:end_pos]
-            args = cls.split_arguments(arg_list_str)
+            args = cls._split_at(java_code, open_paren + 1, close_paren, commas)
             args_with_pos = []
             for arg_pos, arg in enumerate(args):
                 if cls.is_placeholder(arg):
                     args_with_pos.append((None, arg_pos))
                 else:
-                    args_with_pos.append((arg.strip(), arg_pos))
-            P = java_code[:start_method]
-            mcall = java_code[start_method:end_pos + 1]
-            ar_list.append({'P': P, 'mcall': mcall, 'Args': args_with_pos})
-            pos = end_pos + 1
+                    args_with_pos.append((arg, arg_pos))
+            ar_list.append(ArgumentRequest(java_code, start_method, close_paren + 1, args_with_pos))
         return ar_list
 
+    @staticmethod
+    def _line_starts(code):
+        """Offsets at which each line of code starts (index 0 is line 1)"""
+        starts = [0]
+        pos = code.find('\n')
+        while pos != -1:
+            starts.append(pos + 1)
+            pos = code.find('\n', pos + 1)
+        return starts
+
+    @staticmethod
+    def _to_offset(code, line_starts, lineno, col_offset):
+        """Map an ast (lineno, col_offset) position to a character offset in code"""
+        line_start = line_starts[lineno - 1]
+        if code[line_start:line_start + col_offset].isascii():
+            return line_start + col_offset
+        # ast column offsets count UTF-8 bytes, not characters
+        line_end = line_starts[lineno] - 1 if lineno < len(line_starts) else len(code)
+        prefix = code[line_start:line_end].encode('utf-8')[:col_offset]
+        return line_start + len(prefix.decode('utf-8', errors='ignore'))
+
+    @staticmethod
+    def _iter_calls(tree):
+        """Collect ast.Call nodes in a single pass, ordered by source position"""
+        calls = [node for node in ast.walk(tree) if isinstance(node, ast.Call)]
+        # ast.walk is breadth-first, so of calls starting at the same position
+        # (e.g. f(x)(y)) the outer one comes first and the stable sort keeps it there
+        calls.sort(key=lambda n: (n.lineno, n.col_offset))
+        return calls
+
     @classmethod
     def extract_python_ar(cls, python_code):
         try:
@@ -71,26 +378,22 @@ class ARExtractor:
         except SyntaxError:
             return []
         ar_list = []
-        lines = python_code.split('\n')
-        for node in ast.walk(tree):
-            if isinstance(node, ast.Call):
-                lineno = getattr(node, 'lineno', 1) - 1
-                col_offset = getattr(node, 'col_offset', 0)
-                line_start = sum(len(line) + 1 for line in lines[:lineno]) if lineno > 0 else 0
-                start_index = line_start + col_offset
-                P = python_code[:start_index]
+        line_starts = cls._line_starts(python_code)
+        for node in cls._iter_calls(tree):
+            start_index = cls._to_offset(python_code, line_starts, node.lineno, node.col_offset)
+            end_index = cls._to_offset(python_code, line_starts, node.end_lineno, node.end_col_offset)
+            try:
+                mcall = ast.unparse(node)
+            except AttributeError:
+                continue
+            args = []
+            for arg_pos, arg_node in enumerate(node.args):
                 try:
-                    mcall = ast.unparse(node)
+                    arg_code = ast.unparse(arg_node)
                 except AttributeError:
-                    continue
-                args = []
-                for arg_pos, arg_node in enumerate(node.args):
-                    try:
-                        arg_code = ast.unparse(arg_node)
-                    except AttributeError:
-                        arg_code = ""
-                    args.append((arg_code, arg_pos))
-                ar_list.append({'P': P, 'mcall': mcall, 'Args': args})
+                    arg_code = ""
+                args.append((arg_code, arg_pos))
+            ar_list.append(ArgumentRequest(python_code, start_index, end_index, args, mcall=mcall))
         return ar_list
 
     @classmethod
@@ -102,6 +405,87 @@ class ARExtractor:
         else:
             raise ValueError(f"Unsupported language: {language}")
 
+def _extract_python_ar_quadratic(python_code):
+    """
+    The previous extract_python_ar, kept as the benchmark baseline: every
+    call's offset sums the lengths of all preceding lines, and calls come in
+    ast.walk order. Each call's preceding code is still copied, but not kept,
+    so large files fit in memory.
+    """
+    try:
+        tree = ast.parse(python_code)
+    except SyntaxError:
+        return []
+    ar_list = []
+    lines = python_code.split('\n')
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Call):
+            lineno = getattr(node, 'lineno', 1) - 1
+            col_offset = getattr(node, 'col_offset', 0)
+            line_start = sum(len(line) + 1 for line in lines[:lineno]) if lineno > 0 else 0
+            start_index = line_start + col_offset
+            len(python_code[:start_index])
+            try:
+                mcall = ast.unparse(node)
+            except AttributeError:
+                continue
+            args = []
+            for arg_pos, arg_node in enumerate(node.args):
+                try:
+                    arg_code = ast.unparse(arg_node)
+                except AttributeError:
+                    arg_code = ""
+                args.append((arg_code, arg_pos))
+            ar_list.append((start_index, mcall, args))
+    return ar_list
+
+
+def _synthetic_python_module(n_lines):
+    """Python source of about n_lines lines with one or two calls per line, like a long PY150 module"""
+    lines = []
+    for i in range(n_lines // 4):
+        lines.append(f"def handler_{i}(request, value):")
+        lines.append(f"    record = store.fetch(request.key, {i})")
+        lines.append(f"    logger.debug('handled %s', format_value(value, width={i % 80}))")
+        lines.append("    return record")
+    return "\n".join(lines) + "\n"
+
+
+def benchmark_python_extraction(sizes=(1000, 4000, 16000, 32000), repeat=1):
+    """
+    extract_python_ar against the quadratic baseline on synthetic modules
+    of increasing length. Both must return the same ARs (in the same order
+    once sorted by offset); the speedup grows with file length.
+    """
+    rows = []
+    print(f"{'lines':>6} {'calls':>6} {'quadratic s':>12} {'linear s':>9} {'speedup':>8}")
+    for n_lines in sizes:
+        code = _synthetic_python_module(n_lines)
+        timings = {}
+        for name, extract in (("quadratic", _extract_python_ar_quadratic),
+                              ("linear", ARExtractor.extract_python_ar)):
+            best = None
+            for _ in range(repeat):
+                start = time.perf_counter()
+                ars = extract(code)
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            timings[name] = (best, ars)
+        baseline = sorted(timings["quadratic"][1], key=lambda ar: ar[0])
+        linear = [(ar.start, ar['mcall'], ar['Args']) for ar in timings["linear"][1]]
+        if baseline != linear:
+            raise AssertionError(f"extract_python_ar and the baseline disagree at {n_lines} lines")
+        row = {
+            "lines": n_lines,
+            "calls": len(linear),
+            "quadratic_s": timings["quadratic"][0],
+            "linear_s": timings["linear"][0],
+        }
+        rows.append(row)
+        print(f"{n_lines:>6} {row['calls']:>6} {row['quadratic_s']:>12.3f} {row['linear_s']:>9.3f} "
+              f"{row['quadratic_s'] / max(row['linear_s'], 1e-9):>7.1f}x")
+    return rows
+
 def main():
     java_example = """
     public class ImageEditor {
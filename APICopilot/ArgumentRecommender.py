@@ -1,18 +1,52 @@
+import asyncio
+import hashlib
+import json
 import re
 import openai
-from openai import OpenAI
+
+from RequestEngine import ChatRequestEngine
+from ResponseCache import ResponseCache
 
 class ArgumentRecommender:
-    def __init__(self, api_key: str, expected_types: list):
+    def __init__(self, api_key: str, expected_types: list = None, model: str = "gpt-4o",
+                 temperature: float = 0.2, max_tokens: int = 256, base_url: str = None,
+                 max_concurrency: int = 16, requests_per_second: float = None, max_retries: int = 6,
+                 timeout: float = 120.0, cache=None, replay: bool = False, backend=None):
         """
         Initialize the recommender with OpenAI API key and expected argument types
         
         Args:
             api_key: OpenAI API key
             expected_types: List of expected types for each argument position
-                             e.g. [str, int] for (String, int) parameters
+                             e.g. [str, int] for (String, int) parameters;
+                             None skips type validation (signature unknown)
+            model: Chat model asked for the completed call (the backend's model when backend is given)
+            temperature: Sampling temperature
+            max_tokens: Completion length limit
+            base_url: OpenAI-compatible endpoint (None = api.openai.com)
+            max_concurrency: Requests in flight at once, across all recommend_many calls and threads
+            requests_per_second: Token-bucket rate limit, likewise shared (None = unlimited)
+            max_retries: Retries per prompt on 429/5xx and connection errors
+            timeout: Per-request timeout in seconds
+            cache: Optional ResponseCache (or its SQLite path) of raw completions
+            replay: Serve every prompt from the cache, opened read-only, and never
+                    call the API; a prompt that is not cached raises KeyError
+            backend: LLMBackend generating the completions, e.g. a HuggingFaceBackend or
+                     StubBackend; None sends them to the OpenAI-compatible endpoint above
         """
-        self.client = OpenAI(api_key=api_key)
+        if replay and cache is None:
+            raise ValueError("Replay mode needs a response cache")
+        if isinstance(cache, str):
+            cache = ResponseCache(cache, readonly=replay)
+        self.cache = cache
+        self.replay = replay
+        if backend is None:
+            backend = ChatRequestEngine(api_key, model, base_url, max_concurrency, requests_per_second,
+                                        max_retries, timeout=timeout)
+        self.backend = backend
+        self.model = backend.model
+        self.temperature = temperature
+        self.max_tokens = max_tokens
         self.expected_types = expected_types
         self.type_checks = {
             str: self._is_string,
@@ -50,6 +84,8 @@ class ArgumentRecommender:
 
     def _post_process(self, generated_args: list) -> list:
         """Validate and fix generated arguments based on expected types"""
+        if self.expected_types is None:
+            return generated_args
         processed_args = []
         
         for expected_type, arg in zip(self.expected_types, generated_args):
@@ -95,6 +131,32 @@ class ArgumentRecommender:
             
         return args
 
+    def _process(self, llm_output: str) -> list:
+        """Parse and validate arguments from an LLM completion"""
+        raw_args = self._parse_arguments(llm_output)
+        return self._post_process(raw_args)
+
+    def cache_key(self, prompt: str) -> str:
+        return ResponseCache.key(self.model, self.temperature, self.max_tokens, prompt)
+
+    def _cached_outputs(self, prompts: list) -> dict:
+        """{prompt: cached completion} for the distinct prompts found in the cache"""
+        if self.cache is None:
+            return {}
+        prompts = list(dict.fromkeys(prompts))
+        cached = self.cache.get_many([self.cache_key(prompt) for prompt in prompts])
+        return {prompt: output for prompt, output in zip(prompts, cached) if output is not None}
+
+    def _store_outputs(self, outputs: dict):
+        """Cache the successful completions of {prompt: completion or exception}"""
+        if self.cache is not None and not self.replay:
+            self.cache.put_many([(self.cache_key(prompt), output) for prompt, output in outputs.items()
+                                 if not isinstance(output, BaseException)])
+
+    @staticmethod
+    def _replay_miss(prompt: str) -> KeyError:
+        return KeyError(f"No cached response in replay mode for prompt: {prompt[:80]!r}")
+
     def recommend_arguments(self, prompt: str) -> list:
         """
         Generate and validate arguments using LLM
@@ -102,23 +164,130 @@ class ArgumentRecommender:
         Returns:
             List of processed arguments with type validation
         """
+        cached = self._cached_outputs([prompt])
+        if prompt in cached:
+            return self._process(cached[prompt])
+        if self.replay:
+            raise self._replay_miss(prompt)
+
         # Get LLM completion
-        response = self.client.chat.completions.create(
-            model="gpt-4o",
-            messages=[{
-                "role": "user",
-                "content": prompt
-            }],
-            temperature=0.2,
-            max_tokens=256
-        )
-        
+        llm_output = self.backend.complete(prompt, self.temperature, self.max_tokens)
+        self._store_outputs({prompt: llm_output})
+
         # Parse and validate arguments
-        llm_output = response.choices[0].message.content
-        raw_args = self._parse_arguments(llm_output)
-        processed_args = self._post_process(raw_args)
-        
-        return processed_args
+        return self._process(llm_output)
+
+    def _collect(self, prompts: list, outputs: list, return_exceptions: bool) -> list:
+        results = []
+        for prompt, output in zip(prompts, outputs):
+            if isinstance(output, BaseException):
+                if not return_exceptions:
+                    raise output
+                results.append(output)
+            else:
+                results.append(self._process(output))
+        return results
+
+    async def arecommend_many(self, prompts: list, return_exceptions: bool = False) -> list:
+        """
+        Async recommend_arguments for many prompts, handed to the backend in
+        one call: the HTTP backend sends them concurrently with bounded
+        concurrency, rate limiting and jittered retries (identical prompts
+        once, also across concurrent calls), a local model generates them in
+        batches. Cached prompts are not requested at all.
+
+        Returns:
+            One list of processed arguments per prompt, in input order. A prompt
+            whose request still fails after all retries raises its error, or
+            with return_exceptions=True gets the exception in its place.
+        """
+        prompts = list(prompts)
+        outputs = self._cached_outputs(prompts)
+        pending = [prompt for prompt in dict.fromkeys(prompts) if prompt not in outputs]
+        if self.replay:
+            outputs.update((prompt, self._replay_miss(prompt)) for prompt in pending)
+        elif pending:
+            fresh = dict(zip(pending, await self.backend.acomplete_many(pending, self.temperature, self.max_tokens)))
+            self._store_outputs(fresh)
+            outputs.update(fresh)
+        return self._collect(prompts, [outputs[prompt] for prompt in prompts], return_exceptions)
+
+    def recommend_many(self, prompts, return_exceptions: bool = False) -> list:
+        """
+        Blocking arecommend_many; over HTTP, throughput grows with max_concurrency
+        rather than per-request latency. Inside a running event loop, await
+        arecommend_many instead.
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.arecommend_many(prompts, return_exceptions))
+        raise RuntimeError("recommend_many cannot be called from a running event loop; "
+                           "await arecommend_many instead")
+
+    # ---- Offline batch files (OpenAI Batch API format) ----
+
+    @staticmethod
+    def request_id(prompt: str) -> str:
+        """custom_id of a prompt in batch files: identical prompts share one request"""
+        return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+    def write_batch_requests(self, prompts, path: str) -> int:
+        """
+        Write one chat completion request per distinct prompt as JSONL, ready
+        to upload as an OpenAI batch input file (or replay against any
+        compatible endpoint). Prompts already in the cache are skipped.
+        Returns the number of requests written.
+        """
+        prompts = list(prompts)
+        cached = self._cached_outputs(prompts)
+        written = set()
+        with open(path, "w", encoding="utf-8") as f:
+            for prompt in prompts:
+                custom_id = self.request_id(prompt)
+                if custom_id in written or prompt in cached:
+                    continue
+                written.add(custom_id)
+                f.write(json.dumps({
+                    "custom_id": custom_id,
+                    "method": "POST",
+                    "url": "/v1/chat/completions",
+                    "body": {
+                        "model": self.model,
+                        "messages": [{"role": "user", "content": prompt}],
+                        "temperature": self.temperature,
+                        "max_tokens": self.max_tokens,
+                    },
+                }, ensure_ascii=False) + "\n")
+        return len(written)
+
+    def read_batch_responses(self, path: str, prompts, return_exceptions: bool = False) -> list:
+        """
+        Recommendations for prompts from a batch output JSONL file (one
+        {"custom_id", "response": {"status_code", "body"}, "error"} object per
+        line), falling back to the cache for prompts that were not in the
+        batch. Successful responses are added to the cache. A prompt with no
+        successful response raises ValueError, or with return_exceptions=True
+        gets the ValueError in its place.
+        """
+        outputs = {}
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                response = record.get("response") or {}
+                if record.get("error") or response.get("status_code") != 200:
+                    error = record.get("error") or response.get("body", {}).get("error")
+                    outputs[record["custom_id"]] = ValueError(f"Batch request failed: {error}")
+                else:
+                    outputs[record["custom_id"]] = response["body"]["choices"][0]["message"]["content"] or ""
+        prompts = list(prompts)
+        answered = {prompt: outputs[self.request_id(prompt)] for prompt in prompts if self.request_id(prompt) in outputs}
+        self._store_outputs(answered)
+        answered = {**self._cached_outputs([prompt for prompt in prompts if prompt not in answered]), **answered}
+        missing = ValueError("No response in batch output")
+        return self._collect(prompts, [answered.get(prompt, missing) for prompt in prompts], return_exceptions)
 
 # Example usage
 if __name__ == "__main__":
@@ -162,5 +331,12 @@ Existing arguments: [(None, 1), (None, 2)]
     recommended_args = recommender.recommend_arguments(EXAMPLE_PROMPT)
     
     print("Recommended arguments:", recommended_args)
+
+    # Many prompts at once: concurrent requests, duplicates sent once
+    print("Batch:", recommender.recommend_many([EXAMPLE_PROMPT] * 3))
+
+    # Offline: write a batch input file, run it through the Batch API, then ingest the output
+    recommender.write_batch_requests([EXAMPLE_PROMPT], "batch_requests.jsonl")
+    # recommender.read_batch_responses("batch_responses.jsonl", [EXAMPLE_PROMPT])
     # Example output for invalid LLM suggestion ["admin", "high"]:
     # ["admin", "0"]
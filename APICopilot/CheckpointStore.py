@@ -0,0 +1,132 @@
+import hashlib
+import json
+import os
+
+
+class CheckpointStore:
+    """
+    Append-only, per-AR log of pipeline stage outputs.
+
+    Every record is one JSON line {"ar", "stage", "input", "output"}: the AR
+    id, the stage name, a fingerprint of everything the stage output depends
+    on, and the output itself. Records are never rewritten; a newer record for
+    the same (AR, stage) supersedes older ones. Only an in-memory index of
+    (AR, stage) -> (input fingerprint, file offset) is kept, and outputs are
+    read back from disk on demand.
+
+    A crash can at worst leave a partial last line, which is dropped (and the
+    file truncated to the last complete record) when the store is reopened.
+    """
+
+    def __init__(self, directory, sync_every=100):
+        """
+        Args:
+            directory (str): Directory holding checkpoints.jsonl.
+            sync_every (int): fsync after this many records; every record is
+                flushed to the OS immediately, so only a machine crash can lose
+                the unsynced tail.
+        """
+        self.directory = directory
+        self.sync_every = sync_every
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, "checkpoints.jsonl")
+        self._index = {}
+        self._unsynced = 0
+        self.hits = 0
+        self.misses = 0
+        self._load()
+        self._file = open(self.path, "ab")
+        self._reader = open(self.path, "rb")
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        good = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                self._index[(record["ar"], record["stage"])] = (record["input"], good)
+                good += len(line)
+        if good != os.path.getsize(self.path):
+            with open(self.path, "r+b") as f:
+                f.truncate(good)
+
+    @staticmethod
+    def fingerprint(*parts):
+        """Stable hash of JSON-serializable parts (tuples hash like lists)"""
+        payload = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    def __len__(self):
+        return len(self._index)
+
+    def _read(self, offset):
+        self._file.flush()
+        self._reader.seek(offset)
+        return json.loads(self._reader.readline())["output"]
+
+    def get(self, ar_id, stage, input_fingerprint):
+        """Stored output of stage for the AR if it was computed from the same inputs, else None"""
+        entry = self._index.get((ar_id, stage))
+        if entry is None or entry[0] != input_fingerprint:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return self._read(entry[1])
+
+    def latest(self, ar_id, stage):
+        """Most recent output of stage for the AR regardless of its inputs, or None"""
+        entry = self._index.get((ar_id, stage))
+        return None if entry is None else self._read(entry[1])
+
+    def has(self, ar_id, stage, input_fingerprint):
+        entry = self._index.get((ar_id, stage))
+        return entry is not None and entry[0] == input_fingerprint
+
+    def put(self, ar_id, stage, input_fingerprint, output):
+        line = json.dumps({"ar": ar_id, "stage": stage, "input": input_fingerprint, "output": output},
+                          ensure_ascii=False).encode("utf-8") + b"\n"
+        offset = self._file.tell()
+        self._file.write(line)
+        self._file.flush()
+        self._unsynced += 1
+        if self._unsynced >= self.sync_every:
+            self.sync()
+        self._index[(ar_id, stage)] = (input_fingerprint, offset)
+
+    def sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "records": len(self._index),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+    def close(self):
+        if not self._file.closed:
+            self.sync()
+            self._file.close()
+            self._reader.close()
+
+
+# Example usage
+if __name__ == "__main__":
+    store = CheckpointStore("checkpoints")
+    ar_id = CheckpointStore.fingerprint("Image img = new Image(\"test.png\");", "t.resize(img, 300, 200)")
+    inputs = CheckpointStore.fingerprint(ar_id, "gpt-4o", 1)
+    if store.get(ar_id, "triples", inputs) is None:
+        store.put(ar_id, "triples", inputs, [["img", "typeOf", "Image"]])
+    print("Triples:", store.get(ar_id, "triples", inputs))
+    print("Stats:", store.stats())
+    store.close()
@@ -0,0 +1,214 @@
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from ARExtractor import ARExtractor
+
+SOURCE_EXTENSIONS = {
+    'java': ('.java',),
+    'python': ('.py',),
+}
+
+
+def find_source_files(root_dir, language):
+    """Recursively find all source files of the given language, in a stable order"""
+    extensions = SOURCE_EXTENSIONS[language]
+    source_files = []
+    for root, dirs, files in os.walk(root_dir):
+        dirs.sort()
+        for file in sorted(files):
+            if file.endswith(extensions):
+                source_files.append(os.path.join(root, file))
+    return source_files
+
+
+def extract_file(path, language, include_context=False):
+    """
+    Extract the ARs of a single file as JSON-ready records.
+    Runs in a worker process; errors are returned instead of raised so that
+    one unreadable or malformed file cannot take down the whole run.
+
+    Returns:
+        (path, records, error) where error is None on success
+    """
+    try:
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            code = f.read()
+        records = []
+        for index, ar in enumerate(ARExtractor.extract_ar(code, language)):
+            record = {
+                'file': path,
+                'index': index,
+                'start': ar.start,
+                'end': ar.end,
+                'mcall': ar.mcall,
+                'Args': ar.Args,
+            }
+            if include_context:
+                record['P'] = ar.P
+            records.append(record)
+        return path, records, None
+    except Exception as e:
+        return path, [], f"{type(e).__name__}: {e}"
+
+
+class JsonlShardWriter:
+    """Stream records into numbered JSONL shards of at most shard_size records"""
+    extension = 'jsonl'
+
+    def __init__(self, output_dir, shard_size=100000, prefix='ars'):
+        self.output_dir = output_dir
+        self.shard_size = shard_size
+        self.prefix = prefix
+        self.shards = []
+        self._count = 0
+        self._file = None
+        os.makedirs(output_dir, exist_ok=True)
+
+    def _shard_path(self):
+        return os.path.join(self.output_dir, f"{self.prefix}-{len(self.shards):05d}.{self.extension}")
+
+    def write(self, record):
+        if self._file is None:
+            path = self._shard_path()
+            self.shards.append(path)
+            self._file = open(path, 'w', encoding='utf-8')
+        self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self._count += 1
+        if self._count >= self.shard_size:
+            self._close_shard()
+
+    def _close_shard(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._count = 0
+
+    def close(self):
+        self._close_shard()
+
+
+class ParquetShardWriter(JsonlShardWriter):
+    """
+    Buffer records and write one Parquet file per shard (requires pyarrow).
+    Args are stored as a JSON string column since they mix None and str values.
+    """
+    extension = 'parquet'
+
+    def __init__(self, output_dir, shard_size=100000, prefix='ars'):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ImportError("Parquet output requires pyarrow: pip install pyarrow")
+        self._pa = pyarrow
+        self._pq = pyarrow.parquet
+        super().__init__(output_dir, shard_size, prefix)
+        self._buffer = []
+
+    def write(self, record):
+        record = dict(record, Args=json.dumps(record['Args'], ensure_ascii=False))
+        self._buffer.append(record)
+        if len(self._buffer) >= self.shard_size:
+            self._close_shard()
+
+    def _close_shard(self):
+        if self._buffer:
+            path = self._shard_path()
+            self.shards.append(path)
+            self._pq.write_table(self._pa.Table.from_pylist(self._buffer), path)
+            self._buffer = []
+
+
+SHARD_WRITERS = {
+    'jsonl': JsonlShardWriter,
+    'parquet': ParquetShardWriter,
+}
+
+
+class CorpusExtractor:
+    def __init__(self, language, output_dir, workers=None, shard_size=100000,
+                 output_format='jsonl', include_context=False, chunksize=16):
+        """
+        Corpus-wide AR extraction fanned out over a process pool.
+
+        Args:
+            language (str): 'java' or 'python'.
+            output_dir (str): Directory receiving the AR shards and errors.jsonl.
+            workers (int): Worker processes (defaults to all cores).
+            shard_size (int): Maximum number of ARs per shard.
+            output_format (str): 'jsonl' or 'parquet'.
+            include_context (bool): Also store the preceding code P per AR. Off by
+                default: P is file[:start], and storing it per AR is quadratic.
+            chunksize (int): Files handed to a worker at a time.
+        """
+        if language not in SOURCE_EXTENSIONS:
+            raise ValueError(f"Unsupported language: {language}")
+        if output_format not in SHARD_WRITERS:
+            raise ValueError(f"Unsupported output format: {output_format}")
+        self.language = language
+        self.output_dir = output_dir
+        self.workers = workers or os.cpu_count()
+        self.shard_size = shard_size
+        self.output_format = output_format
+        self.include_context = include_context
+        self.chunksize = chunksize
+
+    def extract(self, paths):
+        """
+        Extract ARs from the given files and stream them into shards.
+
+        Returns:
+            Summary dict with file, AR and error counts plus the shard paths
+        """
+        writer = SHARD_WRITERS[self.output_format](self.output_dir, self.shard_size)
+        worker = partial(extract_file, language=self.language, include_context=self.include_context)
+        summary = {'files': 0, 'ars': 0, 'errors': 0}
+        errors_path = os.path.join(self.output_dir, 'errors.jsonl')
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers) as executor, \
+                    open(errors_path, 'w', encoding='utf-8') as errors_file:
+                for path, records, error in executor.map(worker, paths, chunksize=self.chunksize):
+                    summary['files'] += 1
+                    if error is not None:
+                        summary['errors'] += 1
+                        errors_file.write(json.dumps({'file': path, 'error': error}) + '\n')
+                        continue
+                    for record in records:
+                        writer.write(record)
+                    summary['ars'] += len(records)
+        finally:
+            writer.close()
+        summary['shards'] = writer.shards
+        return summary
+
+    def extract_directory(self, root_dir):
+        """Extract ARs from every source file under root_dir"""
+        return self.extract(find_source_files(root_dir, self.language))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract ARs from a source corpus in parallel")
+    parser.add_argument("--root_dir", required=True, type=str,
+                        help="Root directory of the corpus, e.g. the Eclipse 4.17 sources")
+    parser.add_argument("--language", default="java", choices=sorted(SOURCE_EXTENSIONS))
+    parser.add_argument("--output_dir", default="ars", type=str)
+    parser.add_argument("--workers", default=None, type=int)
+    parser.add_argument("--shard_size", default=100000, type=int)
+    parser.add_argument("--format", default="jsonl", choices=sorted(SHARD_WRITERS))
+    parser.add_argument("--include_context", action="store_true",
+                        help="Store the preceding code P with every AR")
+    args = parser.parse_args()
+
+    extractor = CorpusExtractor(args.language, args.output_dir, workers=args.workers,
+                                shard_size=args.shard_size, output_format=args.format,
+                                include_context=args.include_context)
+    summary = extractor.extract_directory(args.root_dir)
+    print(f"Processed {summary['files']} files: {summary['ars']} ARs in "
+          f"{len(summary['shards'])} shards, {summary['errors']} files failed.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import torch
+from transformers import AutoTokenizer, AutoModel
+
+
+class EmbeddingService:
+    _shared = {}
+
+    def __init__(self, model_name="codellama/CodeLlama-7b-hf", batch_size=8,
+                 cache_size=100000, cache_dir=None):
+        """
+        Load the embedding model once and serve mean-pooled embeddings in batches.
+
+        Args:
+            model_name: Hugging Face model used for the embeddings
+            batch_size: Texts per forward pass
+            cache_size: Number of embeddings kept in the in-memory LRU cache
+            cache_dir: Optional directory persisting embeddings as .npy files
+        """
+        self.model_name = model_name
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+        # Right padding keeps the positions of real tokens identical to an unpadded pass
+        self.tokenizer.padding_side = "right"
+        self.model = AutoModel.from_pretrained(model_name)
+        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        self.model.to(self.device)
+        self.model.eval()
+        self.batch_size = batch_size
+        self.cache_size = cache_size
+        self.cache_dir = cache_dir
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+        self._cache = OrderedDict()
+        # Pipeline stages may share the service across threads
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def shared(cls, model_name="codellama/CodeLlama-7b-hf", **kwargs):
+        """Return the process-wide service for model_name, loading the model on first use"""
+        if model_name not in cls._shared:
+            cls._shared[model_name] = cls(model_name, **kwargs)
+        return cls._shared[model_name]
+
+    @property
+    def dimension(self):
+        return self.model.config.hidden_size
+
+    @staticmethod
+    def text_key(text, max_length):
+        """Cache key: hash of the text and the truncation length used to embed it"""
+        return hashlib.sha1(f"{max_length}\0{text}".encode("utf-8")).hexdigest()
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.npy")
+
+    def _remember(self, key, embedding):
+        self._cache[key] = embedding
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _lookup(self, key):
+        embedding = self._cache.get(key)
+        if embedding is not None:
+            self._cache.move_to_end(key)
+            return embedding
+        if self.cache_dir:
+            path = self._disk_path(key)
+            if os.path.exists(path):
+                embedding = np.load(path)
+                self._remember(key, embedding)
+                return embedding
+        return None
+
+    def _store(self, key, embedding):
+        self._remember(key, embedding)
+        if self.cache_dir:
+            path = self._disk_path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            np.save(path, embedding)
+
+    def _forward(self, texts, max_length):
+        """
+        Embed texts with length-bucketed batches: texts are sorted by token
+        count so each batch pads to a similar length. Returns input order.
+        """
+        input_ids = self.tokenizer(texts, truncation=True, max_length=max_length)["input_ids"]
+        order = sorted(range(len(texts)), key=lambda i: len(input_ids[i]))
+        embeddings = [None] * len(texts)
+        for begin in range(0, len(order), self.batch_size):
+            batch = order[begin:begin + self.batch_size]
+            inputs = self.tokenizer.pad({"input_ids": [input_ids[i] for i in batch]},
+                                        return_tensors="pt").to(self.device)
+            with torch.no_grad():
+                hidden = self.model(**inputs).last_hidden_state
+            # Mean over real tokens only, matching an unpadded forward pass
+            mask = inputs["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+            pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1)
+            for i, embedding in zip(batch, pooled.float().cpu().numpy()):
+                embeddings[i] = embedding
+        return embeddings
+
+    def embed_many(self, texts, max_length=512):
+        """
+        Embed a list of texts, serving repeated and previously seen texts from cache.
+
+        Returns:
+            float32 array of shape (len(texts), dimension)
+        """
+        with self._lock:
+            return self._embed_many(texts, max_length)
+
+    def _embed_many(self, texts, max_length):
+        results = [None] * len(texts)
+        pending = OrderedDict()  # cache key -> positions of texts still to embed
+        for i, text in enumerate(texts):
+            key = self.text_key(text, max_length)
+            embedding = self._lookup(key)
+            if embedding is not None:
+                self.hits += 1
+                results[i] = embedding
+            else:
+                self.misses += 1
+                pending.setdefault(key, []).append(i)
+
+        if pending:
+            keys = list(pending)
+            unique_texts = [texts[pending[key][0]] for key in keys]
+            for key, embedding in zip(keys, self._forward(unique_texts, max_length)):
+                self._store(key, embedding)
+                for i in pending[key]:
+                    results[i] = embedding
+
+        if not results:
+            return np.empty((0, self.dimension), dtype=np.float32)
+        return np.stack(results).astype(np.float32, copy=False)
+
+    def embed(self, text, max_length=512):
+        """Embed a single text"""
+        return self.embed_many([text], max_length)[0]
+
+    def cache_info(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "size": len(self._cache),
+        }
+
+
+class HashingEmbeddingService:
+    """
+    Deterministic, model-free stand-in for EmbeddingService: hashed character
+    trigram counts. Similar strings get similar vectors, which is enough to
+    exercise retrieval and graph matching in benchmarks without loading a model.
+    """
+
+    def __init__(self, dimension=256):
+        self.dimension = dimension
+        self.model_name = f"hashing-trigram-{dimension}"
+
+    def embed_many(self, texts, max_length=512):
+        embeddings = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for i, text in enumerate(texts):
+            text = f"  {text[:max_length * 4]} "
+            for j in range(len(text) - 2):
+                digest = hashlib.blake2b(text[j:j + 3].encode("utf-8"), digest_size=4).digest()
+                embeddings[i, int.from_bytes(digest, "little") % self.dimension] += 1.0
+        return embeddings
+
+    def embed(self, text, max_length=512):
+        return self.embed_many([text], max_length)[0]
+
+
+# Example usage
+if __name__ == "__main__":
+    service = EmbeddingService.shared()
+    embeddings = service.embed_many([
+        'Image img = new Image("test.png");',
+        "t.resize(img, 300, 200)",
+        'Image img = new Image("test.png");',
+    ])
+    print("Embeddings shape:", embeddings.shape)
+    print("Cache:", service.cache_info())
@@ -0,0 +1,123 @@
+import json
+import os
+
+import numpy as np
+
+
+class EmbeddingStore:
+    """
+    Append-only on-disk embedding matrix with a content-hash manifest.
+
+    Layout of the store directory:
+        meta.json        dimension and model name
+        embeddings.f32   raw float32 rows, memory-mapped on read
+        manifest.jsonl   one {"hash", "id"} line per row, in row order
+
+    Rows are written before their manifest lines, so a crash mid-append
+    leaves at most unreferenced trailing bytes that are ignored on load.
+    """
+
+    def __init__(self, directory, model_name=None):
+        self.directory = directory
+        self.model_name = model_name
+        self.dimension = None
+        self.hashes = []
+        self.ids = []
+        self._rows = {}
+        self._vectors = None
+        os.makedirs(directory, exist_ok=True)
+        self._data_path = os.path.join(directory, "embeddings.f32")
+        self._manifest_path = os.path.join(directory, "manifest.jsonl")
+        self._meta_path = os.path.join(directory, "meta.json")
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self._meta_path):
+            return
+        with open(self._meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if self.model_name is not None and meta.get("model_name") not in (None, self.model_name):
+            raise ValueError(f"Embedding store {self.directory} was built with {meta['model_name']}, "
+                             f"not {self.model_name}")
+        self.model_name = meta.get("model_name", self.model_name)
+        self.dimension = meta["dimension"]
+        if os.path.exists(self._manifest_path):
+            with open(self._manifest_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._rows.setdefault(entry["hash"], len(self.hashes))
+                        self.hashes.append(entry["hash"])
+                        self.ids.append(entry.get("id"))
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def __contains__(self, content_hash):
+        return content_hash in self._rows
+
+    @property
+    def vectors(self):
+        """Zero-copy (n, dimension) read-only view of all stored rows"""
+        if self._vectors is None:
+            if not self.hashes:
+                return np.empty((0, self.dimension or 0), dtype=np.float32)
+            self._vectors = np.memmap(self._data_path, dtype=np.float32, mode="r",
+                                      shape=(len(self.hashes), self.dimension))
+        return self._vectors
+
+    def append(self, hashes, vectors, ids=None):
+        """Append new rows; hashes already present in the store are skipped"""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        ids = ids if ids is not None else [None] * len(hashes)
+        keep = []
+        seen = set()
+        for i, content_hash in enumerate(hashes):
+            if content_hash not in self._rows and content_hash not in seen:
+                seen.add(content_hash)
+                keep.append(i)
+        if not keep:
+            return
+        vectors = vectors[keep]
+        if self.dimension is None:
+            self.dimension = int(vectors.shape[1])
+            with open(self._meta_path, "w", encoding="utf-8") as f:
+                json.dump({"dimension": self.dimension, "model_name": self.model_name}, f)
+        elif vectors.shape[1] != self.dimension:
+            raise ValueError(f"Expected {self.dimension}-dimensional embeddings, got {vectors.shape[1]}")
+
+        with open(self._data_path, "r+b" if os.path.exists(self._data_path) else "wb") as f:
+            # Overwrite any unreferenced bytes left behind by an interrupted append
+            f.seek(len(self.hashes) * self.dimension * 4)
+            f.write(vectors.tobytes())
+            f.truncate()
+        with open(self._manifest_path, "a", encoding="utf-8") as f:
+            for i in keep:
+                f.write(json.dumps({"hash": hashes[i], "id": ids[i]}) + "\n")
+        for i in keep:
+            self._rows[hashes[i]] = len(self.hashes)
+            self.hashes.append(hashes[i])
+            self.ids.append(ids[i])
+        self._vectors = None
+
+    def get_many(self, hashes):
+        """
+        Rows for the given hashes, in order. A run of consecutive rows is
+        returned as a memmap slice (no copy); anything else is gathered.
+        """
+        if not hashes:
+            return np.empty((0, self.dimension or 0), dtype=np.float32)
+        rows = np.fromiter((self._rows[h] for h in hashes), dtype=np.int64, count=len(hashes))
+        first = rows[0]
+        if np.array_equal(rows, np.arange(first, first + len(rows))):
+            return self.vectors[first:first + len(rows)]
+        return np.asarray(self.vectors[rows])
+
+
+# Example usage
+if __name__ == "__main__":
+    store = EmbeddingStore("embedding_store", model_name="codellama/CodeLlama-7b-hf")
+    store.append(["a1", "b2"], np.eye(2, 4, dtype=np.float32), ids=["ar-0", "ar-1"])
+    store.append(["b2", "c3"], np.ones((2, 4), dtype=np.float32))  # "b2" is already stored
+    print("Rows:", len(store))
+    print("Vectors:\n", store.get_many(["a1", "b2", "c3"]))
@@ -1,98 +1,146 @@
 import numpy as np
-from transformers import AutoTokenizer, AutoModel
-import torch
-from scipy.spatial.distance import cosine
+
+from EmbeddingService import EmbeddingService
+from EmbeddingStore import EmbeddingStore
+from LocalTripleExtractor import LocalTripleExtractor
+from VectorIndex import ExactIndex
 
 class ExampleRetriever:
-    def __init__(self, training_ars, model_name="codellama/CodeLlama-7b-hf"):
+    max_length = 2048
+
+    def __init__(self, training_ars, model_name="codellama/CodeLlama-7b-hf", embedding_service=None, index=None,
+                 store=None, triple_extractor=None):
         """
-        Initialize with training ARs and load CodeLlama model
+        Initialize with training ARs and the shared CodeLlama embedding service
+
+        index: VectorIndex holding the training embeddings (ExactIndex by default,
+        or e.g. an IVFIndex for large corpora). A prebuilt or loaded index only
+        gets embeddings for the training ARs it does not cover yet.
+        store: optional EmbeddingStore (or its directory) persisting the
+        normalized training embeddings, so only ARs not seen before are embedded.
+        triple_extractor: optional KnowledgeTripleExtractor whose triple cache
+        supplies the knowledge triples of retrieved examples; uncached examples
+        fall back to its local extractor (Java unless configured otherwise).
         """
-        self.training_ars = training_ars
-        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
-        self.model = AutoModel.from_pretrained(model_name)
-        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        self.model.to(self.device)
-        
+        self.training_ars = list(training_ars)
+        self.embedding_service = embedding_service or EmbeddingService.shared(model_name)
+        self.index = index if index is not None else ExactIndex()
+        if isinstance(store, str):
+            store = EmbeddingStore(store, model_name=model_name)
+        self.store = store
+        self.triple_extractor = triple_extractor
+        self.local_triple_extractor = triple_extractor.local_extractor if triple_extractor is not None \
+            else LocalTripleExtractor()
+
         # Precompute training embeddings
-        self.training_embeddings = self._precompute_embeddings()
+        self.index.add(self._precompute_embeddings(self.training_ars[len(self.index):]))
 
     def _get_code_context(self, ar):
         """Combine preceding code and method call for embedding"""
         return f"{ar['P']}\n{ar['mcall']}"
 
-    def _embed_text(self, text):
-        """Generate embedding for text using CodeLlama"""
-        inputs = self.tokenizer(text, return_tensors="pt", 
-                              truncation=True, max_length=2048).to(self.device)
-        with torch.no_grad():
-            outputs = self.model(**inputs)
-        return outputs.last_hidden_state.mean(dim=1).cpu().numpy()[0]
+    @staticmethod
+    def _normalize(embeddings):
+        """L2-normalize rows into a contiguous float32 matrix"""
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(embeddings, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return embeddings / norms
 
-    def _precompute_embeddings(self):
-        """Precompute embeddings for all training ARs"""
-        return [self._embed_text(self._get_code_context(ar)) for ar in self.training_ars]
+    def _embed_ars(self, ars):
+        """Normalized embeddings for ARs as one (n, d) matrix"""
+        contexts = [self._get_code_context(ar) for ar in ars]
+        return self._normalize(self.embedding_service.embed_many(contexts, max_length=self.max_length))
+
+    def _precompute_embeddings(self, ars):
+        """
+        Precompute normalized embeddings for training ARs. With a store, ARs whose
+        content hash is already stored are read back (zero-copy when they form a
+        contiguous run of rows) and only the new ones are embedded and appended.
+        """
+        if self.store is None:
+            return self._embed_ars(ars)
+        contexts = [self._get_code_context(ar) for ar in ars]
+        hashes = [EmbeddingService.text_key(context, self.max_length) for context in contexts]
+        missing = {}
+        for content_hash, context in zip(hashes, contexts):
+            if content_hash not in self.store and content_hash not in missing:
+                missing[content_hash] = context
+        if missing:
+            embeddings = self.embedding_service.embed_many(list(missing.values()), max_length=self.max_length)
+            self.store.append(list(missing), self._normalize(embeddings))
+        return self.store.get_many(hashes)
+
+    def add_training_ars(self, ars):
+        """Extend the training set, embedding and indexing only the new ARs"""
+        ars = list(ars)
+        self.index.add(self._precompute_embeddings(ars))
+        self.training_ars.extend(ars)
+
+    def calculate_similarity_many(self, input_ars, top_k=3):
+        """
+        Score a batch of input ARs against the training AR index in one search call
+        Returns, per input AR, the top-k similar ARs with scores
+        """
+        top_k = min(top_k, len(self.training_ars))
+        if top_k <= 0 or not input_ars:
+            return [[] for _ in input_ars]
+
+        # Cosine similarity of normalized vectors is their inner product
+        ids, scores = self.index.search(self._embed_ars(input_ars), top_k)
+        return [
+            [(self.training_ars[i], float(score)) for i, score in zip(row, row_scores) if i >= 0]
+            for row, row_scores in zip(ids, scores)
+        ]
 
     def calculate_similarity(self, input_ar, top_k=3):
         """
         Calculate semantic similarity between input AR and training ARs
         Returns top-k similar ARs with scores
         """
-        input_embedding = self._embed_text(self._get_code_context(input_ar))
-        
-        # Calculate cosine similarities
-        similarities = []
-        for train_emb in self.training_embeddings:
-            sim = 1 - cosine(input_embedding, train_emb)
-            similarities.append(sim)
-            
-        # Get indices of top-k similarities
-        sorted_indices = np.argsort(similarities)[::-1][:top_k]
-        
-        return [(self.training_ars[i], similarities[i]) for i in sorted_indices]
+        return self.calculate_similarity_many([input_ar], top_k)[0]
 
-    def retrieve_examples(self, input_ar, top_k=3):
-        """
-        Retrieve top-k similar AR examples with their knowledge triples
-        """
-        similar_ars = self.calculate_similarity(input_ar, top_k)
-        
+    def _cached_triples(self, ars):
+        if self.triple_extractor is None:
+            return [None] * len(ars)
+        return self.triple_extractor.cached_triples_many(ars)
+
+    def _build_examples(self, similar_ars, cached_triples=None):
+        if cached_triples is None:
+            cached_triples = self._cached_triples([ar for ar, _ in similar_ars])
         results = []
-        for ar, score in similar_ars:
-            # Extract knowledge triples from AR (implementation depends on KG construction)
-            triples = self._extract_knowledge_triples(ar)
+        for (ar, score), triples in zip(similar_ars, cached_triples):
+            if triples is None:
+                # Extract knowledge triples from AR (implementation depends on KG construction)
+                triples = self._extract_knowledge_triples(ar)
             results.append({
                 'ar': ar,
                 'similarity_score': score,
                 'knowledge_triples': triples
             })
-            
         return results
 
+    def retrieve_examples(self, input_ar, top_k=3):
+        """
+        Retrieve top-k similar AR examples with their knowledge triples
+        """
+        return self._build_examples(self.calculate_similarity(input_ar, top_k))
+
+    def retrieve_examples_many(self, input_ars, top_k=3):
+        """
+        Retrieve top-k examples for a batch of input ARs, scored with a single matmul
+        and with one triple cache lookup for all retrieved examples
+        """
+        similar_lists = self.calculate_similarity_many(input_ars, top_k)
+        cached = iter(self._cached_triples([ar for similar in similar_lists for ar, _ in similar]))
+        return [self._build_examples(similar, [next(cached) for _ in similar]) for similar in similar_lists]
+
     def _extract_knowledge_triples(self, ar):
         """
-        Extract knowledge triples from AR (simplified example implementation)
-        This would be replaced with actual KG extraction logic
+        Offline knowledge triples for an example AR not found in the triple
+        cache, from the deterministic local extractor
         """
-        # Placeholder implementation showing triple extraction pattern
-        triples = []
-        
-        # Extract variable-type relationships
-        for line in ar['P'].split('\n'):
-            if '=' in line and 'new' in line:
-                var = line.split('=')[0].strip()
-                cls = line.split('new ')[1].split('(')[0].strip()
-                triples.append(f"({var}, typeOf, {cls})")
-                
-        # Extract method call relationships
-        if 'mcall' in ar:
-            method_parts = ar['mcall'].split('(')[0].split('.')
-            if len(method_parts) > 1:
-                obj = method_parts[0]
-                method = method_parts[1]
-                triples.append(f"({obj}, hasMethod, {method})")
-                
-        return triples
+        return self.local_triple_extractor.extract_triples(ar)
 
 # Example usage
 if __name__ == "__main__":
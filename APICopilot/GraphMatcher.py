@@ -1,80 +1,436 @@
+import heapq
+import time
+from collections import Counter
+from itertools import chain, count
+
 import networkx as nx
 from networkx.algorithms import isomorphism
 import numpy as np
-from transformers import AutoTokenizer, AutoModel
-import torch
+
+from EmbeddingService import EmbeddingService
+
+
+class MatchBudgetExceeded(Exception):
+    """Raised inside VF2 when a matching session runs out of time or expansions"""
+
+
+class _MatchBudget:
+    def __init__(self, time_budget=None, max_expansions=None):
+        self.deadline = time.perf_counter() + time_budget if time_budget is not None else None
+        self.max_expansions = max_expansions
+        self.expansions = 0
+
+    def spend(self):
+        self.expansions += 1
+        if self.max_expansions is not None and self.expansions > self.max_expansions:
+            raise MatchBudgetExceeded(f"exceeded {self.max_expansions} expansions")
+        # Reading the clock on every expansion would dominate cheap node tests
+        if self.deadline is not None and self.expansions % 64 == 0 and time.perf_counter() > self.deadline:
+            raise MatchBudgetExceeded("exceeded time budget")
+
+
+class _SessionMatcher(isomorphism.MultiDiGraphMatcher):
+    """
+    VF2 matcher that tests node pairs by name through a callback, so node
+    similarity can be a lookup instead of an embedding of the node attributes.
+    Optionally charges every generated candidate pair to a budget and rejects
+    pairs the prune callback rules out for the partial mapping in core_1.
+    """
+    def __init__(self, G1, G2, node_matcher, edge_match, budget=None, prune=None, candidates=None):
+        super().__init__(G1, G2, edge_match=edge_match)
+        self.node_matcher = node_matcher
+        self.budget = budget
+        self.prune = prune
+        self.candidates = candidates
+        if candidates is not None:
+            # Extend the most constrained G2 nodes first (stable on ties)
+            order = sorted(G2, key=lambda node: len(candidates[node]))
+            self.G2_node_order = {node: i for i, node in enumerate(order)}
+
+    def _terminal_candidates(self, terminal_1, node_2):
+        """G1 nodes in terminal_1 that are unmapped candidates of node_2"""
+        allowed = self.candidates[node_2]
+        if len(allowed) < len(terminal_1):
+            return [node for node in allowed if node in terminal_1 and node not in self.core_1]
+        return [node for node in terminal_1 if node in allowed and node not in self.core_1]
+
+    def candidate_pairs_iter(self):
+        """
+        Candidate pairs, each charged to the budget as it is generated, so
+        time and expansion limits hold even when most pairs fail the
+        syntactic feasibility test and never reach semantic_feasibility
+        """
+        pairs = super().candidate_pairs_iter() if self.candidates is None else self._filtered_pairs_iter()
+        if self.budget is None:
+            yield from pairs
+            return
+        for pair in pairs:
+            self.budget.spend()
+            yield pair
+
+    def _filtered_pairs_iter(self):
+        """
+        VF2's candidate rule (networkx DiGraphMatcher) restricted to the
+        precomputed G1 candidates of each G2 node. Terminal sets are probed
+        from whichever side is smaller, so hub nodes with thousands of
+        neighbours are not rescanned at every state.
+        """
+        min_key = self.G2_node_order.__getitem__
+        T2_out = [node for node in self.out_2 if node not in self.core_2]
+        if T2_out and any(node not in self.core_1 for node in self.out_1):
+            node_2 = min(T2_out, key=min_key)
+            for node_1 in self._terminal_candidates(self.out_1, node_2):
+                yield node_1, node_2
+            return
+        T2_in = [node for node in self.in_2 if node not in self.core_2]
+        if T2_in and any(node not in self.core_1 for node in self.in_1):
+            node_2 = min(T2_in, key=min_key)
+            for node_1 in self._terminal_candidates(self.in_1, node_2):
+                yield node_1, node_2
+            return
+        node_2 = min(self.G2_nodes - set(self.core_2), key=min_key)
+        for node_1 in self.candidates[node_2]:
+            if node_1 not in self.core_1:
+                yield node_1, node_2
+
+    def semantic_feasibility(self, G1_node, G2_node):
+        if not self.node_matcher(G1_node, G2_node):
+            return False
+        if self.prune is not None and self.prune(self.core_1, G1_node, G2_node):
+            return False
+        return super().semantic_feasibility(G1_node, G2_node)
+
 
 class GraphMatcher:
-    def __init__(self, kg_examples, g_input):
+    similarity_threshold = 0.8  # Semantic similarity threshold
+    max_length = 512
+    # Per-AR limits for get_top_k_subgraphs; None disables a limit
+    time_budget = 10.0
+    max_expansions = 200000
+    # Restrict VF2 to label/degree-compatible candidates computed up front
+    filter_candidates = True
+
+    def __init__(self, kg_examples, g_input, model_name="codellama/CodeLlama-7b-hf", embedding_service=None):
         self.kg_examples = kg_examples
         self.g_input = g_input
-        self.tokenizer = AutoTokenizer.from_pretrained("codellama/CodeLlama-7b-hf")
-        self.model = AutoModel.from_pretrained("codellama/CodeLlama-7b-hf")
-        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        self.model.to(self.device)
-        
-    def _get_embedding(self, text):
-        inputs = self.tokenizer(text, return_tensors="pt", truncation=True, max_length=512).to(self.device)
-        with torch.no_grad():
-            outputs = self.model(**inputs)
-        return outputs.last_hidden_state.mean(dim=1).cpu().numpy()[0]
-
-    def _node_matcher(self, node1, node2):
-        emb1 = self._get_embedding(node1)
-        emb2 = self._get_embedding(node2)
-        return 1 - cosine(emb1, emb2) > 0.8  # Semantic similarity threshold
-
-    def _edge_matcher(self, edge1, edge2):
-        e1_data = self.kg_examples.get_edge_data(*edge1)
-        e2_data = self.g_input.get_edge_data(*edge2)
-        return e1_data.get('label', '') == e2_data.get('label', '')
+        self.embedding_service = embedding_service or EmbeddingService.shared(model_name)
+        self._text_rows = None
+        self._bounds = None
+        self._candidates = None
+        self.last_search = None
+
+    def __getstate__(self):
+        """Pickle prepared, without the embedding service, so the search can run in a worker process"""
+        self._prepare()
+        state = self.__dict__.copy()
+        state['embedding_service'] = None
+        return state
+
+    @staticmethod
+    def _edge_string(u, v, label):
+        return f"{u}-{label}-{v}"
+
+    def _normalized(self, embeddings):
+        norms = np.linalg.norm(embeddings, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (embeddings / norms).astype(np.float32)
+
+    def _prepare(self):
+        """
+        Embed every node label and edge string of both graphs in one batched
+        call per matching session, and precompute the example x input node
+        similarity matrix that VF2 node tests look up.
+        """
+        if self._text_rows is not None:
+            return
+        texts = {}
+        for node in chain(self.kg_examples.nodes, self.g_input.nodes):
+            texts.setdefault(str(node), len(texts))
+        for graph in (self.kg_examples, self.g_input):
+            for u, v, data in graph.edges(data=True):
+                texts.setdefault(self._edge_string(u, v, data.get('label', '')), len(texts))
+        self._embeddings = self._normalized(
+            self.embedding_service.embed_many(list(texts), max_length=self.max_length))
+        self._text_rows = texts
+
+        self._example_index = {node: i for i, node in enumerate(self.kg_examples.nodes)}
+        self._input_index = {node: i for i, node in enumerate(self.g_input.nodes)}
+        example_rows = [texts[str(node)] for node in self.kg_examples.nodes]
+        input_rows = [texts[str(node)] for node in self.g_input.nodes]
+        self._node_similarity = self._embeddings[example_rows] @ self._embeddings[input_rows].T
+
+    def _text_embedding(self, text):
+        row = self._text_rows.get(text)
+        if row is not None:
+            return self._embeddings[row]
+        return self._normalized(self.embedding_service.embed(text, max_length=self.max_length))
+
+    def _node_similarity_of(self, example_node, input_node):
+        return float(self._node_similarity[self._example_index[example_node], self._input_index[input_node]])
+
+    def _node_matcher(self, example_node, input_node):
+        return self._node_similarity_of(example_node, input_node) > self.similarity_threshold
+
+    @staticmethod
+    def _edge_matcher(edges1, edges2):
+        """Parallel edges between a node pair must carry the same multiset of labels"""
+        labels1 = sorted(data.get('label', '') for data in edges1.values())
+        labels2 = sorted(data.get('label', '') for data in edges2.values())
+        return labels1 == labels2
 
     def find_isomorphic_subgraphs(self):
-        matcher = isomorphism.GraphMatcher(
-            self.kg_examples,
-            self.g_input,
-            node_match=self._node_matcher,
-            edge_match=self._edge_matcher
-        )
-        return list(matcher.subgraph_isomorphisms_iter())
+        """Mappings (kg_examples node -> g_input node) of example subgraphs isomorphic to g_input"""
+        return list(self.iter_isomorphic_subgraphs())
 
     def calculate_nerp(self, subgraph_mapping):
+        self._prepare()
+        input_to_example = {input_node: example_node for example_node, input_node in subgraph_mapping.items()}
         node_similarities = []
         edge_similarities = []
-        
+
         # Calculate node similarities
-        for input_node, example_node in subgraph_mapping.items():
-            node_emb_input = self._get_embedding(input_node)
-            node_emb_example = self._get_embedding(example_node)
-            node_similarities.append(1 - cosine(node_emb_input, node_emb_example))
-        
+        for input_node, example_node in input_to_example.items():
+            node_similarities.append(self._node_similarity_of(example_node, input_node))
+
         # Calculate edge similarities
-        for input_edge in self.g_input.edges(data=True):
-            example_edge = (subgraph_mapping[input_edge[0]], 
-                          subgraph_mapping[input_edge[1]], 
-                          input_edge[2])
-            
-            # Create edge representation strings
-            input_edge_str = f"{input_edge[0]}-{input_edge[2]['label']}-{input_edge[1]}"
-            example_edge_str = f"{example_edge[0]}-{example_edge[2]['label']}-{example_edge[1]}"
-            
-            edge_emb_input = self._get_embedding(input_edge_str)
-            edge_emb_example = self._get_embedding(example_edge_str)
-            edge_similarities.append(1 - cosine(edge_emb_input, edge_emb_example))
-        
+        for u, v, data in self.g_input.edges(data=True):
+            label = data.get('label', '')
+            input_edge_str = self._edge_string(u, v, label)
+            example_edge_str = self._edge_string(input_to_example[u], input_to_example[v], label)
+            edge_similarities.append(float(
+                self._text_embedding(input_edge_str) @ self._text_embedding(example_edge_str)))
+
         return sum(node_similarities) + sum(edge_similarities)
 
-    def get_top_k_subgraphs(self, top_k=3):
-        isomorphic_mappings = self.find_isomorphic_subgraphs()
-        scored_subgraphs = []
-        
-        for mapping in isomorphic_mappings:
-            nerp_score = self.calculate_nerp(mapping)
-            scored_subgraphs.append((mapping, nerp_score))
-            
-        # Sort by NERP score and return top-k
-        scored_subgraphs.sort(key=lambda x: x[1], reverse=True)
-        return scored_subgraphs[:top_k]
+    def _score_bounds(self):
+        """
+        Per input node and per input edge, the best similarity any example
+        counterpart can reach; their sums bound the NERP of unmapped parts.
+        """
+        if self._bounds is None:
+            if self._node_similarity.size:
+                node_best = self._node_similarity.max(axis=0)
+            else:
+                node_best = np.zeros(len(self._input_index), dtype=np.float32)
+            example_edges = {}
+            for u, v, data in self.kg_examples.edges(data=True):
+                label = data.get('label', '')
+                example_edges.setdefault(label, []).append(self._text_rows[self._edge_string(u, v, label)])
+            edge_bound = 0.0
+            for u, v, data in self.g_input.edges(data=True):
+                label = data.get('label', '')
+                rows = example_edges.get(label)
+                if rows:
+                    input_row = self._text_rows[self._edge_string(u, v, label)]
+                    edge_bound += float((self._embeddings[rows] @ self._embeddings[input_row]).max())
+            self._bounds = ({node: float(node_best[i]) for node, i in self._input_index.items()}, edge_bound)
+        return self._bounds
+
+    @staticmethod
+    def _label_signatures(graph):
+        """Per node, counts of outgoing and of incoming edges by label"""
+        out_labels = {node: Counter() for node in graph.nodes}
+        in_labels = {node: Counter() for node in graph.nodes}
+        for u, v, data in graph.edges(data=True):
+            label = data.get('label', '')
+            out_labels[u][label] += 1
+            in_labels[v][label] += 1
+        return out_labels, in_labels
+
+    def _candidate_sets(self):
+        """
+        kg_examples candidates for every g_input node, computed once per session.
+        A candidate must pass the node similarity test and have at least as many
+        edges of every label, in each direction, as the input node. An edge
+        label -> node index keeps this from scanning every example node per
+        input node.
+        """
+        if self._candidates is None:
+            example_out, example_in = self._label_signatures(self.kg_examples)
+            input_out, input_in = self._label_signatures(self.g_input)
+            out_index = {}
+            in_index = {}
+            for index, signatures in ((out_index, example_out), (in_index, example_in)):
+                for node, labels in signatures.items():
+                    for label in labels:
+                        index.setdefault(label, set()).add(node)
+
+            example_nodes = list(self.kg_examples.nodes)
+            candidates = {}
+            for input_node, column in self._input_index.items():
+                similar = np.flatnonzero(self._node_similarity[:, column] > self.similarity_threshold)
+                pools = [out_index.get(label, set()) for label in input_out[input_node]]
+                pools += [in_index.get(label, set()) for label in input_in[input_node]]
+                allowed = {example_nodes[i] for i in similar}
+                for pool in sorted(pools, key=len):
+                    allowed &= pool
+                # dict keeps kg_examples node order, so the search order is reproducible
+                candidates[input_node] = {
+                    node: None for node in example_nodes if node in allowed
+                    and all(example_out[node][label] >= n for label, n in input_out[input_node].items())
+                    and all(example_in[node][label] >= n for label, n in input_in[input_node].items())
+                }
+            self._candidates = candidates
+        return self._candidates
+
+    def iter_isomorphic_subgraphs(self, budget=None, prune=None):
+        """Stream VF2 mappings (kg_examples node -> g_input node) without materializing them"""
+        self._prepare()
+        candidates = None
+        if self.filter_candidates:
+            candidates = self._candidate_sets()
+            if not all(candidates.values()):
+                return iter(())
+        matcher = _SessionMatcher(
+            self.kg_examples,
+            self.g_input,
+            node_matcher=self._node_matcher,
+            edge_match=self._edge_matcher,
+            budget=budget,
+            prune=prune,
+            candidates=candidates
+        )
+        return matcher.subgraph_isomorphisms_iter()
+
+    def get_top_k_subgraphs(self, top_k=3, time_budget=None, max_expansions=None):
+        """
+        Top-k mappings by NERP, found by streaming VF2 into a bounded heap.
+
+        Partial mappings whose NERP upper bound (exact similarities of mapped
+        nodes + best reachable similarity of the rest) cannot beat the current
+        k-th best are pruned. The search stops when time_budget seconds or
+        max_expansions candidate pairs are used up, returning the best mappings
+        found so far; self.last_search records whether the search completed.
+        Budgets left as None fall back to the class-level defaults.
+        """
+        time_budget = self.time_budget if time_budget is None else time_budget
+        max_expansions = self.max_expansions if max_expansions is None else max_expansions
+        if top_k <= 0:
+            return []
+        self._prepare()
+        node_best, edge_bound = self._score_bounds()
+        total_node_best = sum(node_best.values())
+        heap = []  # (score, -discovery order, mapping); heap[0] is the current k-th best
+        order = count()
+        stats = {'mappings': 0, 'pruned': 0, 'complete': True}
+
+        def prune(core_1, example_node, input_node):
+            if len(heap) < top_k:
+                return False
+            mapped = self._node_similarity_of(example_node, input_node)
+            mapped_best = node_best[input_node]
+            for mapped_example, mapped_input in core_1.items():
+                mapped += self._node_similarity_of(mapped_example, mapped_input)
+                mapped_best += node_best[mapped_input]
+            bound = mapped + (total_node_best - mapped_best) + edge_bound
+            # Ties never displace an earlier mapping, so they can be pruned too
+            if bound <= heap[0][0] + 1e-9:
+                stats['pruned'] += 1
+                return True
+            return False
+
+        budget = _MatchBudget(time_budget, max_expansions)
+        try:
+            for mapping in self.iter_isomorphic_subgraphs(budget=budget, prune=prune):
+                stats['mappings'] += 1
+                entry = (self.calculate_nerp(mapping), -next(order), dict(mapping))
+                if len(heap) < top_k:
+                    heapq.heappush(heap, entry)
+                elif entry[0] > heap[0][0]:
+                    heapq.heapreplace(heap, entry)
+        except MatchBudgetExceeded as e:
+            stats['complete'] = False
+            stats['stopped'] = str(e)
+        stats['expansions'] = budget.expansions
+        self.last_search = stats
+
+        # Sort by NERP score (earliest found first on ties) and return top-k
+        heap.sort(key=lambda entry: (-entry[0], -entry[1]))
+        return [(mapping, score) for score, _, mapping in heap]
+
+def _synthetic_kgs(n_calls, seed=0):
+    """
+    Random example KG with n_calls API calls plus a small input graph shaped
+    like Listing 3. One call in four is a copy of the input graph (a
+    transformer resize of two Images), so every size has many mappings.
+    """
+    rng = np.random.default_rng(seed)
+    types = ["Image", "ImageTransformer", "File", "String", "Graphics", "BufferedImage"]
+    objects = ["transformer", "editor", "reader", "writer", "canvas"]
+    methods = ["resize", "crop", "read", "write", "draw"]
+    kg_examples = nx.MultiDiGraph()
+    for c in range(n_calls):
+        if c % 4 == 0:
+            call = f"transformer{c}.resize"
+            for suffix in "ab":
+                var = f"originalImage{c}{suffix}"
+                kg_examples.add_edge(call, var, label="takesArgument")
+                kg_examples.add_edge(var, "Image", label="typeOf")
+        else:
+            call = f"{objects[rng.integers(len(objects))]}{c}.{methods[rng.integers(len(methods))]}"
+            for a in range(int(rng.integers(1, 4))):
+                type_name = types[rng.integers(len(types))]
+                var = f"original{type_name}{rng.integers(n_calls)}"
+                if kg_examples.has_edge(call, var):
+                    continue
+                kg_examples.add_edge(call, var, label="takesArgument")
+                if not kg_examples.has_edge(var, type_name):
+                    kg_examples.add_edge(var, type_name, label="typeOf")
+                if rng.random() < 0.3 and kg_examples.out_degree(var) == 1:
+                    kg_examples.add_edge(var, f'"path/to/{var}.png"', label="hasValue")
+        kg_examples.add_edge(f"result{c}", call, label="assignedFrom")
+
+    g_input = nx.MultiDiGraph()
+    g_input.add_edges_from([
+        ("originalImage0", "Image", {"label": "typeOf"}),
+        ("originalImage1", "Image", {"label": "typeOf"}),
+        ("transformer.resize", "originalImage0", {"label": "takesArgument"}),
+        ("transformer.resize", "originalImage1", {"label": "takesArgument"}),
+    ])
+    return kg_examples, g_input
+
+
+def _mapping_set(mappings):
+    return {frozenset(mapping.items()) for mapping in mappings}
+
+
+def benchmark_candidate_filtering(sizes=(100, 200, 400, 800, 1600), seed=0):
+    """
+    Matching time on synthetic KGs of increasing size, with and without
+    label-indexed candidate filtering. Uses the model-free hashing embedder,
+    so it measures graph search only.
+    """
+    from EmbeddingService import HashingEmbeddingService
+
+    embedding_service = HashingEmbeddingService()
+    rows = []
+    print(f"{'calls':>6} {'nodes':>6} {'mappings':>9} {'unfiltered s':>13} {'filtered s':>11} {'speedup':>8}")
+    for n_calls in sizes:
+        kg_examples, g_input = _synthetic_kgs(n_calls, seed)
+        timings = {}
+        mappings = {}
+        for filtered in (False, True):
+            matcher = GraphMatcher(kg_examples, g_input, embedding_service=embedding_service)
+            matcher.filter_candidates = filtered
+            matcher._prepare()  # embeddings are shared work, time the search only
+            start = time.perf_counter()
+            mappings[filtered] = matcher.find_isomorphic_subgraphs()
+            timings[filtered] = time.perf_counter() - start
+        if not mappings[True]:
+            raise AssertionError(f"no mappings at {n_calls} calls: the timings would compare empty searches")
+        if _mapping_set(mappings[False]) != _mapping_set(mappings[True]):
+            raise AssertionError("candidate filtering changed the set of mappings")
+        row = {
+            "calls": n_calls,
+            "nodes": kg_examples.number_of_nodes(),
+            "mappings": len(mappings[True]),
+            "unfiltered_s": timings[False],
+            "filtered_s": timings[True],
+        }
+        rows.append(row)
+        print(f"{n_calls:>6} {row['nodes']:>6} {row['mappings']:>9} {timings[False]:>13.4f} "
+              f"{timings[True]:>11.4f} {timings[False] / max(timings[True], 1e-9):>7.1f}x")
+    return rows
 
 # Example usage
 if __name__ == "__main__":
@@ -105,5 +461,5 @@ if __name__ == "__main__":
     print("Top matching subgraphs:")
     for idx, (mapping, score) in enumerate(top_subgraphs):
         print(f"\nSubgraph {idx+1} (NERP: {score:.2f}):")
-        for input_node, example_node in mapping.items():
+        for example_node, input_node in mapping.items():
             print(f"  {input_node} -> {example_node}")
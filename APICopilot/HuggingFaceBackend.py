@@ -0,0 +1,165 @@
+import copy
+import threading
+import time
+
+import torch
+from transformers import AutoModelForCausalLM, AutoTokenizer
+
+from LLMBackend import LLMBackend
+
+
+class HuggingFaceBackend(LLMBackend):
+    """
+    In-process causal LM backend: prompts are generated in padded batches on
+    the local device, so the pipeline runs offline (a CPU is enough for small
+    code models).
+
+    Besides the usual per-step KV cache, the keys and values of a prompt
+    prefix shared by a whole batch (e.g. PromptGenerator's static header) are
+    computed once and reused by every row and by later batches starting with
+    the same tokens, so only the differing suffixes are prefilled.
+    """
+
+    name = "huggingface"
+
+    def __init__(self, model_name="codellama/CodeLlama-7b-Instruct-hf", batch_size=8, device=None,
+                 min_prefix_tokens=16, chat_template=True):
+        """
+        Args:
+            model_name: Hugging Face causal LM (hub id or local directory)
+            batch_size: Prompts per generate() call
+            device: torch device (None = cuda when available, else cpu)
+            min_prefix_tokens: Shortest shared prefix worth caching
+            chat_template: Wrap prompts in the tokenizer's chat template when it has one
+        """
+        super().__init__()
+        self.model = model_name
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+        self.device = torch.device(device or ("cuda" if torch.cuda.is_available() else "cpu"))
+        self.lm = AutoModelForCausalLM.from_pretrained(model_name)
+        self.lm.to(self.device)
+        self.lm.eval()
+        self.batch_size = batch_size
+        self.min_prefix_tokens = min_prefix_tokens
+        self.chat_template = chat_template and getattr(self.tokenizer, 'chat_template', None) is not None
+        # (prefix token ids, its KV cache) of the most recent shared prefix
+        self._prefix = ((), None)
+        # One generate() at a time: the model and the prefix cache are shared
+        self._lock = threading.Lock()
+        self.prefix_hits = 0
+        self.prefilled_tokens = 0
+        self.reused_tokens = 0
+
+    def _encode(self, prompt):
+        if self.chat_template:
+            text = self.tokenizer.apply_chat_template([{"role": "user", "content": prompt}],
+                                                      add_generation_prompt=True, tokenize=False)
+            return self.tokenizer(text, add_special_tokens=False).input_ids
+        return self.tokenizer(prompt).input_ids
+
+    @staticmethod
+    def _common_prefix_length(sequences):
+        shortest = min(len(sequence) for sequence in sequences)
+        length = 0
+        while length < shortest and all(sequence[length] == sequences[0][length] for sequence in sequences):
+            length += 1
+        return length
+
+    @torch.no_grad()
+    def _prefix_cache(self, token_ids, length):
+        """
+        KV cache of token_ids[:length], reusing (a cropped copy of) the cached
+        prefix when the two overlap by at least min_prefix_tokens
+        """
+        cached_ids, cached = self._prefix
+        overlap = self._common_prefix_length([cached_ids, token_ids[:length]]) if cached_ids else 0
+        if overlap >= self.min_prefix_tokens:
+            self.prefix_hits += 1
+            if overlap < len(cached_ids):
+                cached = copy.deepcopy(cached)
+                # A negative count removes that many trailing tokens; the positive
+                # (absolute length) form warns as deprecated in transformers 5
+                cached.crop(overlap - len(cached_ids))
+                self._prefix = (cached_ids[:overlap], cached)
+            return overlap, self._prefix[1]
+        prefix = torch.tensor([token_ids[:length]], device=self.device)
+        cache = self.lm(input_ids=prefix, use_cache=True).past_key_values
+        self.prefilled_tokens += length
+        self._prefix = (tuple(token_ids[:length]), cache)
+        return length, cache
+
+    @torch.no_grad()
+    def _generate(self, encoded, temperature, max_tokens):
+        pad_id = self.tokenizer.pad_token_id
+        # Leave at least one uncached token per row to start generation from
+        shared = min(self._common_prefix_length(encoded), min(len(ids) for ids in encoded) - 1)
+        prefix_length, cache = 0, None
+        if shared >= self.min_prefix_tokens:
+            prefix_length, cache = self._prefix_cache(encoded[0], shared)
+            cache = copy.deepcopy(cache)
+            if len(encoded) > 1:
+                cache.batch_repeat_interleave(len(encoded))
+            self.reused_tokens += prefix_length * len(encoded)
+
+        # Left-pad the uncached suffixes; padding between prefix and suffix is masked
+        # out, and positions follow the attention mask, so every row sees its own prompt
+        suffixes = [ids[prefix_length:] for ids in encoded]
+        width = max(len(suffix) for suffix in suffixes)
+        input_ids = torch.tensor([list(encoded[0][:prefix_length]) + [pad_id] * (width - len(suffix)) + list(suffix)
+                                  for suffix in suffixes], device=self.device)
+        attention_mask = torch.tensor([[1] * prefix_length + [0] * (width - len(suffix)) + [1] * len(suffix)
+                                       for suffix in suffixes], device=self.device)
+        self.prefilled_tokens += sum(len(suffix) for suffix in suffixes)
+        sampling = {"do_sample": True, "temperature": temperature} if temperature > 0 else {"do_sample": False}
+        output = self.lm.generate(input_ids=input_ids, attention_mask=attention_mask, past_key_values=cache,
+                                  max_new_tokens=max_tokens, pad_token_id=pad_id, use_cache=True, **sampling)
+        return self.tokenizer.batch_decode(output[:, input_ids.shape[1]:], skip_special_tokens=True)
+
+    def complete_many(self, prompts, temperature=0.0, max_tokens=256):
+        """
+        Batched greedy (temperature 0) or sampled completions. Identical
+        prompts are generated once, and batches are formed from prompts of
+        similar length so little compute goes to padding.
+        """
+        start = time.perf_counter()
+        prompts = list(prompts)
+        unique = list(dict.fromkeys(prompts))
+        encoded = {prompt: self._encode(prompt) for prompt in unique}
+        by_length = sorted(unique, key=lambda prompt: len(encoded[prompt]))
+        outputs = {}
+        for begin in range(0, len(by_length), self.batch_size):
+            batch = by_length[begin:begin + self.batch_size]
+            try:
+                with self._lock:
+                    texts = self._generate([encoded[prompt] for prompt in batch], temperature, max_tokens)
+            except Exception as e:
+                texts = [e] * len(batch)
+            end = time.perf_counter()
+            for prompt, text in zip(batch, texts):
+                outputs[prompt] = text
+                self._record(start, end, isinstance(text, BaseException))
+        return [outputs[prompt] for prompt in prompts]
+
+    def stats(self):
+        return {
+            **super().stats(),
+            "prefix_hits": self.prefix_hits,
+            "prefilled_tokens": self.prefilled_tokens,
+            "reused_prefix_tokens": self.reused_tokens,
+        }
+
+
+# Example usage
+if __name__ == "__main__":
+    from LLMBackend import format_backend_stats
+
+    backend = HuggingFaceBackend("codellama/CodeLlama-7b-Instruct-hf", batch_size=4)
+    header = "Complete the following method call by filling missing arguments.\n" \
+             "Only output the completed method call with arguments.\n\n"
+    prompts = [header + "transformer.resize(originalImage, /* Missing Arguments */",
+               header + "settings.update(\"admin\", /* Missing Arguments */"]
+    for completion in backend.complete_many(prompts, max_tokens=32):
+        print(completion)
+    print(format_backend_stats([backend]))
@@ -1,14 +1,59 @@
-import openai
+import asyncio
+
 import re
-from typing import List, Tuple
+from typing import Iterable, List, Optional, Tuple
+
+from LocalTripleExtractor import LocalTripleExtractor
+from RequestEngine import ChatRequestEngine
+from TripleCache import TripleCache
+
 
 class KnowledgeTripleExtractor:
-    def __init__(self, api_key: str, model: str = "gpt-4o"):
+    # Bump whenever _format_prompt or _parse_response change, so cached triples are not reused
+    PROMPT_VERSION = 1
+    # 'llm': always ask the model; 'local': offline extraction only;
+    # 'local-first': offline extraction, falling back to the model when it covers too little
+    MODES = ('llm', 'local', 'local-first')
+
+    def __init__(self, api_key: Optional[str] = None, model: str = "gpt-4o", base_url: Optional[str] = None,
+                 max_concurrency: int = 16, requests_per_second: Optional[float] = None,
+                 max_retries: int = 6, backoff_base: float = 1.0, backoff_max: float = 60.0,
+                 timeout: float = 120.0, cache=None, mode: str = "llm", language: str = "java",
+                 min_coverage: float = 1.0, backend=None):
         """
         Initialize the extractor with OpenAI API credentials
+
+        Args:
+            api_key: OpenAI API key
+            model: Chat model used for extraction (the backend's model when backend is given)
+            base_url: OpenAI-compatible endpoint (None = api.openai.com)
+            max_concurrency: Requests in flight at once, across all calls and threads
+            requests_per_second: Token-bucket rate limit, likewise shared (None = unlimited)
+            max_retries: Retries per AR on 429/5xx and connection errors
+            backoff_base: First retry waits up to this many seconds, doubling per attempt
+            backoff_max: Cap on a single backoff wait
+            timeout: Per-request timeout in seconds
+            cache: Optional TripleCache (or its SQLite path) shared across runs and processes
+            mode: 'llm', 'local' or 'local-first' (see MODES)
+            language: Source language of the ARs, for the local extractor ('java' or 'python')
+            min_coverage: In 'local-first' mode, the share of the call's variables the local
+                triples must describe before the LLM is skipped
+            backend: LLMBackend answering the extraction prompts (e.g. a local
+                HuggingFaceBackend); None uses the OpenAI-compatible endpoint above
         """
-        openai.api_key = api_key
-        self.model = model
+        if mode not in self.MODES:
+            raise ValueError(f"Unsupported mode: {mode}")
+        if backend is None:
+            backend = ChatRequestEngine(api_key, model, base_url, max_concurrency, requests_per_second,
+                                        max_retries, backoff_base, backoff_max, timeout)
+        self.backend = backend
+        self.model = backend.model
+        if isinstance(cache, str):
+            cache = TripleCache(cache)
+        self.cache = cache
+        self.mode = mode
+        self.min_coverage = min_coverage
+        self.local_extractor = LocalTripleExtractor(language)
         self.triple_pattern = re.compile(r'\(([^,]+),\s*([^,]+),\s*([^)]+)\)')
 
     def _format_prompt(self, ar: dict) -> str:
@@ -39,25 +84,107 @@ Output each extracted triple on a new line, formatted as: (Subject, Predicate, O
                 triples.append(tuple(match.groups()))
         return triples
 
+    def _local_triples(self, ar: dict) -> Optional[List[Tuple[str, str, str]]]:
+        """Offline triples when the mode allows serving them, else None (ask the LLM)"""
+        if self.mode == 'llm':
+            return None
+        triples = self.local_extractor.extract_triples(ar)
+        if self.mode == 'local' or self.local_extractor.coverage(ar, triples) >= self.min_coverage:
+            return triples
+        return None
+
+    def cache_key(self, ar: dict) -> str:
+        return TripleCache.key(ar['P'], ar['mcall'], self.model, self.PROMPT_VERSION)
+
+    def cached_triples_many(self, ars: Iterable[dict]) -> List[Optional[List[Tuple[str, str, str]]]]:
+        """Triples already in the cache for each AR, None where there are none (never calls the LLM)"""
+        ars = list(ars)
+        if self.cache is None:
+            return [None] * len(ars)
+        return self.cache.get_many([self.cache_key(ar) for ar in ars])
+
     def extract_triples(self, ar: dict) -> List[Tuple[str, str, str]]:
         """
         Extract knowledge triples from an Argument Request (AR)
         Returns list of (subject, predicate, object) tuples
         """
+        local = self._local_triples(ar)
+        if local is not None:
+            return local
+        if self.cache is not None:
+            key = self.cache_key(ar)
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
         try:
-            response = openai.ChatCompletion.create(
-                model=self.model,
-                messages=[{
-                    "role": "user",
-                    "content": self._format_prompt(ar)
-                }],
-                temperature=0.1,
-                max_tokens=1000
-            )
-            return self._parse_response(response.choices[0].message['content'])
+            response = self.backend.complete(self._format_prompt(ar), temperature=0.1, max_tokens=1000)
+            triples = self._parse_response(response)
         except Exception as e:
             print(f"Error extracting triples: {e}")
             return []
+        if self.cache is not None:
+            self.cache.put(key, triples)
+        return triples
+
+    async def aextract_triples_many(self, ars: List[dict]) -> List[List[Tuple[str, str, str]]]:
+        """
+        Async batch version of extract_triples. ARs served locally (per mode) or
+        found in the cache are not requested, and identical ARs within the
+        batch are sent once. Results are returned in input order; an AR whose
+        request still fails after all retries gets an empty list, as in
+        extract_triples, and is not cached.
+        """
+        results = [self._local_triples(ar) for ar in ars]
+        remaining = [i for i, result in enumerate(results) if result is None]
+        if remaining:
+            llm_ars = [ars[i] for i in remaining]
+            for i, result in zip(remaining, await self._llm_triples_many(llm_ars)):
+                results[i] = result
+        return results
+
+    async def _llm_triples_many(self, ars: List[dict]) -> List[List[Tuple[str, str, str]]]:
+        keys = [self.cache_key(ar) for ar in ars]
+        pending = dict(zip(keys, ars))
+        triples = {}
+        if self.cache is not None:
+            for key, cached in zip(list(pending), self.cache.get_many(list(pending))):
+                if cached is not None:
+                    triples[key] = cached
+                    del pending[key]
+        if pending:
+            triples.update(await self._request_triples(pending))
+        return [list(triples[key]) for key in keys]
+
+    async def _request_triples(self, pending: dict) -> dict:
+        """Send the pending {key: AR} requests concurrently; returns {key: triples}"""
+        responses = await self.backend.acomplete_many([self._format_prompt(ar) for ar in pending.values()],
+                                                      temperature=0.1, max_tokens=1000)
+        triples = {}
+        extracted = []
+        for key, response in zip(pending, responses):
+            if isinstance(response, BaseException):
+                print(f"Error extracting triples: {response}")
+                triples[key] = []
+            else:
+                triples[key] = self._parse_response(response)
+                extracted.append((key, triples[key]))
+        if self.cache is not None:
+            self.cache.put_many(extracted)
+        return triples
+
+    def extract_triples_many(self, ars: Iterable[dict]) -> List[List[Tuple[str, str, str]]]:
+        """
+        Extract knowledge triples for many ARs concurrently, with bounded
+        concurrency, token-bucket rate limiting and jittered retries.
+        Returns one list of triples per AR, in input order. Blocking: inside
+        a running event loop (e.g. Jupyter), await aextract_triples_many.
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.aextract_triples_many(list(ars)))
+        raise RuntimeError("extract_triples_many cannot be called from a running event loop; "
+                           "await aextract_triples_many instead")
 
     @staticmethod
     def format_triples(triples: List[Tuple[str, str, str]]) -> str:
@@ -85,6 +212,10 @@ ImageTransformer transformer = new ImageTransformer();""",
     print("Extracted Knowledge Triples:")
     print(KnowledgeTripleExtractor.format_triples(triples))
 
+    # Batch extraction: many ARs concurrently, results in input order
+    batch_triples = extractor.extract_triples_many([input_ar] * 3)
+    print(f"Extracted triples for {len(batch_triples)} ARs")
+
     # Example output would look like:
     # (originalImage, typeOf, Image)
     # (originalImage, hasValue, "path/to/image.jpg")
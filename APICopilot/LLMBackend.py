@@ -0,0 +1,157 @@
+import asyncio
+import re
+import threading
+import time
+from typing import List, Union
+
+import numpy as np
+
+
+class LLMBackend:
+    """
+    Interface of the text-completion backends used by ArgumentRecommender,
+    KnowledgeTripleExtractor and the LLM baselines.
+
+    Subclasses implement complete_many (blocking) or acomplete_many (async);
+    the other one, and complete, are derived from it. complete_many returns one
+    completion per prompt in input order, with the exception in place of a
+    prompt that failed. Every backend records per-prompt latency (from the
+    call until that prompt's completion is ready) for stats().
+    """
+
+    name = "backend"
+    model = None
+
+    def __init__(self):
+        self._stats_lock = threading.Lock()
+        self._latencies = []
+        self._failed = 0
+        self._first_start = None
+        self._last_end = None
+
+    def _record(self, start, end, failed=False):
+        with self._stats_lock:
+            self._latencies.append(end - start)
+            self._failed += failed
+            self._first_start = start if self._first_start is None else min(self._first_start, start)
+            self._last_end = end if self._last_end is None else max(self._last_end, end)
+
+    def complete_many(self, prompts, temperature=0.0, max_tokens=256) -> List[Union[str, BaseException]]:
+        return asyncio.run(self.acomplete_many(list(prompts), temperature, max_tokens))
+
+    async def acomplete_many(self, prompts, temperature=0.0, max_tokens=256) -> List[Union[str, BaseException]]:
+        return await asyncio.to_thread(self.complete_many, list(prompts), temperature, max_tokens)
+
+    def complete(self, prompt, temperature=0.0, max_tokens=256) -> str:
+        """Completion of one prompt; raises the backend's error if it failed"""
+        output = self.complete_many([prompt], temperature, max_tokens)[0]
+        if isinstance(output, BaseException):
+            raise output
+        return output
+
+    def stats(self):
+        """Completed prompts, failures, latency percentiles (seconds) and throughput (prompts/s of wall time)"""
+        with self._stats_lock:
+            latencies = np.array(self._latencies)
+            span = (self._last_end - self._first_start) if self._latencies else 0.0
+            failed = self._failed
+        return {
+            "backend": self.name,
+            "model": self.model,
+            "completed": len(latencies),
+            "failed": failed,
+            "mean_latency": float(latencies.mean()) if len(latencies) else 0.0,
+            "p50_latency": float(np.percentile(latencies, 50)) if len(latencies) else 0.0,
+            "p95_latency": float(np.percentile(latencies, 95)) if len(latencies) else 0.0,
+            "throughput": len(latencies) / span if span > 0 else 0.0,
+        }
+
+
+class StubBackend(LLMBackend):
+    """
+    Deterministic offline backend for tests and benchmarks: the same prompt
+    always gets the same completion, and no model or network is involved.
+    """
+
+    name = "stub"
+
+    missing_arguments_pattern = re.compile(r'/\*\s*Missing Arguments\s*\*/')
+    call_name_pattern = re.compile(r'[\w.$]+$')
+
+    def __init__(self, responses=None, latency=0.0, model="stub"):
+        """
+        Args:
+            responses (dict or callable): Completion per prompt, or a function
+                prompt -> completion. Prompts not covered get the default: the
+                prompt's last open method call, closed with the arguments it
+                already has.
+            latency (float): Seconds each complete_many call sleeps, to stand in
+                for model or network time in benchmarks.
+            model (str): Model name reported in stats and cache keys.
+        """
+        super().__init__()
+        self.responses = responses
+        self.latency = latency
+        self.model = model
+
+    def _respond(self, prompt):
+        if callable(self.responses):
+            return self.responses(prompt)
+        if self.responses is not None and prompt in self.responses:
+            return self.responses[prompt]
+        for line in reversed(prompt.splitlines()):
+            call = self._last_open_call(line.strip())
+            if call is not None:
+                name, arguments = call
+                arguments = self.missing_arguments_pattern.sub('', arguments).strip().rstrip(',').strip()
+                return f"{name}({arguments});"
+        return ""
+
+    @classmethod
+    def _last_open_call(cls, line):
+        """
+        (method name, arguments so far) of the last method call left open on
+        the line, e.g. "t.resize(img, /* Missing Arguments */", or None.
+        Scans from the right, skipping calls that are already closed.
+        """
+        depth = 0
+        for i in range(len(line) - 1, -1, -1):
+            if line[i] == ')':
+                depth += 1
+            elif line[i] == '(':
+                if depth:
+                    depth -= 1
+                    continue
+                name = cls.call_name_pattern.search(line, 0, i)
+                if name:
+                    return name.group(), line[i + 1:]
+        return None
+
+    def complete_many(self, prompts, temperature=0.0, max_tokens=256):
+        start = time.perf_counter()
+        if self.latency:
+            time.sleep(self.latency)
+        outputs = [self._respond(prompt) for prompt in prompts]
+        end = time.perf_counter()
+        for _ in outputs:
+            self._record(start, end)
+        return outputs
+
+
+def format_backend_stats(backends):
+    """Side-by-side latency and throughput table of several backends"""
+    lines = [f"{'backend':<12} {'model':<28} {'done':>6} {'failed':>6} {'p50 ms':>8} {'p95 ms':>8} {'prompts/s':>10}"]
+    for backend in backends:
+        row = backend.stats()
+        lines.append(f"{row['backend']:<12} {str(row['model'])[:28]:<28} {row['completed']:>6} {row['failed']:>6} "
+                     f"{row['p50_latency'] * 1000:>8.1f} {row['p95_latency'] * 1000:>8.1f} {row['throughput']:>10.1f}")
+    return "\n".join(lines)
+
+
+# Example usage
+if __name__ == "__main__":
+    backend = StubBackend(latency=0.01)
+    prompt = "Complete the following method call.\ntransformer.resize(originalImage, /* Missing Arguments */"
+    print("Completion:", backend.complete(prompt))
+    backend.complete_many([prompt] * 32)
+    print(format_backend_stats([backend]))
@@ -0,0 +1,346 @@
+import ast
+import re
+from typing import Iterable, List, Tuple
+
+from ARExtractor import ARExtractor
+
+Triple = Tuple[str, str, str]
+
+
+class LocalTripleExtractor:
+    """
+    Deterministic, offline knowledge triple extraction with the same interface
+    as KnowledgeTripleExtractor. Emits the triples the extraction prompt asks
+    the LLM for:
+
+        (var, typeOf, Type)           declarations, parameters, constructors
+        (var, hasValue, literal)      literal initializers and constructor arguments
+        (var, assignedFrom, source)   assignments from calls or other variables
+        (api, takesArgument, arg)     arguments of the method call, null when missing
+        (receiver, hasMethod, method) the receiver of the method call
+
+    Java code is read with ARExtractor's scanner plus per-statement patterns,
+    since P is usually a fragment no Java grammar accepts; Python code is
+    parsed with ast. Only variables reachable from the method call (through
+    its receiver, its arguments and assignedFrom links) are described.
+    """
+
+    _JAVA_COMMENT_OR_LITERAL = re.compile(
+        r'//[^\n]*|/\*.*?\*/|"""(?:[^"\\]|\\.|"(?!""))*"""|"(?:[^"\\\n]|\\.)*"|\'(?:[^\'\\\n]|\\.)*\'', re.S)
+    _JAVA_ANNOTATION = re.compile(r'@[\w$.]+(?:\s*\([^()]*\))?\s*')
+    _JAVA_MODIFIERS = re.compile(
+        r'^(?:(?:final|static|private|public|protected|transient|volatile|abstract|synchronized)\s+)*')
+    _JAVA_DECLARATION = re.compile(
+        r'(?P<type>[A-Za-z_$][\w$.]*(?:\s*<.*>)?(?:\s*\[\s*\])*)\s+(?P<var>[A-Za-z_$][\w$]*)'
+        r'(?:\s*\[\s*\])*(?:\s*=\s*(?P<init>.+))?', re.S)
+    _JAVA_ASSIGNMENT = re.compile(r'(?P<var>[A-Za-z_$][\w$.]*)\s*=(?!=)\s*(?P<init>.+)', re.S)
+    _JAVA_HEADER = re.compile(
+        r'(?:(?P<name>[A-Za-z_$][\w$]*)\s*)\((?P<params>[^()]*)\)\s*(?:throws\s+[\w$.,\s]+)?$', re.S)
+    _JAVA_KEYWORDS = frozenset(
+        'return throw new else case goto assert yield package import instanceof if while for switch '
+        'catch try do break continue default'.split())
+    _LITERAL = re.compile(
+        r'"\x00\d+"|[-+]?(?:0[xX][\da-fA-F_]+|\d[\d_]*\.?\d*(?:[eE][-+]?\d+)?|\.\d+)[lLfFdD]?'
+        r'|true|false|null|True|False|None')
+    _CALLEE = re.compile(r'(?P<callee>[A-Za-z_$][\w$]*(?:\s*\.\s*[A-Za-z_$][\w$]*)*)\s*\(')
+    _NEW = re.compile(r'new\s+(?P<cls>[A-Za-z_$][\w$.]*)(?:\s*<[^()]*>)?\s*\((?P<args>.*)\)', re.S)
+    _IDENTIFIER = re.compile(r'[A-Za-z_$][\w$]*(?:\.[A-Za-z_$][\w$]*)*')
+    _PENDING_ASSIGNMENT = re.compile(
+        r'(?:(?P<type>[A-Za-z_$][\w$.]*(?:<[^;{}]*>)?(?:\[\])*)\s+)?(?P<var>[A-Za-z_$][\w$.]*)\s*(?::\s*[^=\n]+)?=')
+    _PYTHON_REPAIR_ATTEMPTS = 32
+
+    def __init__(self, language: str = "java"):
+        if language not in ('java', 'python'):
+            raise ValueError(f"Unsupported language: {language}")
+        self.language = language
+
+    # ---- Java -----------------------------------------------------------------
+
+    @classmethod
+    def _mask_java(cls, code):
+        """Drop comments and replace string/char literals by placeholders, so ;{} inside them are inert"""
+        literals = []
+
+        def replace(match):
+            text = match.group()
+            if text.startswith('/'):
+                return ' '
+            literals.append(text)
+            return f'"\x00{len(literals) - 1}"'
+
+        return cls._JAVA_COMMENT_OR_LITERAL.sub(replace, code), literals
+
+    @staticmethod
+    def _unmask(text, literals):
+        return re.sub(r'"\x00(\d+)"', lambda m: literals[int(m.group(1))], text)
+
+    def _java_facts(self, code):
+        masked, literals = self._mask_java(code)
+        facts = {}
+        for statement in re.split(r'[;{}]', masked):
+            statement = self._JAVA_ANNOTATION.sub('', statement).strip()
+            if not statement:
+                continue
+            header = self._JAVA_HEADER.search(statement) if statement.endswith(')') or 'throws' in statement \
+                else None
+            if header and header.group('name') not in ('if', 'while', 'for', 'switch', 'synchronized') \
+                    and not re.search(r'=|\bnew\s*$|\breturn\b', statement[:header.start()]):
+                # Method/constructor/catch parameters: "Type name, Type name"
+                for param in ARExtractor.split_arguments(header.group('params')):
+                    self._java_declaration(self._JAVA_MODIFIERS.sub('', param), facts, literals)
+                continue
+            statement = self._JAVA_MODIFIERS.sub('', statement)
+            if statement.startswith('for') and '(' in statement:
+                statement = statement[statement.index('(') + 1:]
+            if not self._java_declaration(statement, facts, literals):
+                assignment = self._JAVA_ASSIGNMENT.fullmatch(statement)
+                if assignment:
+                    self._record(facts, assignment.group('var'), None,
+                                 self._java_value(assignment.group('var'), assignment.group('init'), literals))
+        return facts
+
+    def _java_declaration(self, statement, facts, literals):
+        declaration = self._JAVA_DECLARATION.fullmatch(statement)
+        if not declaration or declaration.group('type').split('<')[0].strip() in self._JAVA_KEYWORDS:
+            return False
+        var = declaration.group('var')
+        type_name = re.sub(r'\s+', '', declaration.group('type'))
+        init = declaration.group('init')
+        value = self._java_value(var, init, literals) if init else []
+        if type_name == 'var':
+            type_name = next((o for _, p, o in value if p == 'typeOf'), None)
+        value = [triple for triple in value if triple[1] != 'typeOf']
+        self._record(facts, var, type_name, value)
+        return True
+
+    def _java_value(self, var, init, literals):
+        """typeOf/hasValue/assignedFrom triples for var = init"""
+        init = init.strip()
+        if self._LITERAL.fullmatch(init):
+            return [(var, 'hasValue', self._unmask(init, literals))]
+        new = self._NEW.match(init)
+        if new:
+            triples = [(var, 'typeOf', new.group('cls'))]
+            for arg in ARExtractor.split_arguments(new.group('args')):
+                if self._LITERAL.fullmatch(arg):
+                    triples.append((var, 'hasValue', self._unmask(arg, literals)))
+            return triples
+        # Strip casts such as (Image) loader.load(path)
+        init = re.sub(r'^\(\s*[A-Za-z_$][\w$.<>\[\]\s,?]*\)\s*(?=[\w$(])', '', init)
+        call = self._CALLEE.match(init)
+        if call:
+            return [(var, 'assignedFrom', re.sub(r'\s+', '', call.group('callee')))]
+        if self._IDENTIFIER.fullmatch(init):
+            return [(var, 'assignedFrom', init)]
+        return []
+
+    # ---- Python ---------------------------------------------------------------
+
+    def _parse_python_prefix(self, code):
+        """
+        Parse the longest line-prefix of code that is valid Python. P stops at
+        the method call, so its last line (and often an open block header) is
+        incomplete.
+        """
+        lines = code.split('\n')
+        end = len(lines) - 1 if code and not code.endswith('\n') else len(lines)
+        for _ in range(self._PYTHON_REPAIR_ATTEMPTS):
+            if end <= 0:
+                break
+            try:
+                return ast.parse('\n'.join(lines[:end]))
+            except SyntaxError as e:
+                end = min(end - 1, (e.lineno or end) - 1) if e.lineno and e.lineno <= end else end - 1
+        return ast.Module(body=[], type_ignores=[])
+
+    @staticmethod
+    def _python_value(var, value):
+        if isinstance(value, ast.Constant):
+            triples = [(var, 'hasValue', ast.unparse(value))]
+            if value.value is not None:
+                triples.append((var, 'typeOf', type(value.value).__name__))
+            return triples
+        if isinstance(value, ast.Call):
+            callee = ast.unparse(value.func)
+            if callee.split('.')[-1][:1].isupper():
+                triples = [(var, 'typeOf', callee)]
+                triples += [(var, 'hasValue', ast.unparse(arg)) for arg in value.args
+                            if isinstance(arg, ast.Constant)]
+                return triples
+            return [(var, 'assignedFrom', callee)]
+        if isinstance(value, (ast.Name, ast.Attribute)):
+            return [(var, 'assignedFrom', ast.unparse(value))]
+        if isinstance(value, (ast.List, ast.ListComp)):
+            return [(var, 'typeOf', 'list')]
+        if isinstance(value, (ast.Dict, ast.DictComp)):
+            return [(var, 'typeOf', 'dict')]
+        return []
+
+    def _python_facts(self, code):
+        facts = {}
+        for node in ast.walk(self._parse_python_prefix(code)):
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                for arg in node.args.posonlyargs + node.args.args + node.args.kwonlyargs:
+                    annotation = ast.unparse(arg.annotation) if arg.annotation else None
+                    self._record(facts, arg.arg, annotation, [])
+            elif isinstance(node, ast.Assign):
+                for target in node.targets:
+                    if isinstance(target, (ast.Name, ast.Attribute)):
+                        var = ast.unparse(target)
+                        self._record(facts, var, None, self._python_value(var, node.value))
+            elif isinstance(node, ast.AnnAssign) and isinstance(node.target, (ast.Name, ast.Attribute)):
+                var = ast.unparse(node.target)
+                value = self._python_value(var, node.value) if node.value is not None else []
+                self._record(facts, var, ast.unparse(node.annotation),
+                             [triple for triple in value if triple[1] != 'typeOf'])
+            elif isinstance(node, (ast.With, ast.AsyncWith)):
+                for item in node.items:
+                    if isinstance(item.optional_vars, ast.Name):
+                        var = item.optional_vars.id
+                        self._record(facts, var, None, self._python_value(var, item.context_expr))
+        return facts
+
+    # ---- Shared ---------------------------------------------------------------
+
+    @staticmethod
+    def _record(facts, var, type_name, value):
+        """
+        Remember what is known about var. Later statements win, which
+        approximates the binding visible at the method call.
+        """
+        fact = facts.setdefault(var, {'type': None, 'value': []})
+        type_name = type_name or next((o for _, p, o in value if p == 'typeOf'), None)
+        if type_name:
+            fact['type'] = type_name
+        if type_name or value:
+            fact['value'] = [triple for triple in value if triple[1] != 'typeOf']
+
+    @staticmethod
+    def _root(name):
+        return name.split('.')[0]
+
+    def _call_parts(self, ar):
+        """(callee, arguments) of the AR's method call; missing arguments are None"""
+        mcall = ar['mcall']
+        if self.language == 'java':
+            mcall, literals = self._mask_java(mcall)
+        else:
+            literals = []
+        call = self._CALLEE.search(mcall)
+        if not call:
+            return None, []
+        callee = re.sub(r'\s+', '', call.group('callee'))
+        if callee.startswith('new.'):
+            callee = callee[4:]
+        args = [None if ARExtractor.is_placeholder(arg) else self._unmask(arg, literals)
+                for arg in ARExtractor.call_arguments(mcall, call.end() - 1, self.language)]
+        if isinstance(ar.get('Args'), list):
+            for arg in ar['Args']:
+                if isinstance(arg, tuple) and len(arg) == 2 and isinstance(arg[1], int):
+                    value, position = arg
+                    while len(args) <= position:
+                        args.append(None)
+                    if args[position] is None and value is not None:
+                        args[position] = value
+        return callee, args
+
+    def extract_triples(self, ar: dict) -> List[Triple]:
+        """
+        Extract knowledge triples from an Argument Request (AR)
+        Returns list of (subject, predicate, object) tuples
+        """
+        callee, args = self._call_parts(ar)
+        if callee is None:
+            return []
+        facts = self._java_facts(ar['P']) if self.language == 'java' else self._python_facts(ar['P'])
+        triples = []
+        if '.' in callee:
+            receiver, method = callee.rsplit('.', 1)
+            triples.append((receiver, 'hasMethod', method))
+        for arg in args:
+            triples.append((callee, 'takesArgument', 'null' if arg is None else arg))
+        # "Type var = " right before the call: the call's result is assigned to var
+        tail = ar['P'][-512:]
+        tail = tail[max(tail.rfind(c) for c in ';{}\n') + 1:].strip()
+        if self.language == 'java':
+            tail = self._JAVA_MODIFIERS.sub('', tail)
+        pending = self._PENDING_ASSIGNMENT.fullmatch(tail) if tail.endswith('=') else None
+        if pending and pending.group('var') not in self._JAVA_KEYWORDS:
+            triples.append((pending.group('var'), 'assignedFrom', callee))
+            if pending.group('type') and pending.group('type') not in self._JAVA_KEYWORDS:
+                triples.append((pending.group('var'), 'typeOf', pending.group('type')))
+
+        # Describe the variables the call depends on, following assignedFrom links
+        queue = [callee.rsplit('.', 1)[0]] if '.' in callee else []
+        queue += [arg for arg in args if arg is not None and self._IDENTIFIER.fullmatch(arg)]
+        seen = set()
+        while queue:
+            name = queue.pop(0)
+            for var in (name, self._root(name)):
+                if var in seen or var not in facts:
+                    continue
+                seen.add(var)
+                fact = facts[var]
+                if fact['type']:
+                    triples.append((var, 'typeOf', fact['type']))
+                for triple in fact['value']:
+                    triples.append(triple)
+                    if triple[1] == 'assignedFrom':
+                        source = triple[2]
+                        queue.append(source.rsplit('.', 1)[0] if '(' not in source and source not in facts
+                                     else source)
+        # Repeated takesArgument triples are distinct argument positions; other duplicates are dropped
+        seen = set()
+        unique = []
+        for triple in triples:
+            if triple[1] == 'takesArgument' or triple not in seen:
+                seen.add(triple)
+                unique.append(triple)
+        return unique
+
+    def extract_triples_many(self, ars: Iterable[dict]) -> List[List[Triple]]:
+        return [self.extract_triples(ar) for ar in ars]
+
+    def coverage(self, ar: dict, triples: List[Triple]) -> float:
+        """
+        Share of the variables the method call uses (its receiver and plain
+        identifier arguments) that the triples describe. Type names, this,
+        self and literals need no description.
+        """
+        callee, args = self._call_parts(ar)
+        if callee is None:
+            return 0.0
+        names = [self._root(callee)] if '.' in callee else []
+        names += [self._root(arg) for arg in args if arg is not None and self._IDENTIFIER.fullmatch(arg)
+                  and not self._LITERAL.fullmatch(arg)]
+        names = [name for name in dict.fromkeys(names)
+                 if name not in ('this', 'self', 'super', 'cls') and not name[:1].isupper()]
+        if not names:
+            return 1.0
+        described = {s for s, p, _ in triples if p in ('typeOf', 'hasValue', 'assignedFrom')}
+        return sum(name in described for name in names) / len(names)
+
+
+# Example usage
+if __name__ == "__main__":
+    extractor = LocalTripleExtractor("java")
+    input_ar = {
+        'P': """Image originalImage = new Image("path/to/image.jpg");
+ImageTransformer transformer = new ImageTransformer();
+Image resized = """,
+        'mcall': "transformer.resize(originalImage, /* Missing Arguments */",
+        'Args': [(None, 1), (None, 2)]
+    }
+    triples = extractor.extract_triples(input_ar)
+    for s, p, o in triples:
+        print(f"({s}, {p}, {o})")
+    print("Coverage:", extractor.coverage(input_ar, triples))
+
+    python_extractor = LocalTripleExtractor("python")
+    python_ar = {
+        'P': "from PIL import Image\n\ndef thumbnail(path: str, size: int):\n    img = Image.open(path)\n    ",
+        'mcall': "img.resize((size, size), ",
+        'Args': [('(size, size)', 0), (None, 1)]
+    }
+    for s, p, o in python_extractor.extract_triples(python_ar):
+        print(f"({s}, {p}, {o})")
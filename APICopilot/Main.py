@@ -1,5 +1,51 @@
+import os
+import threading
+from collections import Counter
+from itertools import islice
+
+from ARExtractor import ARExtractor
+from ArgumentRecommender import ArgumentRecommender
+from CheckpointStore import CheckpointStore
+from CorpusExtractor import CorpusExtractor, find_source_files
+from ExampleRetriever import ExampleRetriever
+from PipelineExecutor import PipelineExecutor, Stage
+from GraphMatcher import GraphMatcher
+from KnowledgeGraphBuilder import KnowledgeGraphBuilder
+from KnowledgeTripleExtractor import KnowledgeTripleExtractor
+from LLMBackend import format_backend_stats
+from PromptDataset import PromptDataset
+from PromptGenerator import PromptGenerator, TokenCounter
+
+DATASET_LANGUAGES = {
+    "eclipse": "java",
+    "netbeans": "java",
+    "py150": "python",
+}
+
+
+def _top_k_subgraphs(job):
+    """
+    Top-k KG_examples subgraphs matching G_input, as triples with their NERP
+    score. Module-level so the search can run in a worker process.
+    """
+    matcher, top_k = job
+    matched = []
+    for mapping, score in matcher.get_top_k_subgraphs(top_k):
+        triples = [(u, data.get('label', ''), v) for u, v, data in matcher.kg_examples.edges(data=True)
+                   if u in mapping and v in mapping]
+        matched.append({'knowledge_triples': triples, 'mapping': mapping, 'score': score})
+    return matched
+
 class APICopilot:
-    def __init__(self, dataset_type, dataset_path, openai_api_key):
+    top_k = 3
+    # Prompt length limit in tokens of prompt_tokenizer (see PromptGenerator); None = unbounded
+    prompt_token_budget = 4096
+    # tiktoken encoding name or tokenizer object; None = GPT-4o's encoding when available
+    prompt_tokenizer = None
+
+    def __init__(self, dataset_type, dataset_path, openai_api_key, triple_cache_path="triple_cache.sqlite",
+                 triple_mode="llm", training_ars=(), checkpoint_dir=None,
+                 response_cache_path="response_cache.sqlite", replay=False, llm_backend=None):
         """
         Initialize APICopilot with dataset and OpenAI API key.
 
@@ -7,10 +53,23 @@ class APICopilot:
             dataset_type (str): Type of dataset ('eclipse', 'netbeans', 'py150').
             dataset_path (str): Path to the dataset.
             openai_api_key (str): OpenAI API key for LLM-based predictions.
+            triple_cache_path (str): SQLite file caching extracted knowledge triples across runs.
+            triple_mode (str): 'llm', 'local' (offline, no API calls) or 'local-first'
+                (offline, with LLM fallback when the local triples cover too little).
+            training_ars (iterable): ARs the example retriever searches for similar examples.
+            checkpoint_dir (str): Directory of an append-only CheckpointStore; when set,
+                the streaming pipeline records every stage output per AR and can resume.
+            response_cache_path (str): SQLite file caching LLM completions across runs
+                (or a ResponseCache, to configure eviction; None disables caching).
+            replay (bool): Answer every prompt from the response cache, opened read-only,
+                without calling the API (for reproducing published results offline).
+            llm_backend (LLMBackend): Backend for triple extraction and argument recommendation,
+                e.g. a HuggingFaceBackend to run offline; None uses the OpenAI API.
         """
         self.dataset_type = dataset_type
         self.dataset_path = dataset_path
         self.openai_api_key = openai_api_key
+        self.language = DATASET_LANGUAGES.get(dataset_type)
 
         # Initialize preprocessing module based on dataset type
         if self.dataset_type == "eclipse":
@@ -24,84 +83,445 @@ class APICopilot:
 
         # Initialize other components
         self.ar_extractor = ARExtractor()
-        self.example_retriever = ExampleRetriever()
-        self.knowledge_triple_extractor = KnowledgeTripleExtractor()
-        self.knowledge_graph_builder = KnowledgeGraphBuilder()
-        self.graph_matcher = GraphMatcher()
-        self.prompt_generator = PromptGenerator()
-        self.argument_recommender = ArgumentRecommender(openai_api_key)
+        self.knowledge_triple_extractor = KnowledgeTripleExtractor(openai_api_key, cache=triple_cache_path,
+                                                                   mode=triple_mode, language=self.language,
+                                                                   backend=llm_backend)
+        self.example_retriever = ExampleRetriever(training_ars, triple_extractor=self.knowledge_triple_extractor)
+        # Knowledge graphs, graph matchers and prompt generators are built per AR
+        self.checkpoints = CheckpointStore(checkpoint_dir) if checkpoint_dir else None
+        self.argument_recommender = ArgumentRecommender(openai_api_key, cache=response_cache_path, replay=replay,
+                                                        backend=llm_backend)
+        self.token_counter = TokenCounter(self.prompt_tokenizer)
+        # Prompt tokens per section summed over every generated prompt, for the run summary
+        self.prompt_tokens = Counter()
+        self._prompt_tokens_lock = threading.Lock()
 
     def preprocess_dataset(self):
         """Preprocess the dataset using the appropriate preprocessor."""
         print("Preprocessing dataset...")
-        self.preprocessed_data = self.preprocessor.preprocess()
+        self.preprocessed_data = list(self.preprocessor.preprocess())
         print(f"Preprocessing complete. Found {len(self.preprocessed_data)} files.")
 
     def extract_argument_requests(self):
         """Extract Argument Requests (ARs) from preprocessed data."""
         print("Extracting Argument Requests...")
-        self.ar_tuples = self.ar_extractor.extract_ar(self.preprocessed_data)
+        self.ar_tuples = []
+        for code in self.preprocessed_data:
+            self.ar_tuples.extend(self.ar_extractor.extract_ar(code, self.language))
         print(f"Extracted {len(self.ar_tuples)} AR tuples.")
 
+    def extract_corpus(self, output_dir, workers=None, output_format="jsonl"):
+        """
+        Extract ARs from every source file under dataset_path across all cores,
+        streaming them into sharded files in output_dir.
+        """
+        print("Extracting Argument Requests from corpus...")
+        extractor = CorpusExtractor(self.language, output_dir, workers=workers,
+                                    output_format=output_format)
+        summary = extractor.extract(find_source_files(self.dataset_path, self.language))
+        print(f"Extracted {summary['ars']} AR tuples from {summary['files']} files "
+              f"({summary['errors']} failed) into {len(summary['shards'])} shards.")
+        return summary
+
+    # ---- Per-AR stage steps, shared by the batch and streaming pipelines ----
+
+    def _retrieve_examples_for(self, ars):
+        return self.example_retriever.retrieve_examples_many(ars, top_k=self.top_k)
+
+    def _extract_triples_for(self, ars, example_lists):
+        """(ar_triples, example_triples) per AR, from one concurrent batch over the ARs and their examples"""
+        batch = []
+        for ar, examples in zip(ars, example_lists):
+            batch.append(ar)
+            batch.extend(example['ar'] for example in examples)
+        batch_triples = iter(self.knowledge_triple_extractor.extract_triples_many(batch))
+        knowledge_triples = []
+        for examples in example_lists:
+            ar_triples = next(batch_triples)
+            example_triples = [next(batch_triples) for _ in examples]
+            knowledge_triples.append((ar_triples, example_triples))
+        return knowledge_triples
+
+    @staticmethod
+    def _build_knowledge_graph(ar_triples, example_triples):
+        """(G_input, KG_examples) of one AR; a fresh builder keeps ARs from sharing graphs"""
+        builder = KnowledgeGraphBuilder()
+        builder.build_g_input({'knowledge_triples': ar_triples})
+        builder.build_kg_examples([{'knowledge_triples': triples} for triples in example_triples])
+        return builder.get_g_input(), builder.get_kg_examples()
+
+    def _graph_matcher(self, kg_input, kg_examples):
+        return GraphMatcher(kg_examples, kg_input, embedding_service=self.example_retriever.embedding_service)
+
+    def _match_subgraphs(self, kg_input, kg_examples):
+        return _top_k_subgraphs((self._graph_matcher(kg_input, kg_examples), self.top_k))
+
+    @staticmethod
+    def _prompt_inputs(ar, ar_triples, examples, example_triples, matched_subgraphs):
+        """(input_ar, top_graphs, example_ars) as PromptGenerator takes them"""
+        input_ar = {'P': ar['P'], 'mcall': ar['mcall'], 'Args': ar['Args'], 'knowledge_triples': ar_triples}
+        example_ars = [dict(example, knowledge_triples=triples) for example, triples in zip(examples, example_triples)]
+        return input_ar, matched_subgraphs, example_ars
+
+    def _prompt_records(self, items):
+        """PromptGenerator.render_many records of prompt_inputs items, tallying their token counts"""
+        records = PromptGenerator.render_many(items, token_budget=self.prompt_token_budget,
+                                              tokenizer=self.token_counter, max_examples=self.top_k,
+                                              token_counts=True)
+        for record in records:
+            with self._prompt_tokens_lock:
+                self.prompt_tokens.update(record["Token Counts"])
+                self.prompt_tokens['prompts'] += 1
+            yield record
+
+    def _generate_prompt(self, ar, ar_triples, examples, example_triples, matched_subgraphs):
+        items = [self._prompt_inputs(ar, ar_triples, examples, example_triples, matched_subgraphs)]
+        return next(self._prompt_records(items))["Prompt"]
+
+    # ---- Batch stages: each runs over every AR and keeps its output on self ----
+
     def retrieve_examples(self):
         """Retrieve similar examples for each AR."""
         print("Retrieving similar examples...")
-        self.example_ars = []
-        for ar in self.ar_tuples:
-            examples = self.example_retriever.retrieve_examples(ar)
-            self.example_ars.append(examples)
+        self.example_ars = self._retrieve_examples_for(self.ar_tuples)
         print(f"Retrieved examples for {len(self.example_ars)} ARs.")
 
     def extract_knowledge_triples(self):
         """Extract knowledge triples from ARs and examples."""
         print("Extracting knowledge triples...")
-        self.knowledge_triples = []
-        for ar, examples in zip(self.ar_tuples, self.example_ars):
-            ar_triples = self.knowledge_triple_extractor.extract_triples(ar)
-            example_triples = [self.knowledge_triple_extractor.extract_triples(ex) for ex in examples]
-            self.knowledge_triples.append((ar_triples, example_triples))
+        self.knowledge_triples = self._extract_triples_for(self.ar_tuples, self.example_ars)
         print("Knowledge triples extracted.")
 
     def build_knowledge_graphs(self):
         """Build knowledge graphs from knowledge triples."""
         print("Building knowledge graphs...")
-        self.knowledge_graphs = []
-        for ar_triples, example_triples in self.knowledge_triples:
-            kg_input = self.knowledge_graph_builder.build_g_input(ar_triples)
-            kg_examples = self.knowledge_graph_builder.build_kg_examples(example_triples)
-            self.knowledge_graphs.append((kg_input, kg_examples))
+        self.knowledge_graphs = [self._build_knowledge_graph(ar_triples, example_triples)
+                                 for ar_triples, example_triples in self.knowledge_triples]
         print("Knowledge graphs constructed.")
 
     def perform_graph_matching(self):
         """Perform graph matching to find similar subgraphs."""
         print("Performing graph matching...")
-        self.matched_subgraphs = []
-        for kg_input, kg_examples in self.knowledge_graphs:
-            matched = self.graph_matcher.find_isomorphic_subgraphs(kg_input, kg_examples)
-            self.matched_subgraphs.append(matched)
+        self.matched_subgraphs = [self._match_subgraphs(kg_input, kg_examples)
+                                  for kg_input, kg_examples in self.knowledge_graphs]
         print(f"Found {sum(len(m) for m in self.matched_subgraphs)} matched subgraphs.")
 
-    def generate_prompts(self):
-        """Generate prompts for LLM-based argument completion."""
+    def generate_prompts(self, output_path=None):
+        """
+        Generate prompts for LLM-based argument completion. With output_path,
+        every prompt record is also streamed to that JSONL PromptDataset, in
+        the GeneratedPrompts shape (see PromptGenerator.render_many).
+        """
         print("Generating prompts...")
+        items = (self._prompt_inputs(ar, ar_triples, examples, example_triples, matched_subgraphs)
+                 for ar, examples, (ar_triples, example_triples), matched_subgraphs in zip(
+                     self.ar_tuples, self.example_ars, self.knowledge_triples, self.matched_subgraphs))
         self.prompts = []
-        for ar, matched_subgraphs in zip(self.ar_tuples, self.matched_subgraphs):
-            prompt = self.prompt_generator.generate_prompt(ar, matched_subgraphs)
-            self.prompts.append(prompt)
+        records = self._prompt_records(items)
+        if output_path is not None:
+            records = self._keep_prompts(records)
+            PromptDataset.write(records, output_path).close()
+            print(f"Wrote prompt records to {output_path}.")
+        else:
+            self.prompts = [record["Prompt"] for record in records]
         print(f"Generated {len(self.prompts)} prompts.")
 
+    def _keep_prompts(self, records):
+        for record in records:
+            self.prompts.append(record["Prompt"])
+            yield record
+
     def recommend_arguments(self):
         """Recommend arguments using LLM-based prediction."""
         print("Recommending arguments...")
-        self.recommended_arguments = []
-        for prompt in self.prompts:
-            args = self.argument_recommender.recommend_arguments(prompt)
-            self.recommended_arguments.append(args)
+        self.recommended_arguments = self.argument_recommender.recommend_many(self.prompts)
         print(f"Recommended arguments for {len(self.recommended_arguments)} ARs.")
 
-    def run_pipeline(self):
-        """Run the full APICopilot pipeline."""
+    # ---- Streaming ----
+
+    def iter_argument_requests(self):
+        """Lazily extract ARs file by file; preprocess() may return any iterable of source code"""
+        for code in self.preprocessor.preprocess():
+            yield from self.ar_extractor.extract_ar(code, self.language)
+
+    def iter_recommendations(self, ars=None, chunk_size=16, resume=True):
+        """
+        Run every stage end to end on chunks of chunk_size ARs and yield one
+        result dict per AR as soon as its chunk is done. Only one chunk's
+        intermediate results are alive at a time, and nothing is stored on
+        self. Chunking keeps the batched retrieval and the concurrent triple
+        extraction; every step is the same one the batch stages use, so the
+        results equal those of run_pipeline().
+
+        With a checkpoint store every stage output is checkpointed per AR
+        (see _iter_checkpointed); resume=False recomputes everything but
+        still records it.
+        """
+        ars = self.iter_argument_requests() if ars is None else iter(ars)
+        if self.checkpoints is not None:
+            yield from self._iter_checkpointed(ars, chunk_size, resume)
+            return
+        while True:
+            chunk = list(islice(ars, chunk_size))
+            if not chunk:
+                return
+            example_lists = self._retrieve_examples_for(chunk)
+            knowledge_triples = self._extract_triples_for(chunk, example_lists)
+            prompts = []
+            for ar, examples, (ar_triples, example_triples) in zip(chunk, example_lists, knowledge_triples):
+                kg_input, kg_examples = self._build_knowledge_graph(ar_triples, example_triples)
+                matched_subgraphs = self._match_subgraphs(kg_input, kg_examples)
+                prompts.append(self._generate_prompt(ar, ar_triples, examples, example_triples, matched_subgraphs))
+            recommendations = self.argument_recommender.recommend_many(prompts)
+            for ar, prompt, recommended_arguments in zip(chunk, prompts, recommendations):
+                yield {'ar': ar, 'prompt': prompt, 'recommended_arguments': recommended_arguments}
+
+    # ---- Checkpointing ----
+
+    @staticmethod
+    def _ar_id(ar):
+        return CheckpointStore.fingerprint(ar['P'], ar['mcall'], ar['Args'])
+
+    def _stage_configs(self):
+        """Settings each checkpointed stage output depends on besides its data inputs"""
+        extractor = self.knowledge_triple_extractor
+        return {
+            'retrieval': (len(self.example_retriever.training_ars), self.top_k,
+                          getattr(self.example_retriever.embedding_service, 'model_name', None)),
+            'triples': (extractor.model, extractor.mode, extractor.PROMPT_VERSION, extractor.min_coverage,
+                        self.language),
+            'matches': (GraphMatcher.similarity_threshold, GraphMatcher.filter_candidates,
+                        GraphMatcher.time_budget, GraphMatcher.max_expansions, self.top_k),
+            'prompt': (PromptGenerator.PROMPT_VERSION, self.prompt_token_budget, self.token_counter.name),
+            'recommendation': (type(self.argument_recommender).__name__,
+                               getattr(self.argument_recommender, 'expected_types', None),
+                               getattr(self.argument_recommender, 'model', None),
+                               getattr(self.argument_recommender, 'temperature', None),
+                               getattr(self.argument_recommender, 'max_tokens', None)),
+        }
+
+    def _checkpointed(self, ar_id, stage, inputs, compute, resume):
+        """Stored output of stage when its inputs are unchanged (and resume is on), else compute and record it"""
+        if resume:
+            output = self.checkpoints.get(ar_id, stage, inputs)
+            if output is not None:
+                return output
+        output = compute()
+        self.checkpoints.put(ar_id, stage, inputs, output)
+        return output
+
+    @staticmethod
+    def _as_triples(triples):
+        return [tuple(triple) for triple in triples]
+
+    def _iter_checkpointed(self, ars, chunk_size, resume):
+        """
+        iter_recommendations with every stage output (triples, matches, prompt,
+        recommendation) appended to the checkpoint store, keyed per AR on a
+        fingerprint of the stage's inputs and settings.
+
+        On resume, an AR finished under the same settings is answered from the
+        store without any recomputation. Any other AR reuses each stored stage
+        output whose inputs are unchanged, so e.g. a new recommender model only
+        re-runs recommendation, and a crash loses at most the ARs in flight.
+        """
+        store = self.checkpoints
+        configs = self._stage_configs()
+        run_fingerprint = store.fingerprint(configs)
+        while True:
+            chunk = list(islice(ars, chunk_size))
+            if not chunk:
+                store.sync()
+                return
+            ar_ids = [self._ar_id(ar) for ar in chunk]
+            todo = [i for i, ar_id in enumerate(ar_ids) if not (resume and store.has(ar_id, 'done', run_fingerprint))]
+            todo_ars = [chunk[i] for i in todo]
+            example_lists = dict(zip(todo, self._retrieve_examples_for(todo_ars)))
+
+            # Triples: one concurrent batch over the ARs whose triples are not stored
+            triple_inputs = {i: store.fingerprint(ar_ids[i], [self._ar_id(example['ar']) for example in example_lists[i]],
+                                                  configs['retrieval'], configs['triples']) for i in todo}
+            knowledge_triples = {}
+            for i in todo:
+                stored = store.get(ar_ids[i], 'triples', triple_inputs[i]) if resume else None
+                if stored is not None:
+                    knowledge_triples[i] = stored
+            missing = [i for i in todo if i not in knowledge_triples]
+            extracted = self._extract_triples_for([chunk[i] for i in missing], [example_lists[i] for i in missing])
+            for i, (ar_triples, example_triples) in zip(missing, extracted):
+                knowledge_triples[i] = [ar_triples, example_triples]
+                store.put(ar_ids[i], 'triples', triple_inputs[i], knowledge_triples[i])
+
+            prompts, recommendation_inputs = {}, {}
+            for i in todo:
+                ar, ar_id, examples = chunk[i], ar_ids[i], example_lists[i]
+                ar_triples = self._as_triples(knowledge_triples[i][0])
+                example_triples = [self._as_triples(triples) for triples in knowledge_triples[i][1]]
+
+                def match():
+                    return self._match_subgraphs(*self._build_knowledge_graph(ar_triples, example_triples))
+
+                matched_subgraphs = self._checkpointed(
+                    ar_id, 'matches', store.fingerprint(ar_triples, example_triples, configs['matches']),
+                    match, resume)
+                for matched in matched_subgraphs:
+                    matched['knowledge_triples'] = self._as_triples(matched['knowledge_triples'])
+                prompts[i] = self._checkpointed(
+                    ar_id, 'prompt', store.fingerprint(triple_inputs[i], ar_triples, example_triples, matched_subgraphs,
+                                                       configs['prompt']),
+                    lambda: self._generate_prompt(ar, ar_triples, examples, example_triples, matched_subgraphs),
+                    resume)
+                recommendation_inputs[i] = store.fingerprint(prompts[i], configs['recommendation'])
+
+            # Recommendations: one concurrent batch over the prompts whose recommendation is not stored
+            recommendations = {}
+            for i in todo:
+                stored = store.get(ar_ids[i], 'recommendation', recommendation_inputs[i]) if resume else None
+                if stored is not None:
+                    recommendations[i] = stored
+            missing = [i for i in todo if i not in recommendations]
+            recommended = self.argument_recommender.recommend_many([prompts[i] for i in missing])
+            for i, recommended_arguments in zip(missing, recommended):
+                recommendations[i] = recommended_arguments
+                store.put(ar_ids[i], 'recommendation', recommendation_inputs[i], recommended_arguments)
+
+            for i, (ar, ar_id) in enumerate(zip(chunk, ar_ids)):
+                if i not in example_lists:
+                    yield {
+                        'ar': ar,
+                        'prompt': store.latest(ar_id, 'prompt'),
+                        'recommended_arguments': store.latest(ar_id, 'recommendation'),
+                    }
+                    continue
+                store.put(ar_id, 'done', run_fingerprint, None)
+                yield {'ar': ar, 'prompt': prompts[i], 'recommended_arguments': recommendations[i]}
+
+    # ---- Stage-parallel execution ----
+
+    def _parallel_retrieve(self, ar):
+        return {'ar': ar, 'examples': self._retrieve_examples_for([ar])[0]}
+
+    def _parallel_extract_triples(self, item):
+        item['ar_triples'], item['example_triples'] = self._extract_triples_for([item['ar']], [item['examples']])[0]
+        return item
+
+    def _parallel_prepare_matching(self, item):
+        """Build the graphs and embed their nodes here, so the match stage is pure CPU"""
+        kg_input, kg_examples = self._build_knowledge_graph(item['ar_triples'], item['example_triples'])
+        item['matcher'] = self._graph_matcher(kg_input, kg_examples)
+        item['matcher']._prepare()
+        return item
+
+    def _parallel_recommend(self, item):
+        prompt = self._generate_prompt(item['ar'], item['ar_triples'], item['examples'],
+                                       item['example_triples'], item['matched'])
+        return {
+            'ar': item['ar'],
+            'prompt': prompt,
+            'recommended_arguments': self.argument_recommender.recommend_arguments(prompt),
+        }
+
+    @staticmethod
+    def _merge_matches(item, matched):
+        del item['matcher']
+        item['matched'] = matched
+        return item
+
+    def pipeline_executor(self, triple_workers=8, match_workers=None, recommend_workers=8, queue_size=32):
+        """
+        Stage-parallel executor over the pipeline steps: network-bound stages
+        (triple extraction, recommendation) get thread pools, VF2 matching gets
+        a process pool; retrieval and node embedding run in threads since torch
+        releases the GIL. Stages are joined by bounded queues.
+        """
+        return PipelineExecutor([
+            Stage('retrieve', self._parallel_retrieve),
+            Stage('triples', self._parallel_extract_triples, workers=triple_workers),
+            Stage('embed', self._parallel_prepare_matching),
+            Stage('match', _top_k_subgraphs, workers=match_workers or os.cpu_count(), kind='process',
+                  select=lambda item: (item['matcher'], self.top_k), merge=self._merge_matches),
+            Stage('recommend', self._parallel_recommend, workers=recommend_workers),
+        ], queue_size=queue_size)
+
+    def iter_recommendations_parallel(self, ars=None, executor=None):
+        """
+        Same results as iter_recommendations(), in the same order, with all
+        stages working concurrently on different ARs. Pass an executor from
+        pipeline_executor() to tune workers or read its stats() afterwards.
+        """
+        ars = self.iter_argument_requests() if ars is None else ars
+        executor = executor or self.pipeline_executor()
+        return executor.run(ars)
+
+    @staticmethod
+    def _display_result(ar, args):
+        print(f"\nMethod Call: {ar['mcall']}")
+        print(f"Recommended Arguments: {args}")
+
+    def _print_run_summary(self):
+        """Cache hit rates, prompt token counts per section, and latency/throughput of every LLM backend used"""
+        caches = [("Triple cache", self.knowledge_triple_extractor.cache),
+                  ("Response cache", getattr(self.argument_recommender, 'cache', None))]
+        for name, cache in caches:
+            if cache is not None:
+                info = cache.cache_info()
+                print(f"{name}: {info['hits']} hits, {info['misses']} misses "
+                      f"({info['hit_rate']:.1%} hit rate), {info['size']} entries")
+        prompts = self.prompt_tokens['prompts']
+        if prompts:
+            sections = ", ".join(f"{name} {self.prompt_tokens[name] / prompts:.0f}" for name in PromptGenerator.SECTIONS)
+            print(f"Prompt tokens ({self.token_counter.name}): {self.prompt_tokens['total']} over {prompts} prompts, "
+                  f"{self.prompt_tokens['total'] / prompts:.0f} per prompt ({sections})")
+            if self.prompt_tokens['over_budget']:
+                print(f"{self.prompt_tokens['over_budget']} prompts exceed the budget of {self.prompt_token_budget} "
+                      f"tokens even without graphs, examples and code context")
+        backends = []
+        for component in (self.knowledge_triple_extractor, self.argument_recommender):
+            backend = getattr(component, 'backend', None)
+            if backend is not None and backend not in backends and backend.stats()['completed']:
+                backends.append(backend)
+        if backends:
+            print(format_backend_stats(backends))
+
+    def run_pipeline(self, stream=False, chunk_size=16, parallel=False, resume=True):
+        """
+        Run the full APICopilot pipeline.
+
+        Args:
+            stream (bool): Process ARs end to end in chunks and print each
+                recommendation as soon as it is ready, with memory bounded by
+                chunk_size instead of the corpus size. Batch mode (the default)
+                keeps every stage's output on self for inspection.
+            chunk_size (int): ARs per chunk in streaming mode.
+            parallel (bool): Stream with every stage running concurrently in its
+                own worker pool (see pipeline_executor) and report per-stage
+                throughput and queue depth at the end.
+            resume (bool): With a checkpoint_dir, skip ARs already completed under
+                the same settings and reuse stage outputs whose inputs are
+                unchanged. Checkpointing always runs through the streaming
+                pipeline, so a checkpoint_dir implies stream=True.
+        """
         print("Starting APICopilot pipeline...")
+        if parallel and self.checkpoints is None:
+            executor = self.pipeline_executor()
+            count = 0
+            for result in self.iter_recommendations_parallel(executor=executor):
+                self._display_result(result['ar'], result['recommended_arguments'])
+                count += 1
+            print(f"APICopilot pipeline completed. Recommended arguments for {count} ARs.")
+            print(executor.format_stats())
+            self._print_run_summary()
+            return
+
+        if stream or self.checkpoints is not None:
+            count = 0
+            for result in self.iter_recommendations(chunk_size=chunk_size, resume=resume):
+                self._display_result(result['ar'], result['recommended_arguments'])
+                count += 1
+            print(f"APICopilot pipeline completed. Recommended arguments for {count} ARs.")
+            self._print_run_summary()
+            return
+
         self.preprocess_dataset()
         self.extract_argument_requests()
         self.retrieve_examples()
@@ -114,8 +534,8 @@ class APICopilot:
 
         # Display results
         for ar, args in zip(self.ar_tuples, self.recommended_arguments):
-            print(f"\nMethod Call: {ar['mcall']}")
-            print(f"Recommended Arguments: {args}")
+            self._display_result(ar, args)
+        self._print_run_summary()
 
 # Example usage
 if __name__ == "__main__":
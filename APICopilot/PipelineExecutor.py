@@ -0,0 +1,263 @@
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+_STOP = object()
+
+
+class _Failure:
+    """An exception raised by a stage, carried downstream in place of the item"""
+
+    def __init__(self, stage, error):
+        self.stage = stage
+        self.error = error
+
+
+class Stage:
+    def __init__(self, name, fn, workers=1, kind='thread', queue_size=None, select=None, merge=None):
+        """
+        One step of a PipelineExecutor.
+
+        Args:
+            name (str): Name used in the stats.
+            fn (callable): Maps one item to one item. Process stages need a
+                picklable (module-level) function and picklable arguments.
+            workers (int): Items processed concurrently by this stage.
+            kind (str): 'thread' for I/O-bound steps (network calls, or code
+                that releases the GIL such as torch), 'process' for pure
+                Python CPU-bound steps.
+            queue_size (int): Capacity of this stage's input queue; defaults to
+                the executor's queue_size.
+            select (callable): Optional item -> fn argument, so a process stage
+                only ships the data it needs to the worker process.
+            merge (callable): Optional (item, fn result) -> output item, run in
+                the stage's thread; defaults to passing on the fn result.
+        """
+        if kind not in ('thread', 'process'):
+            raise ValueError(f"Unsupported stage kind: {kind}")
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+        self.kind = kind
+        self.queue_size = queue_size
+        self.select = select
+        self.merge = merge
+
+    def __call__(self, item, pool=None):
+        arg = self.select(item) if self.select is not None else item
+        result = pool.submit(self.fn, arg).result() if pool is not None else self.fn(arg)
+        return self.merge(item, result) if self.merge is not None else result
+
+
+class _StageStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.processed = 0
+        self.failed = 0
+        self.busy = 0.0
+        self.depth_sum = 0
+        self.depth_samples = 0
+        self.max_depth = 0
+
+    def sample_depth(self, depth):
+        with self.lock:
+            self.depth_sum += depth
+            self.depth_samples += 1
+            self.max_depth = max(self.max_depth, depth)
+
+    def record(self, seconds, failed):
+        with self.lock:
+            self.processed += 1
+            self.failed += failed
+            self.busy += seconds
+
+
+class PipelineExecutor:
+    def __init__(self, stages, queue_size=32, ordered=True):
+        """
+        Run items through a chain of stages concurrently. Every stage has its
+        own worker pool and reads from a bounded input queue, so a slow stage
+        fills its queue and blocks the stages before it (backpressure) instead
+        of letting work pile up in memory.
+
+        Args:
+            stages (list[Stage]): Steps in order; each maps an item to the next stage's input.
+            queue_size (int): Default capacity of each stage's input queue.
+            ordered (bool): Yield results in input order. The number of items in
+                flight is then capped so the reorder buffer stays bounded too.
+        """
+        self.stages = list(stages)
+        self.queue_size = queue_size
+        self.ordered = ordered
+        self._queues = [queue.Queue(maxsize=stage.queue_size or queue_size) for stage in self.stages]
+        self._output = queue.Queue(maxsize=queue_size)
+        self._stats = [_StageStats() for _ in self.stages]
+        self._closed = threading.Event()
+        self._started = None
+        self._finished = None
+        capacity = sum(q.maxsize for q in self._queues) + sum(stage.workers for stage in self.stages)
+        self._in_flight = threading.BoundedSemaphore(capacity + queue_size) if ordered else None
+
+    def _put(self, target, entry):
+        """Blocking put that gives up once the executor is closed"""
+        while not self._closed.is_set():
+            try:
+                target.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _acquire_slot(self):
+        while not self._closed.is_set():
+            if self._in_flight.acquire(timeout=0.1):
+                return True
+        return False
+
+    def _feed(self, items):
+        try:
+            for seq, item in enumerate(items):
+                if self._in_flight is not None and not self._acquire_slot():
+                    return
+                if not self._put(self._queues[0], (seq, item)):
+                    return
+        except BaseException as e:
+            self._put(self._queues[0], (-1, _Failure('input', e)))
+        self._put(self._queues[0], _STOP)
+
+    def _work(self, index, pool, remaining, lock):
+        stage = self.stages[index]
+        source = self._queues[index]
+        target = self._queues[index + 1] if index + 1 < len(self.stages) else self._output
+        stats = self._stats[index]
+        while not self._closed.is_set():
+            try:
+                entry = source.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if entry is _STOP:
+                # Let the other workers of this stage see it; the last one forwards it
+                source.put(_STOP)
+                with lock:
+                    remaining[0] -= 1
+                    last = remaining[0] == 0
+                if last:
+                    self._put(target, _STOP)
+                return
+            stats.sample_depth(source.qsize())
+            seq, item = entry
+            if isinstance(item, _Failure):
+                self._put(target, entry)
+                continue
+            start = time.perf_counter()
+            try:
+                result = stage(item, pool)
+            except Exception as e:
+                result = _Failure(stage.name, e)
+            stats.record(time.perf_counter() - start, isinstance(result, _Failure))
+            if not self._put(target, (seq, result)):
+                return
+
+    def run(self, items):
+        """
+        Generator of stage-chain results for items, in input order when
+        ordered=True. An exception raised by a stage is re-raised here for the
+        item it failed on, after which the executor shuts down.
+        """
+        self._started = time.perf_counter()
+        feeder = threading.Thread(target=self._feed, args=(items,), daemon=True)
+        threads = []
+        pools = []
+        for index, stage in enumerate(self.stages):
+            pool = None
+            if stage.kind == 'process':
+                pool = ProcessPoolExecutor(max_workers=stage.workers)
+                pools.append(pool)
+            remaining, lock = [stage.workers], threading.Lock()
+            threads += [threading.Thread(target=self._work, args=(index, pool, remaining, lock), daemon=True)
+                        for _ in range(stage.workers)]
+        feeder.start()
+        for thread in threads:
+            thread.start()
+
+        pending = {}
+        next_seq = 0
+        try:
+            while True:
+                entry = self._output.get()
+                if entry is _STOP:
+                    break
+                seq, result = entry
+                if isinstance(result, _Failure):
+                    raise RuntimeError(f"Pipeline stage '{result.stage}' failed") from result.error
+                if not self.ordered:
+                    yield result
+                    continue
+                pending[seq] = result
+                while next_seq in pending:
+                    result = pending.pop(next_seq)
+                    next_seq += 1
+                    self._in_flight.release()
+                    yield result
+        finally:
+            self._finished = time.perf_counter()
+            self._closed.set()
+            # The feeder is not joined: it may be blocked inside the input iterator
+            for thread in threads:
+                thread.join()
+            for pool in pools:
+                pool.shutdown(cancel_futures=True)
+
+    def stats(self):
+        """
+        Per-stage counters: items processed and failed, throughput over the
+        run's wall time, worker utilization and input queue depth (mean and
+        maximum, sampled whenever a worker takes an item; current value too).
+        """
+        if self._started is None:
+            return []
+        elapsed = (self._finished or time.perf_counter()) - self._started
+        report = []
+        for stage, stats, source in zip(self.stages, self._stats, self._queues):
+            with stats.lock:
+                report.append({
+                    'stage': stage.name,
+                    'kind': stage.kind,
+                    'workers': stage.workers,
+                    'processed': stats.processed,
+                    'failed': stats.failed,
+                    'throughput': stats.processed / elapsed if elapsed > 0 else 0.0,
+                    'utilization': stats.busy / (elapsed * stage.workers) if elapsed > 0 else 0.0,
+                    'mean_queue_depth': stats.depth_sum / stats.depth_samples if stats.depth_samples else 0.0,
+                    'max_queue_depth': stats.max_depth,
+                    'queue_depth': source.qsize(),
+                    'queue_size': source.maxsize,
+                })
+        return report
+
+    def format_stats(self):
+        lines = [f"{'stage':<12} {'kind':<8} {'workers':>7} {'items':>7} {'items/s':>9} "
+                 f"{'util':>6} {'queue mean/max':>15}"]
+        for row in self.stats():
+            lines.append(f"{row['stage']:<12} {row['kind']:<8} {row['workers']:>7} {row['processed']:>7} "
+                         f"{row['throughput']:>9.2f} {row['utilization']:>6.0%} "
+                         f"{row['mean_queue_depth']:>8.1f}/{row['max_queue_depth']:<6}")
+        return "\n".join(lines)
+
+
+def _slow_square(x):
+    time.sleep(0.01)
+    return x * x
+
+
+# Example usage
+if __name__ == "__main__":
+    executor = PipelineExecutor([
+        Stage("fetch", lambda x: (time.sleep(0.02), x)[1], workers=8),  # network-latency bound
+        Stage("compute", _slow_square, workers=2, kind="process"),      # CPU bound
+        Stage("format", str),
+    ], queue_size=16)
+    results = list(executor.run(range(200)))
+    print(results[:5], len(results))
+    print(executor.format_stats())
@@ -0,0 +1,196 @@
+import json
+import os
+import threading
+from array import array
+
+
+class PromptDataset:
+    """
+    Record-per-line (JSONL) view of a prompt or AR dataset, such as
+    GeneratedPrompts/Few-ShotGeneratedPrompts.json, GeneratedPrompts/ARs_test.JSON
+    or the records written by APICopilot.generate_prompts.
+
+    Records are streamed from disk rather than loaded whole, and record i (the
+    i-th AR) is read with a single seek through an offset index kept next to
+    the data file, <path>.idx: the byte offset of every record followed by the
+    file size. The index is rebuilt whenever it no longer matches the data
+    file. The original single-array JSON files are converted once, without
+    being loaded whole either (see from_json).
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path (str): JSONL file, one JSON record per line.
+        """
+        self.path = path
+        self.index_path = path + ".idx"
+        self._offsets = self._load_index()
+        self._reader = open(path, "rb")
+        self._lock = threading.Lock()
+
+    def _load_index(self):
+        size = os.path.getsize(self.path)
+        if os.path.exists(self.index_path) and os.path.getmtime(self.index_path) >= os.path.getmtime(self.path):
+            offsets = array('Q')
+            with open(self.index_path, "rb") as f:
+                offsets.frombytes(f.read())
+            if offsets and offsets[-1] == size:
+                return offsets
+        offsets = array('Q')
+        offset = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                if line.strip():
+                    offsets.append(offset)
+                offset += len(line)
+        offsets.append(offset)
+        self._write_index(self.index_path, offsets)
+        return offsets
+
+    @staticmethod
+    def _write_index(index_path, offsets):
+        try:
+            with open(index_path + ".tmp", "wb") as f:
+                offsets.tofile(f)
+            os.replace(index_path + ".tmp", index_path)
+        except OSError:  # read-only location: keep the index in memory only
+            pass
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        """Record i (negative indices count from the end), or a list of records for a slice"""
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(f"Record {i} out of range for {len(self)} records")
+        with self._lock:
+            self._reader.seek(self._offsets[i])
+            line = self._reader.read(self._offsets[i + 1] - self._offsets[i])
+        return json.loads(line)
+
+    def __iter__(self):
+        return self.iter_records(self.path)
+
+    def iter_from(self, start=0):
+        """Stream the records from index start on, sequentially"""
+        if start >= len(self):
+            return
+        with open(self.path, "rb") as f:
+            f.seek(self._offsets[start])
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    @classmethod
+    def write(cls, records, path):
+        """
+        Stream records (any iterable of JSON-serializable dicts) to a JSONL
+        file and its offset index, and open the result. The files are
+        replaced only once every record is written.
+        """
+        offsets = array('Q')
+        offset = 0
+        with open(path + ".tmp", "wb") as f:
+            for record in records:
+                line = json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n"
+                f.write(line)
+                offsets.append(offset)
+                offset += len(line)
+        offsets.append(offset)
+        os.replace(path + ".tmp", path)
+        cls._write_index(path + ".idx", offsets)
+        return cls(path)
+
+    @classmethod
+    def from_json(cls, source, path=None):
+        """
+        JSONL copy of a single-array JSON dataset file, converted (by
+        streaming) only when missing or older than the source.
+
+        Args:
+            source (str): JSON array file, e.g. GeneratedPrompts/ARs_test.JSON.
+            path (str): JSONL file to create (default: source with a .jsonl extension).
+        """
+        path = path or os.path.splitext(source)[0] + ".jsonl"
+        if not os.path.exists(path) or os.path.getmtime(path) < os.path.getmtime(source):
+            return cls.write(cls.iter_json_array(source), path)
+        return cls(path)
+
+    @staticmethod
+    def _is_json_array(path):
+        with open(path, "rb") as f:
+            return f.read(64).lstrip(b"\xef\xbb\xbf \t\r\n").startswith(b"[")
+
+    @classmethod
+    def open(cls, path):
+        """A JSONL dataset as is, or the converted copy of a JSON array file"""
+        if cls._is_json_array(path):
+            return cls.from_json(path)
+        return cls(path)
+
+    @classmethod
+    def iter_records(cls, path):
+        """Stream the records of a JSONL file or of a JSON array file, without indexing"""
+        if cls._is_json_array(path):
+            yield from cls.iter_json_array(path)
+            return
+        with open(path, "rb") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    @staticmethod
+    def iter_json_array(path, chunk_size=1 << 20):
+        """Stream the elements of a top-level JSON array, reading chunk_size characters at a time"""
+        decoder = json.JSONDecoder()
+        with open(path, encoding="utf-8-sig") as f:
+            buffer = f.read(chunk_size).lstrip()
+            if not buffer.startswith("["):
+                raise ValueError(f"{path} does not contain a JSON array")
+            position = 1
+            eof = False
+            while True:
+                while position < len(buffer) and buffer[position] in " \t\r\n,":
+                    position += 1
+                if position < len(buffer) and buffer[position] == "]":
+                    return
+                end = None
+                if position < len(buffer):
+                    try:
+                        record, end = decoder.raw_decode(buffer, position)
+                    except ValueError:
+                        end = None
+                # A value running up to the end of the buffer may continue in the next chunk
+                if end is None or (end == len(buffer) and not eof):
+                    if eof:
+                        raise ValueError(f"{path}: truncated or malformed JSON array")
+                    more = f.read(chunk_size)
+                    eof = not more
+                    buffer = buffer[position:] + more
+                    position = 0
+                    continue
+                yield record
+                position = end
+
+    def close(self):
+        self._reader.close()
+
+
+# Example usage
+if __name__ == "__main__":
+    import tempfile
+
+    directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "GeneratedPrompts")
+    with tempfile.TemporaryDirectory() as output_directory:
+        for name in ("ARs_test.JSON", "Few-ShotGeneratedPrompts.json"):
+            path = os.path.join(output_directory, os.path.splitext(name)[0] + ".jsonl")
+            dataset = PromptDataset.from_json(os.path.join(directory, name), path=path)
+            print(f"{name}: {len(dataset)} records in {dataset.path}")
+            print("Record 42:", dataset[42])
+            print("Streamed:", sum(1 for _ in dataset))
+            dataset.close()
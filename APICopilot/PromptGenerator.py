@@ -1,60 +1,266 @@
+import re
+import warnings
+from functools import lru_cache
+from string import Formatter
+
+try:
+    import tiktoken
+except ImportError:  # token counts fall back to an approximation
+    tiktoken = None
+
+
+class TokenCounter:
+    """
+    Counts tokens the way the target model does. Accepts a tiktoken encoding
+    name, a tokenizer object (tiktoken Encoding or Hugging Face tokenizer), or
+    None for GPT-4o's o200k_base when tiktoken is available. Without a
+    tokenizer, an approximation (words, short digit runs and runs of one
+    punctuation character as tokens) is used. Per-line counts are memoized,
+    since ARs from the same file share most of their preceding code.
+    """
+
+    approximate_pattern = re.compile(r"\s?[A-Za-z]+|\d{1,3}|\s?([^\w\s])\1{0,7}|\n")
+
+    def __init__(self, tokenizer=None, cache_size=200000):
+        if tokenizer is None and tiktoken is not None:
+            try:
+                tokenizer = tiktoken.get_encoding("o200k_base")
+            except Exception:  # encoding files not available offline
+                tokenizer = None
+        elif isinstance(tokenizer, str):
+            if tiktoken is None:
+                raise ValueError(f"tiktoken is required for the '{tokenizer}' encoding")
+            tokenizer = tiktoken.get_encoding(tokenizer)
+        self.tokenizer = tokenizer
+        if tokenizer is None:
+            self.name = "approximate"
+        else:
+            self.name = getattr(tokenizer, 'name', None) or getattr(tokenizer, 'name_or_path', type(tokenizer).__name__)
+        self._count_line = lru_cache(maxsize=cache_size)(self.count)
+
+    def count(self, text):
+        if not text:
+            return 0
+        if self.tokenizer is None:
+            return len(self.approximate_pattern.findall(text))
+        if hasattr(self.tokenizer, 'encode_ordinary'):
+            return len(self.tokenizer.encode_ordinary(text))
+        return len(self.tokenizer.encode(text, add_special_tokens=False))
+
+    def tail(self, text, budget):
+        """The longest run of whole trailing lines of text within budget tokens"""
+        if budget <= 0:
+            return ""
+        lines = text.split("\n")
+        used = 0
+        start = len(lines)
+        while start > 0:
+            # +1 for the newline joining it to the next line
+            cost = self._count_line(lines[start - 1]) + (start < len(lines))
+            if used + cost > budget:
+                break
+            used += cost
+            start -= 1
+        return "\n".join(lines[start:])
+
+
+class _CompiledTemplate:
+    """A str.format template parsed once into literal text and fields, rendered by a single join"""
+
+    def __init__(self, template):
+        self.template = template
+        self._parts = [(literal, field) for literal, field, _, _ in Formatter().parse(template)]
+
+    def __call__(self, **values):
+        pieces = []
+        for literal, field in self._parts:
+            pieces.append(literal)
+            if field is not None:
+                pieces.append(str(values[field]))
+        return "".join(pieces)
+
+
+@lru_cache(maxsize=100000)
+def _format_example_triples(triples):
+    """Formatted triples of a retrieved example; the same examples recur across many queries"""
+    return "\n".join([f"({s}, {p}, {t})" for s, p, t in triples])
+
+
 class PromptGenerator:
-    def __init__(self, input_ar, top_graphs, example_ars):
+    # Bump whenever the prompt layout changes, so stored prompts are rebuilt
+    PROMPT_VERSION = 2
+    # Identical for every AR and placed first, so provider-side prompt caching
+    # (and HuggingFaceBackend's prefix cache) can reuse its tokens
+    STATIC_PREFIX = """// ========== Task ==========
+Complete the method call in the Completion Query by filling its missing arguments.
+Use the contextual knowledge triples, the best examples and the code context that precedes the call.
+Only output the completed method call with arguments."""
+    # Sections in prompt order (optional ones may be left out)
+    SECTION_TEMPLATES = {
+        'instructions': STATIC_PREFIX,
+        'input_triples': "// ========== Contextual Knowledge ==========\n// Input Graph Triples:\n{triples}",
+        'graph_triples': "// Top Matching Graph Triples:\n{triples}",
+        'examples': "// ========== Best Examples ==========\n{examples}",
+        'code_context': "// ========== Code Context ==========\n{code}",
+        'query': "// ========== Completion Query ==========\n{mcall}\n\n"
+                 "// ========== Current Arguments ==========\nExisting arguments: {args}",
+    }
+    EXAMPLE_TEMPLATE = "// Example {number}\n{triples}\nMethod call: {mcall}\nArguments: {args}"
+    SECTIONS = tuple(SECTION_TEMPLATES)
+    SEPARATOR = "\n\n"
+    _templates = {name: _CompiledTemplate(template) for name, template in SECTION_TEMPLATES.items()}
+    _example_template = _CompiledTemplate(EXAMPLE_TEMPLATE)
+
+    def __init__(self, input_ar, top_graphs, example_ars, token_budget=None, tokenizer=None, max_examples=3):
+        """
+        Args:
+            input_ar (dict): AR with 'P', 'mcall', 'Args' and 'knowledge_triples'.
+            top_graphs (list): Matched subgraphs, each with 'knowledge_triples'.
+            example_ars (list): Retrieved examples, each with 'ar' and 'knowledge_triples'.
+            token_budget (int): Maximum prompt tokens (None = unbounded). The code
+                context keeps as many lines before the call site as fit; if the
+                rest alone exceeds the budget, matched graphs and then the
+                lowest-ranked examples are dropped.
+            tokenizer: TokenCounter, or anything TokenCounter accepts.
+            max_examples (int): Examples included at most.
+        """
         self.input_ar = input_ar
         self.top_graphs = top_graphs  # From graph matching phase
         self.example_ars = example_ars  # Best examples from retrieval
-        
-    def _format_triples(self, triples):
+        self.token_budget = token_budget
+        self.counter = tokenizer if isinstance(tokenizer, TokenCounter) else TokenCounter(tokenizer)
+        self.max_examples = max_examples
+        self._sections = None
+        self._prompt = None
+
+    @staticmethod
+    def _format_triples(triples):
         return "\n".join([f"({s}, {p}, {t})" for s, p, t in triples])
-    
-    def _format_examples(self):
-        examples_str = ""
-        for i, example in enumerate(self.example_ars[:3]):  # Top 3 examples
-            examples_str += f"// Example {i+1}\n"
-            examples_str += self._format_triples(example['knowledge_triples']) + "\n"
-            examples_str += f"Method call: {example['ar']['mcall']}\n"
-            examples_str += f"Arguments: {example['ar']['Args']}\n\n"
-        return examples_str
-    
+
+    @classmethod
+    def _format_example(cls, i, example):
+        triples = tuple(tuple(triple) for triple in example['knowledge_triples'])
+        return cls._example_template(number=i + 1, triples=_format_example_triples(triples),
+                                     mcall=example['ar']['mcall'], args=example['ar']['Args'])
+
+    @classmethod
+    def _format_examples(cls, examples):
+        return "\n\n".join([cls._format_example(i, example) for i, example in enumerate(examples)])
+
+    @classmethod
+    def _render(cls, input_ar, graphs, examples, code):
+        """Sections in prompt order; optional sections left empty by the budget are omitted"""
+        templates = cls._templates
+        sections = {
+            'instructions': templates['instructions'](),
+            'input_triples': templates['input_triples'](triples=cls._format_triples(input_ar['knowledge_triples'])),
+        }
+        if graphs:
+            sections['graph_triples'] = templates['graph_triples'](
+                triples="\n".join([cls._format_triples(graph['knowledge_triples']) for graph in graphs]))
+        if examples:
+            sections['examples'] = templates['examples'](examples=cls._format_examples(examples))
+        if code:
+            sections['code_context'] = templates['code_context'](code=code)
+        sections['query'] = templates['query'](mcall=input_ar['mcall'], args=input_ar['Args'])
+        return sections
+
+    @classmethod
+    def _fit(cls, input_ar, top_graphs, example_ars, token_budget, counter, max_examples):
+        """(sections within the token budget, matched graphs kept, examples kept, code context kept)"""
+        graphs = list(top_graphs)
+        examples = list(example_ars[:max_examples])
+        code = input_ar['P']
+        if token_budget is None:
+            return cls._render(input_ar, graphs, examples, code), graphs, examples, code
+        count = counter.count
+        code_header = count(cls._templates['code_context'](code="")) + count(cls.SEPARATOR)
+        while True:
+            sections = cls._render(input_ar, graphs, examples, "")
+            fixed = count(cls.SEPARATOR.join(sections.values())) + code_header
+            if fixed <= token_budget or not (graphs or examples):
+                break
+            # Over budget even without code: shed the least essential context first
+            if graphs:
+                graphs.pop()
+            else:
+                examples.pop()
+        if fixed > token_budget:
+            warnings.warn(f"Prompt for {input_ar['mcall']!r} needs {fixed} tokens without any optional "
+                          f"section, over the budget of {token_budget}", stacklevel=3)
+        remaining = token_budget - fixed
+        while remaining > 0:
+            context = counter.tail(code, remaining)
+            sections = cls._render(input_ar, graphs, examples, context)
+            overshoot = count(cls.SEPARATOR.join(sections.values())) - token_budget
+            if overshoot <= 0:
+                return sections, graphs, examples, context
+            # Counting lines separately is approximate: tighten and retry
+            remaining -= overshoot
+        return cls._render(input_ar, graphs, examples, ""), graphs, examples, ""
+
+    def sections(self):
+        """{section name: text} of the prompt, in prompt order"""
+        if self._sections is None:
+            self._sections = self._fit(self.input_ar, self.top_graphs, self.example_ars, self.token_budget,
+                                       self.counter, self.max_examples)[0]
+        return self._sections
+
     def generate_prompt(self):
-        # 1. Knowledge Triples
-        input_triples = self._format_triples(self.input_ar['knowledge_triples'])
-        graph_triples = "\n".join([
-            self._format_triples(graph['knowledge_triples']) 
-            for graph in self.top_graphs
-        ])
-        
-        # 2. Best Examples
-        examples_section = self._format_examples()
-        
-        # 3. Query and Input Code
-        query = self.input_ar['mcall']
-        preceding_code = self.input_ar['P']
-        
-        prompt_template = f"""
-// ========== Contextual Knowledge ==========
-// Input Graph Triples:
-{input_triples}
-
-// Top Matching Graph Triples:
-{graph_triples}
-
-// ========== Best Examples ==========
-{examples_section}
-// ========== Code Context ==========
-{preceding_code}
-
-// ========== Completion Query ==========
-Complete the following method call by filling missing arguments.
-Only output the completed method call with arguments.
-
-{query}
-
-// ========== Current Arguments ==========
-Existing arguments: {self.input_ar['Args']}
-"""
-
-        return prompt_template.strip()
+        if self._prompt is None:
+            self._prompt = self.SEPARATOR.join(self.sections().values())
+        return self._prompt
+
+    def token_counts(self):
+        """
+        Tokens per section plus the whole prompt's 'total', and 'over_budget':
+        1 if the prompt exceeds token_budget (the instructions, input triples
+        and query alone do not fit), else 0
+        """
+        return self._token_counts(self.sections(), self.generate_prompt(), self.counter, self.token_budget)
+
+    @staticmethod
+    def _token_counts(sections, prompt, counter, token_budget):
+        counts = {name: counter.count(text) for name, text in sections.items()}
+        counts['total'] = counter.count(prompt)
+        counts['over_budget'] = int(token_budget is not None and counts['total'] > token_budget)
+        return counts
+
+    # ---- Stateless batch rendering ----
+
+    @classmethod
+    def render_many(cls, items, token_budget=None, tokenizer=None, max_examples=3, token_counts=False):
+        """
+        Lazily render one record per (input_ar, top_graphs, example_ars) item,
+        in the GeneratedPrompts shape: "Best Example 1".."Best Example k", the
+        input triples and those of the matched graphs kept within the budget,
+        the "Query" instruction, the "Input
+        Preceding Code" (code context kept plus the call), and the full
+        "Prompt" that is sent. Nothing is kept between items except the
+        memoized example triples and the tokenizer's line counts, so memory
+        stays flat for any number of ARs.
+
+        Args:
+            items (iterable): (input_ar, top_graphs, example_ars) per AR, as for the constructor.
+            token_budget, tokenizer, max_examples: As for the constructor.
+            token_counts (bool): Add a "Token Counts" entry per record (see token_counts()).
+        """
+        counter = tokenizer if isinstance(tokenizer, TokenCounter) else TokenCounter(tokenizer)
+        for input_ar, top_graphs, example_ars in items:
+            sections, graphs, examples, code = cls._fit(input_ar, top_graphs, example_ars, token_budget, counter,
+                                                        max_examples)
+            prompt = cls.SEPARATOR.join(sections.values())
+            record = {f"Best Example {i + 1}": cls._format_example(i, example) for i, example in enumerate(examples)}
+            record["Knowledge Triples"] = cls._format_triples(input_ar['knowledge_triples'])
+            record["Top Matching Graph Triples"] = "\n".join(
+                [cls._format_triples(graph['knowledge_triples']) for graph in graphs])
+            record["Query"] = cls.STATIC_PREFIX
+            record["Input Preceding Code"] = f"{code}\n{input_ar['mcall']}" if code else input_ar['mcall']
+            record["Prompt"] = prompt
+            if token_counts:
+                record["Token Counts"] = cls._token_counts(sections, prompt, counter, token_budget)
+            yield record
+
 
 # Example usage
 if __name__ == "__main__":
@@ -93,7 +299,7 @@ if __name__ == "__main__":
             ('t.resize', 'takesArgument', 'img'),
             ('t.resize', 'takesArgument', '300'),
             ('t.resize', 'takesArgument', '200')
-        ]
+        ]}
     ]
     
     generator = PromptGenerator(input_ar, top_graphs, example_ars)
@@ -101,3 +307,23 @@ if __name__ == "__main__":
     
     print("Generated Prompt:\n")
     print(prompt)
+
+    # Same prompt within a token budget: the code context shrinks to the lines nearest the call
+    counter = TokenCounter()
+    for budget in (None, 300, 250):
+        counts = PromptGenerator(input_ar, top_graphs, example_ars, token_budget=budget,
+                                 tokenizer=counter).token_counts()
+        print(f"Budget {budget} ({counter.name} tokens):", counts)
+
+    # Whole datasets: stream records straight to JSONL in the GeneratedPrompts shape
+    import os
+    import tempfile
+
+    from PromptDataset import PromptDataset
+
+    items = ((input_ar, top_graphs, example_ars) for _ in range(1000))
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "prompts.jsonl")
+        dataset = PromptDataset.write(PromptGenerator.render_many(items, token_budget=4096), path)
+        print(f"Wrote {len(dataset)} prompts to {dataset.path}")
+        dataset.close()
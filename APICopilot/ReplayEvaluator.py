@@ -0,0 +1,244 @@
+import argparse
+import os
+import re
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice, zip_longest
+
+import numpy as np
+
+from LLMBackend import StubBackend
+from PromptDataset import PromptDataset
+
+
+class ReplayEvaluator:
+    """
+    Offline replay of a generated prompt dataset through a predictor, scored
+    against the ground-truth arguments.
+
+    Prompts are streamed from a PromptDataset file: the records written by
+    APICopilot.generate_prompts (their "Prompt") or
+    GeneratedPrompts/Few-ShotGeneratedPrompts.json (built from "Query", the
+    best examples and "Input Preceding Code"). Record i is scored against
+    record i of the ground truth, e.g. GeneratedPrompts/ARs_test.JSON. Every
+    prompt is a separate request, with up to `concurrency` in flight, and the
+    latency of each request is measured at the caller.
+    """
+
+    # A completed call on the last line of a completion, e.g. "isEven(number);"
+    call_pattern = re.compile(r'[\w.$]+\((.*)\)\s*;?\s*$')
+
+    def __init__(self, predictor, prompts_path, ground_truth_path, concurrency=1, temperature=0.0,
+                 max_tokens=128):
+        """
+        Args:
+            predictor: An LLMBackend (e.g. StubBackend or HuggingFaceBackend), an
+                ArgumentRecommender, or a callable prompt -> completion text or
+                argument list.
+            prompts_path (str): Prompt dataset, JSONL or a JSON array file.
+            ground_truth_path (str): Dataset with the expected "Arguments" per record.
+            concurrency (int): Requests in flight at once.
+            temperature, max_tokens: Sampling settings passed to an LLMBackend.
+        """
+        self.predictor = predictor
+        self.prompts_path = prompts_path
+        self.ground_truth_path = ground_truth_path
+        self.concurrency = concurrency
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        if hasattr(predictor, 'complete'):
+            self._predict = lambda prompt: predictor.complete(prompt, temperature=temperature, max_tokens=max_tokens)
+        elif hasattr(predictor, 'recommend_arguments'):
+            self._predict = predictor.recommend_arguments
+        elif callable(predictor):
+            self._predict = predictor
+        else:
+            raise ValueError(f"Unsupported predictor: {type(predictor).__name__}")
+
+    @staticmethod
+    def build_prompt(record):
+        """Prompt text of a dataset record"""
+        if "Prompt" in record:
+            return record["Prompt"]
+        examples = [record[f"Best Example {k}"] for k in range(1, 11) if f"Best Example {k}" in record]
+        parts = [record.get("Query", "")]
+        parts.extend(f"Example {k}:\n{example}" for k, example in enumerate(examples, 1))
+        parts.append(f"Input:\n{record['Input Preceding Code']}")
+        return "\n\n".join(part for part in parts if part)
+
+    @staticmethod
+    def split_arguments(text):
+        """Top-level comma-separated arguments, ignoring commas in brackets and string literals"""
+        args = []
+        current = []
+        depth = 0
+        quote = None
+        for i, char in enumerate(text):
+            if quote:
+                if char == quote and text[i - 1] != '\\':
+                    quote = None
+            elif char in '"\'':
+                quote = char
+            elif char in '([{':
+                depth += 1
+            elif char in ')]}':
+                depth -= 1
+            elif char == ',' and depth == 0:
+                args.append(''.join(current).strip())
+                current = []
+                continue
+            current.append(char)
+        if ''.join(current).strip():
+            args.append(''.join(current).strip())
+        return args
+
+    @classmethod
+    def parse_prediction(cls, prediction):
+        """Argument list of a completion: the arguments of its last call, or its last line as an argument list"""
+        if isinstance(prediction, (list, tuple)):
+            return [str(arg).strip() for arg in prediction]
+        lines = [line.strip() for line in prediction.strip().strip('`').splitlines() if line.strip()]
+        if not lines:
+            return []
+        match = cls.call_pattern.search(lines[-1])
+        return cls.split_arguments(match.group(1) if match else lines[-1].rstrip(';'))
+
+    @staticmethod
+    def _normalize(arg):
+        return re.sub(r'\s+', ' ', arg.strip())
+
+    def _timed(self, prompt):
+        start = time.perf_counter()
+        try:
+            prediction, error = self._predict(prompt), None
+        except Exception as e:
+            prediction, error = None, e
+        return prediction, error, time.perf_counter() - start
+
+    def iter_results(self, limit=None):
+        """
+        Score every record (the first `limit` ones if given) and yield one
+        result per record, in dataset order: index, expected and predicted
+        arguments, exact match, correct arguments, latency and error.
+        Raises ValueError when the prompt and ground-truth datasets (their
+        first `limit` records) differ in length.
+        """
+        prompts = islice(PromptDataset.iter_records(self.prompts_path), limit)
+        truths = islice(PromptDataset.iter_records(self.ground_truth_path), limit)
+        missing = object()
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            for index, (record, truth) in enumerate(zip_longest(prompts, truths, fillvalue=missing)):
+                if record is missing or truth is missing:
+                    shorter = self.prompts_path if record is missing else self.ground_truth_path
+                    raise ValueError(f"{shorter} ends after {index} records, but {self.prompts_path} and "
+                                     f"{self.ground_truth_path} must have one record per AR")
+                # A bounded window keeps memory flat however long the dataset is
+                if len(pending) >= 4 * self.concurrency:
+                    yield self._result(*pending.popleft())
+                pending.append((index, truth, pool.submit(self._timed, self.build_prompt(record))))
+            while pending:
+                yield self._result(*pending.popleft())
+
+    def _result(self, index, truth, future):
+        prediction, error, latency = future.result()
+        expected = [self._normalize(arg) for arg in self.split_arguments(truth["Arguments"])]
+        predicted = [] if error is not None else [self._normalize(arg) for arg in self.parse_prediction(prediction)]
+        return {
+            "index": index,
+            "expected": expected,
+            "predicted": predicted,
+            "exact_match": predicted == expected,
+            "correct_arguments": sum(p == e for p, e in zip(predicted, expected)),
+            "latency": latency,
+            "error": None if error is None else repr(error),
+        }
+
+    def evaluate(self, limit=None, output_path=None):
+        """
+        Replay the dataset and return accuracy and throughput metrics. With
+        output_path, the per-record results are also written there as a
+        PromptDataset.
+        """
+        totals = {"prompts": 0, "exact": 0, "arguments": 0, "correct": 0, "errors": 0}
+        latencies = []
+
+        def scored(results):
+            for result in results:
+                totals["prompts"] += 1
+                totals["exact"] += result["exact_match"]
+                totals["arguments"] += len(result["expected"])
+                totals["correct"] += result["correct_arguments"]
+                totals["errors"] += result["error"] is not None
+                latencies.append(result["latency"])
+                yield result
+
+        start = time.perf_counter()
+        results = scored(self.iter_results(limit))
+        if output_path is not None:
+            PromptDataset.write(results, output_path).close()
+        else:
+            for _ in results:
+                pass
+        wall_time = time.perf_counter() - start
+        latencies = np.array(latencies)
+        prompts = totals["prompts"]
+        return {
+            "prompts": prompts,
+            "errors": totals["errors"],
+            "exact_match": totals["exact"] / prompts if prompts else 0.0,
+            "argument_accuracy": totals["correct"] / totals["arguments"] if totals["arguments"] else 0.0,
+            "concurrency": self.concurrency,
+            "mean_latency": float(latencies.mean()) if prompts else 0.0,
+            "p50_latency": float(np.percentile(latencies, 50)) if prompts else 0.0,
+            "p95_latency": float(np.percentile(latencies, 95)) if prompts else 0.0,
+            "p99_latency": float(np.percentile(latencies, 99)) if prompts else 0.0,
+            "requests_per_second": prompts / wall_time if wall_time > 0 else 0.0,
+            "wall_time": wall_time,
+        }
+
+
+def format_report(report):
+    return (f"{report['prompts']} prompts ({report['errors']} failed) at concurrency {report['concurrency']}: "
+            f"exact match {report['exact_match']:.2%}, argument accuracy {report['argument_accuracy']:.2%}\n"
+            f"latency p50 {report['p50_latency'] * 1000:.1f} ms, p95 {report['p95_latency'] * 1000:.1f} ms, "
+            f"p99 {report['p99_latency'] * 1000:.1f} ms; {report['requests_per_second']:.1f} requests/s "
+            f"over {report['wall_time']:.1f} s")
+
+
+def main():
+    generated = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "GeneratedPrompts")
+    parser = argparse.ArgumentParser(description="Replay generated prompts through a model and score them offline")
+    parser.add_argument("--prompts", default=os.path.join(generated, "Few-ShotGeneratedPrompts.json"),
+                        help="Prompt dataset: records from APICopilot.generate_prompts or a GeneratedPrompts file")
+    parser.add_argument("--ground_truth", default=os.path.join(generated, "ARs_test.JSON"))
+    parser.add_argument("--backend", default="stub", choices=["stub", "huggingface", "openai"],
+                        help="The stub closes each open call without arguments: a zero-accuracy "
+                             "baseline for measuring replay throughput")
+    parser.add_argument("--model", default=None, type=str,
+                        help="Hugging Face model or OpenAI model name (default: the backend's default)")
+    parser.add_argument("--concurrency", default=1, type=int)
+    parser.add_argument("--limit", default=None, type=int, help="Replay only the first records")
+    parser.add_argument("--max_tokens", default=128, type=int)
+    parser.add_argument("--stub_latency", default=0.0, type=float,
+                        help="Seconds the stub backend takes per request")
+    parser.add_argument("--output", default=None, type=str, help="JSONL file for the per-record results")
+    args = parser.parse_args()
+
+    if args.backend == "stub":
+        backend = StubBackend(latency=args.stub_latency)
+    elif args.backend == "huggingface":
+        from HuggingFaceBackend import HuggingFaceBackend
+        backend = HuggingFaceBackend(args.model) if args.model else HuggingFaceBackend()
+    else:
+        from RequestEngine import ChatRequestEngine
+        backend = ChatRequestEngine(os.environ.get("OPENAI_API_KEY"), model=args.model or "gpt-4o",
+                                    max_concurrency=args.concurrency)
+    evaluator = ReplayEvaluator(backend, args.prompts, args.ground_truth, concurrency=args.concurrency,
+                                max_tokens=args.max_tokens)
+    print(format_report(evaluator.evaluate(limit=args.limit, output_path=args.output)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Union
+
+import openai
+
+from LLMBackend import LLMBackend
+
+class TokenBucket:
+    """
+    Token bucket shared by every thread and event loop: refills at `rate`
+    tokens per second up to `capacity`, so bursts of at most `capacity`
+    requests are allowed on top of the rate. Each request reserves a token
+    under a lock and then waits until its reservation is due, so concurrent
+    callers never exceed the rate together.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take a token; returns the seconds to wait before it may be used"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    async def acquire(self):
+        delay = self.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def wait(self):
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+
+class ConcurrencyLimit:
+    """
+    Bounded semaphore usable from any thread and any event loop at once:
+    `async with` inside coroutines, `with` in blocking code. A released slot
+    is handed to the longest waiting caller.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._taken = 0
+        self._waiters = deque()
+        self._lock = threading.Lock()
+
+    def _take_or_wait(self, waiter):
+        with self._lock:
+            if self._taken < self.limit:
+                self._taken += 1
+                return True
+            self._waiters.append(waiter)
+            return False
+
+    def release(self):
+        with self._lock:
+            while self._waiters:
+                if self._waiters.popleft()():
+                    return  # the slot passes straight to the woken waiter
+            self._taken -= 1
+
+    async def __aenter__(self):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def wake():
+            try:
+                loop.call_soon_threadsafe(self._hand_over, future)
+            except RuntimeError:  # the waiter's loop is closed
+                return False
+            return True
+
+        if not self._take_or_wait(wake):
+            await future
+
+    def _hand_over(self, future):
+        if future.cancelled():
+            self.release()
+        else:
+            future.set_result(None)
+
+    async def __aexit__(self, *exc_info):
+        self.release()
+
+    def __enter__(self):
+        event = threading.Event()
+
+        def wake():
+            event.set()
+            return True
+
+        if not self._take_or_wait(wake):
+            event.wait()
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+class ChatRequestEngine(LLMBackend):
+    # HTTP statuses worth retrying: rate limiting and transient server errors
+    RETRYABLE_STATUSES = {408, 409, 429}
+    name = "openai"
+
+    def __init__(self, api_key: Optional[str] = None, model: str = "gpt-4o", base_url: Optional[str] = None,
+                 max_concurrency: int = 16, requests_per_second: Optional[float] = None,
+                 max_retries: int = 6, backoff_base: float = 1.0, backoff_max: float = 60.0,
+                 timeout: float = 120.0):
+        """
+        LLM backend for any OpenAI-compatible endpoint (api.openai.com, or a
+        local server such as vLLM, llama.cpp or Ollama via base_url). Sends
+        many chat completions concurrently.
+
+        Args:
+            api_key: OpenAI API key
+            model: Chat model the prompts are sent to
+            base_url: OpenAI-compatible endpoint (None = api.openai.com)
+            max_concurrency: Requests in flight at once, across all calls and
+                threads using this engine
+            requests_per_second: Token-bucket rate limit, likewise shared (None = unlimited)
+            max_retries: Retries per prompt on 429/5xx and connection errors
+            backoff_base: First retry waits up to this many seconds, doubling per attempt
+            backoff_max: Cap on a single backoff wait
+            timeout: Per-request timeout in seconds
+        """
+        super().__init__()
+        self.api_key = api_key
+        self.model = model
+        self.base_url = base_url
+        self.max_concurrency = max_concurrency
+        self.requests_per_second = requests_per_second
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        # (prompt, temperature, max_tokens) -> Future of the request currently sending it
+        self._in_flight: Dict[tuple, Future] = {}
+        self._lock = threading.Lock()
+        self._client = None
+        # One limit for the engine, so chunked and multi-threaded runs stay within them too
+        self._slots = ConcurrencyLimit(max_concurrency)
+        self._bucket = TokenBucket(requests_per_second) if requests_per_second else None
+        self.requests = 0
+        self.coalesced = 0
+
+    def _is_retryable(self, error: Exception) -> bool:
+        if isinstance(error, (openai.APIConnectionError, openai.APITimeoutError)):
+            return True
+        if isinstance(error, openai.APIStatusError):
+            return error.status_code in self.RETRYABLE_STATUSES or error.status_code >= 500
+        return False
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        """Full-jitter exponential backoff, never shorter than a server-sent Retry-After"""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        response = getattr(error, 'response', None)
+        if response is not None:
+            try:
+                delay = max(delay, float(response.headers.get('retry-after', 0)))
+            except ValueError:
+                pass
+        return delay
+
+    async def _complete(self, client, prompt: str, temperature: float, max_tokens: int) -> str:
+        attempt = 0
+        while True:
+            async with self._slots:
+                if self._bucket is not None:
+                    await self._bucket.acquire()
+                try:
+                    response = await client.chat.completions.create(
+                        model=self.model,
+                        messages=[{
+                            "role": "user",
+                            "content": prompt
+                        }],
+                        temperature=temperature,
+                        max_tokens=max_tokens
+                    )
+                    return response.choices[0].message.content or ""
+                except Exception as e:
+                    if attempt >= self.max_retries or not self._is_retryable(e):
+                        raise
+                    delay = self._backoff(attempt, e)
+            # Back off outside the semaphore so waiting requests do not hold a slot
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def acomplete_many(self, prompts: List[str], temperature: float = 0.0,
+                             max_tokens: int = 256) -> List[Union[str, BaseException]]:
+        """
+        Completion text for every prompt, in input order; a prompt whose request
+        still fails after all retries gets its exception instead. Identical
+        prompts are sent once, and a prompt that another call (in any thread) is
+        already sending is awaited rather than sent again.
+        """
+        owned, joined = {}, {}
+        with self._lock:
+            for prompt in dict.fromkeys(prompts):
+                key = (prompt, temperature, max_tokens)
+                future = self._in_flight.get(key)
+                if future is None:
+                    owned[prompt] = self._in_flight[key] = Future()
+                else:
+                    joined[prompt] = future
+            self.requests += len(owned)
+            self.coalesced += len(prompts) - len(owned)
+
+        try:
+            if owned:
+                await self._send(list(owned), temperature, max_tokens, owned)
+        finally:
+            # Never leave another caller waiting on a request this call abandoned
+            with self._lock:
+                for prompt, future in owned.items():
+                    if not future.done():
+                        future.set_exception(RuntimeError("Request was cancelled"))
+                    del self._in_flight[(prompt, temperature, max_tokens)]
+
+        results = {prompt: future.exception() or future.result() for prompt, future in owned.items()}
+        for prompt, future in joined.items():
+            try:
+                results[prompt] = await asyncio.wrap_future(future)
+            except Exception as e:
+                results[prompt] = e
+        return [results[prompt] for prompt in prompts]
+
+    async def _send(self, prompts: List[str], temperature: float, max_tokens: int, futures: Dict[str, Future]):
+        client = openai.AsyncOpenAI(api_key=self.api_key, base_url=self.base_url,
+                                    timeout=self.timeout, max_retries=0)
+
+        async def send(prompt):
+            start = time.perf_counter()
+            try:
+                futures[prompt].set_result(
+                    await self._complete(client, prompt, temperature, max_tokens))
+            except Exception as e:
+                futures[prompt].set_exception(e)
+            self._record(start, time.perf_counter(), futures[prompt].exception() is not None)
+
+        try:
+            await asyncio.gather(*(send(prompt) for prompt in prompts))
+        finally:
+            await client.close()
+
+    def complete(self, prompt: str, temperature: float = 0.0, max_tokens: int = 256) -> str:
+        """
+        One blocking request over a shared synchronous client, retried by the
+        client itself, within the engine's concurrency and rate limits
+        """
+        with self._lock:
+            if self._client is None:
+                self._client = openai.OpenAI(api_key=self.api_key, base_url=self.base_url,
+                                             timeout=self.timeout, max_retries=self.max_retries)
+            self.requests += 1
+        start = time.perf_counter()
+        try:
+            with self._slots:
+                if self._bucket is not None:
+                    self._bucket.wait()
+                response = self._client.chat.completions.create(
+                    model=self.model,
+                    messages=[{
+                        "role": "user",
+                        "content": prompt
+                    }],
+                    temperature=temperature,
+                    max_tokens=max_tokens
+                )
+        except Exception:
+            self._record(start, time.perf_counter(), True)
+            raise
+        self._record(start, time.perf_counter())
+        return response.choices[0].message.content or ""
+
+    def stats(self):
+        total = self.requests + self.coalesced
+        return {
+            **super().stats(),
+            'requests': self.requests,
+            'coalesced': self.coalesced,
+            'coalesce_rate': self.coalesced / total if total else 0.0,
+        }
+
+
+# Example usage
+if __name__ == "__main__":
+    engine = ChatRequestEngine(api_key="your-api-key-here", max_concurrency=8, requests_per_second=5)
+    completions = engine.complete_many(["Say hello.", "Say goodbye.", "Say hello."], max_tokens=16)
+    for completion in completions:
+        print(completion)
+    print("Stats:", engine.stats())
@@ -0,0 +1,182 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class ResponseCache:
+    """
+    Persistent cache of raw LLM completions.
+
+    Entries are keyed on a hash of (model, temperature, max_tokens, prompt
+    hash), so re-running an experiment with the same prompts and settings
+    costs no API calls, while changing any sampling setting misses. The raw
+    completion is stored rather than parsed arguments, so parsing and type
+    validation can change without invalidating the cache.
+
+    Eviction is by age (entries older than max_age seconds are misses and get
+    deleted) and by size (beyond max_entries, the least recently used entries
+    are deleted). A read-only cache never writes, not even access times, so a
+    published cache file can be replayed to reproduce results offline. Like
+    TripleCache, the database runs in WAL mode and is safe to share across
+    threads and processes.
+    """
+
+    def __init__(self, path, max_entries=None, max_age=None, readonly=False, timeout=30.0):
+        """
+        Args:
+            path (str): SQLite database file.
+            max_entries (int): Keep at most this many entries (None = unbounded).
+            max_age (float): Entries older than this many seconds expire (None = never).
+            readonly (bool): Open for replay: lookups only, the file must exist.
+            timeout (float): Seconds to wait for another writer's lock.
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.readonly = readonly
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self._counter_lock = threading.Lock()
+        if readonly:
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"Response cache not found: {path}")
+            return
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = self._connection()
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, response TEXT NOT NULL, "
+                           "created REAL NOT NULL, accessed REAL NOT NULL)")
+        connection.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        connection.commit()
+
+    def _connection(self):
+        """One connection per thread; sqlite3 connections must not be shared across threads"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            if self.readonly:
+                connection = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, timeout=self.timeout)
+            else:
+                connection = sqlite3.connect(self.path, timeout=self.timeout)
+                connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    @staticmethod
+    def key(model, temperature, max_tokens, prompt):
+        """Hash identifying one completion request"""
+        prompt_hash = hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+        payload = json.dumps([model, temperature, max_tokens, prompt_hash])
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _count(self, hits, misses):
+        with self._counter_lock:
+            self.hits += hits
+            self.misses += misses
+
+    def get_many(self, keys):
+        """Cached completion per key, in order, with None for missing or expired keys"""
+        found = {}
+        unique_keys = list(dict.fromkeys(keys))
+        now = time.time()
+        oldest = now - self.max_age if self.max_age is not None else None
+        connection = self._connection()
+        # Stay well below SQLite's limit on bound parameters per statement
+        for begin in range(0, len(unique_keys), 500):
+            chunk = unique_keys[begin:begin + 500]
+            rows = connection.execute(
+                f"SELECT key, response, created FROM responses WHERE key IN ({','.join('?' * len(chunk))})", chunk
+            )
+            for key, response, created in rows:
+                if oldest is None or created >= oldest:
+                    found[key] = response
+        if found and not self.readonly:
+            with connection:
+                connection.executemany("UPDATE responses SET accessed = ? WHERE key = ?",
+                                       [(now, key) for key in found])
+        results = [found.get(key) for key in keys]
+        hits = sum(result is not None for result in results)
+        self._count(hits, len(results) - hits)
+        return results
+
+    def get(self, key):
+        return self.get_many([key])[0]
+
+    def put_many(self, items):
+        """Store (key, completion) pairs in one transaction, then apply eviction"""
+        if self.readonly:
+            raise ValueError("Cannot write to a read-only response cache")
+        now = time.time()
+        rows = [(key, response, now, now) for key, response in items]
+        if rows:
+            connection = self._connection()
+            with connection:
+                connection.executemany(
+                    "INSERT OR REPLACE INTO responses (key, response, created, accessed) VALUES (?, ?, ?, ?)", rows
+                )
+            self.evict()
+
+    def put(self, key, response):
+        self.put_many([(key, response)])
+
+    def evict(self):
+        """Delete expired entries, then the least recently used ones beyond max_entries; returns the number deleted"""
+        if self.readonly:
+            return 0
+        deleted = 0
+        connection = self._connection()
+        with connection:
+            if self.max_age is not None:
+                deleted += connection.execute("DELETE FROM responses WHERE created < ?",
+                                              (time.time() - self.max_age,)).rowcount
+            if self.max_entries is not None:
+                excess = len(self) - self.max_entries
+                if excess > 0:
+                    deleted += connection.execute(
+                        "DELETE FROM responses WHERE key IN "
+                        "(SELECT key FROM responses ORDER BY accessed LIMIT ?)", (excess,)
+                    ).rowcount
+        return deleted
+
+    def __len__(self):
+        return self._connection().execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def __contains__(self, key):
+        oldest = time.time() - self.max_age if self.max_age is not None else float('-inf')
+        return self._connection().execute("SELECT 1 FROM responses WHERE key = ? AND created >= ?",
+                                          (key, oldest)).fetchone() is not None
+
+    def cache_info(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "size": len(self),
+        }
+
+    def close(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+
+# Example usage
+if __name__ == "__main__":
+    cache = ResponseCache("response_cache.sqlite", max_entries=100000, max_age=30 * 24 * 3600)
+    key = ResponseCache.key("gpt-4o", 0.2, 256, "Complete the call: t.resize(img, /* Missing Arguments */")
+    if cache.get(key) is None:
+        cache.put(key, "t.resize(img, 300, 200);")
+    print("Cached:", cache.get(key))
+    print("Cache:", cache.cache_info())
+
+    # Replay a shipped cache without ever writing to it
+    replay = ResponseCache("response_cache.sqlite", readonly=True)
+    print("Replayed:", replay.get(key))
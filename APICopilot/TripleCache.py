@@ -0,0 +1,116 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+
+
+class TripleCache:
+    """
+    Persistent, content-addressed store of extracted knowledge triples.
+
+    Entries are keyed on a hash of (P, mcall, model, prompt version), so an
+    AR is sent to the LLM once no matter how many queries retrieve it as an
+    example, and changing the model or the prompt invalidates old entries.
+    The SQLite database runs in WAL mode: any number of threads or processes
+    can read while one of them writes.
+    """
+
+    def __init__(self, path, timeout=30.0):
+        self.path = path
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self._counter_lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = self._connection()
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("CREATE TABLE IF NOT EXISTS triples (key TEXT PRIMARY KEY, triples TEXT NOT NULL)")
+        connection.commit()
+
+    def _connection(self):
+        """One connection per thread; sqlite3 connections must not be shared across threads"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.timeout)
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    @staticmethod
+    def key(P, mcall, model, prompt_version):
+        """Content hash identifying the triples of one AR under one model and prompt"""
+        payload = json.dumps([P, mcall, model, prompt_version], ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _count(self, hits, misses):
+        with self._counter_lock:
+            self.hits += hits
+            self.misses += misses
+
+    def get_many(self, keys):
+        """Cached triples per key, in order, with None for keys not in the cache"""
+        found = {}
+        unique_keys = list(dict.fromkeys(keys))
+        connection = self._connection()
+        # Stay well below SQLite's limit on bound parameters per statement
+        for begin in range(0, len(unique_keys), 500):
+            chunk = unique_keys[begin:begin + 500]
+            rows = connection.execute(
+                f"SELECT key, triples FROM triples WHERE key IN ({','.join('?' * len(chunk))})", chunk
+            )
+            for key, triples in rows:
+                found[key] = [tuple(triple) for triple in json.loads(triples)]
+        results = [found.get(key) for key in keys]
+        hits = sum(result is not None for result in results)
+        self._count(hits, len(results) - hits)
+        return results
+
+    def get(self, key):
+        return self.get_many([key])[0]
+
+    def put_many(self, items):
+        """Store (key, triples) pairs in one transaction, replacing existing entries"""
+        rows = [(key, json.dumps([list(triple) for triple in triples], ensure_ascii=False))
+                for key, triples in items]
+        if rows:
+            connection = self._connection()
+            with connection:
+                connection.executemany("INSERT OR REPLACE INTO triples (key, triples) VALUES (?, ?)", rows)
+
+    def put(self, key, triples):
+        self.put_many([(key, triples)])
+
+    def __len__(self):
+        return self._connection().execute("SELECT COUNT(*) FROM triples").fetchone()[0]
+
+    def __contains__(self, key):
+        return self._connection().execute("SELECT 1 FROM triples WHERE key = ?", (key,)).fetchone() is not None
+
+    def cache_info(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "size": len(self),
+        }
+
+    def close(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+
+# Example usage
+if __name__ == "__main__":
+    cache = TripleCache("triple_cache.sqlite")
+    key = TripleCache.key('Image img = new Image("test.png");', "t.resize(img, 300, 200)", "gpt-4o", 1)
+    cache.put(key, [("img", "typeOf", "Image"), ("t.resize", "takesArgument", "img")])
+    print("Cached:", cache.get(key))
+    print("Missing:", cache.get(TripleCache.key("", "other()", "gpt-4o", 1)))
+    print("Cache:", cache.cache_info())
@@ -0,0 +1,315 @@
+import time
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+
+def top_k_rows(scores, top_k):
+    """
+    Top-k columns of each row of a (q, n) score matrix, best first.
+    Selects with argpartition in O(n) per row and only sorts the k winners.
+
+    Returns:
+        (ids, scores) arrays of shape (q, min(top_k, n))
+    """
+    top_k = min(top_k, scores.shape[1])
+    if top_k <= 0:
+        empty = np.empty((scores.shape[0], 0))
+        return empty.astype(np.int64), empty.astype(np.float32)
+    top = np.argpartition(-scores, top_k - 1, axis=1)[:, :top_k]
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    order = np.argsort(-top_scores, axis=1, kind="stable")
+    return np.take_along_axis(top, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+
+
+class VectorIndex(ABC):
+    """
+    Inner-product index over L2-normalized float32 vectors.
+    Vectors are identified by their insertion order, so ids line up with the
+    list of training ARs the vectors were computed from.
+    """
+    kind = None
+
+    @abstractmethod
+    def __len__(self):
+        ...
+
+    @abstractmethod
+    def add(self, vectors):
+        """Append vectors; may be called repeatedly to build the index incrementally"""
+
+    @abstractmethod
+    def search(self, queries, top_k):
+        """
+        Returns:
+            (ids, scores) of shape (len(queries), top_k); rows with fewer
+            candidates are padded with id -1 and score -inf
+        """
+
+    @abstractmethod
+    def save(self, path):
+        ...
+
+    @staticmethod
+    def _as_matrix(vectors):
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        return vectors.reshape(-1, vectors.shape[-1]) if vectors.size else vectors.reshape(0, 0)
+
+    @staticmethod
+    def _pad(ids, scores, top_k):
+        missing = top_k - ids.shape[1]
+        if missing <= 0:
+            return ids, scores
+        ids = np.pad(ids, ((0, 0), (0, missing)), constant_values=-1)
+        scores = np.pad(scores.astype(np.float32), ((0, 0), (0, missing)), constant_values=-np.inf)
+        return ids, scores
+
+
+class ExactIndex(VectorIndex):
+    """Brute-force search: one matrix product over every stored vector"""
+    kind = "exact"
+
+    def __init__(self):
+        self._chunks = []
+        self._matrix = None
+
+    def __len__(self):
+        return sum(len(chunk) for chunk in self._chunks)
+
+    @property
+    def vectors(self):
+        if self._matrix is None:
+            if not self._chunks:
+                return np.empty((0, 0), dtype=np.float32)
+            # A single chunk is kept as given (e.g. a memmap) instead of copied
+            self._matrix = self._chunks[0] if len(self._chunks) == 1 else np.concatenate(self._chunks)
+            self._chunks = [self._matrix]
+        return self._matrix
+
+    def add(self, vectors):
+        vectors = self._as_matrix(vectors)
+        if len(vectors):
+            self._chunks.append(vectors)
+            self._matrix = None
+
+    def search(self, queries, top_k):
+        queries = self._as_matrix(queries)
+        if len(self) == 0:
+            ids = np.empty((len(queries), 0), dtype=np.int64)
+            return self._pad(ids, np.empty((len(queries), 0), dtype=np.float32), top_k)
+        ids, scores = top_k_rows(queries @ self.vectors.T, top_k)
+        return self._pad(ids, scores, top_k)
+
+    def save(self, path):
+        np.savez(path, kind=self.kind, vectors=self.vectors)
+
+    @classmethod
+    def _from_arrays(cls, arrays):
+        index = cls()
+        index.add(arrays["vectors"])
+        return index
+
+
+class IVFIndex(VectorIndex):
+    """
+    Inverted-file index: vectors are bucketed under the nearest of nlist
+    spherical k-means centroids, and a query only scores the vectors of its
+    nprobe closest buckets. Raising nprobe trades latency for recall
+    (nprobe == nlist is exact).
+
+    Call train() on a representative sample before (or after) adding
+    vectors. Otherwise the index falls back to exact search until it holds
+    nlist * 4 vectors, trains on those, and retrains whenever it has grown to
+    retrain_factor times the vectors its centroids were fit on, until they
+    were fit on a full train_size sample, so the centroids never stay those
+    of a small early sample.
+    """
+    kind = "ivf"
+
+    def __init__(self, nlist=256, nprobe=8, n_iter=10, train_size=None, seed=0, retrain_factor=4):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.n_iter = n_iter
+        self.train_size = train_size or nlist * 64
+        self.seed = seed
+        self.retrain_factor = retrain_factor
+        # Vectors the current centroids were fit on
+        self.trained_on = 0
+        self.centroids = None
+        self._vectors = ExactIndex()
+        self._assignment_chunks = []
+        self._lists = None
+
+    def __len__(self):
+        return len(self._vectors)
+
+    @property
+    def is_trained(self):
+        return self.centroids is not None
+
+    def _assign(self, vectors, batch_size=65536):
+        assignments = np.empty(len(vectors), dtype=np.int32)
+        for begin in range(0, len(vectors), batch_size):
+            block = vectors[begin:begin + batch_size]
+            assignments[begin:begin + batch_size] = np.argmax(block @ self.centroids.T, axis=1)
+        return assignments
+
+    def train(self, vectors):
+        """Fit the centroids with spherical k-means on (a sample of) vectors"""
+        vectors = self._as_matrix(vectors)
+        rng = np.random.default_rng(self.seed)
+        self.trained_on = len(vectors)
+        if len(vectors) > self.train_size:
+            vectors = vectors[rng.choice(len(vectors), self.train_size, replace=False)]
+        nlist = min(self.nlist, len(vectors))
+        centroids = vectors[rng.choice(len(vectors), nlist, replace=False)].copy()
+        for _ in range(self.n_iter):
+            self.centroids = centroids
+            assignments = self._assign(vectors)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, vectors)
+            counts = np.bincount(assignments, minlength=nlist)
+            empty = counts == 0
+            # Re-seed empty clusters from random points so every list stays usable
+            sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()))]
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            centroids = (sums / norms).astype(np.float32)
+        self.centroids = centroids
+        self.nlist = nlist
+        self._assignment_chunks = [self._assign(self._vectors.vectors)] if len(self) else []
+        self._lists = None
+
+    def add(self, vectors):
+        vectors = self._as_matrix(vectors)
+        if not len(vectors):
+            return
+        self._vectors.add(vectors)
+        if not self.is_trained:
+            if len(self) >= self.nlist * 4:
+                self.train(self._vectors.vectors)
+        elif self.trained_on < self.train_size and len(self) >= self.retrain_factor * self.trained_on:
+            # Refit on a larger sample; train() reassigns every stored vector
+            self.train(self._vectors.vectors)
+        else:
+            self._assignment_chunks.append(self._assign(vectors))
+            self._lists = None
+
+    def _inverted_lists(self):
+        """Vector ids per centroid, rebuilt lazily after adds"""
+        if self._lists is None:
+            assignments = np.concatenate(self._assignment_chunks)
+            order = np.argsort(assignments, kind="stable")
+            bounds = np.searchsorted(assignments[order], np.arange(self.nlist + 1))
+            self._lists = [order[bounds[c]:bounds[c + 1]] for c in range(self.nlist)]
+        return self._lists
+
+    def search(self, queries, top_k):
+        queries = self._as_matrix(queries)
+        if not self.is_trained:
+            return self._vectors.search(queries, top_k)
+        vectors = self._vectors.vectors
+        lists = self._inverted_lists()
+        nprobe = min(self.nprobe, self.nlist)
+        probes, _ = top_k_rows(queries @ self.centroids.T, nprobe)
+        all_ids = np.full((len(queries), top_k), -1, dtype=np.int64)
+        all_scores = np.full((len(queries), top_k), -np.inf, dtype=np.float32)
+        for q, query in enumerate(queries):
+            candidates = np.concatenate([lists[c] for c in probes[q]])
+            if not len(candidates):
+                continue
+            ids, scores = top_k_rows((vectors[candidates] @ query)[None, :], top_k)
+            all_ids[q, :ids.shape[1]] = candidates[ids[0]]
+            all_scores[q, :ids.shape[1]] = scores[0]
+        return all_ids, all_scores
+
+    def save(self, path):
+        arrays = {
+            "kind": self.kind,
+            "vectors": self._vectors.vectors,
+            "params": np.array([self.nlist, self.nprobe, self.n_iter, self.train_size, self.seed,
+                                self.retrain_factor, self.trained_on]),
+        }
+        if self.is_trained:
+            arrays["centroids"] = self.centroids
+            arrays["assignments"] = np.concatenate(self._assignment_chunks)
+        np.savez(path, **arrays)
+
+    @classmethod
+    def _from_arrays(cls, arrays):
+        nlist, nprobe, n_iter, train_size, seed, *rest = (int(v) for v in arrays["params"])
+        retrain_factor, trained_on = rest or (4, train_size)
+        index = cls(nlist=nlist, nprobe=nprobe, n_iter=n_iter, train_size=train_size, seed=seed,
+                    retrain_factor=retrain_factor)
+        index._vectors.add(arrays["vectors"])
+        if "centroids" in arrays:
+            index.centroids = arrays["centroids"]
+            index.trained_on = trained_on
+            index._assignment_chunks = [arrays["assignments"]]
+        return index
+
+
+INDEX_TYPES = {cls.kind: cls for cls in (ExactIndex, IVFIndex)}
+
+
+def load_index(path):
+    """Load an index written by VectorIndex.save"""
+    with np.load(path) as arrays:
+        arrays = dict(arrays)
+    return INDEX_TYPES[str(arrays["kind"])]._from_arrays(arrays)
+
+
+def benchmark_index(index, exact_index, queries, top_k=10, batch_size=1):
+    """
+    Compare an approximate index against exact search on the same vectors.
+
+    Returns:
+        dict with recall@k and per-query latency (ms) and throughput for both
+    """
+    queries = np.ascontiguousarray(queries, dtype=np.float32)
+
+    def timed(target):
+        ids = []
+        start = time.perf_counter()
+        for begin in range(0, len(queries), batch_size):
+            ids.append(target.search(queries[begin:begin + batch_size], top_k)[0])
+        elapsed = time.perf_counter() - start
+        return np.concatenate(ids), elapsed
+
+    approx_ids, approx_time = timed(index)
+    exact_ids, exact_time = timed(exact_index)
+    hits = 0
+    for approx_row, exact_row in zip(approx_ids, exact_ids):
+        hits += len(np.intersect1d(approx_row[approx_row >= 0], exact_row[exact_row >= 0]))
+    expected = int((exact_ids >= 0).sum())
+    return {
+        f"recall@{top_k}": hits / expected if expected else 1.0,
+        "latency_ms": 1000 * approx_time / len(queries),
+        "exact_latency_ms": 1000 * exact_time / len(queries),
+        "qps": len(queries) / approx_time,
+        "exact_qps": len(queries) / exact_time,
+    }
+
+
+# Example usage
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    # Clustered synthetic embeddings stand in for CodeLlama AR embeddings
+    centers = rng.normal(size=(500, 128)).astype(np.float32)
+    data = centers[rng.integers(0, 500, 200000)] + rng.normal(size=(200000, 128)).astype(np.float32)
+    data /= np.linalg.norm(data, axis=1, keepdims=True)
+    queries = data[rng.choice(len(data), 200, replace=False)]
+
+    exact = ExactIndex()
+    ivf = IVFIndex(nlist=512)
+    ivf.train(data[rng.choice(len(data), ivf.train_size, replace=False)])  # representative sample
+    for begin in range(0, len(data), 50000):  # incremental build
+        exact.add(data[begin:begin + 50000])
+        ivf.add(data[begin:begin + 50000])
+
+    print(f"{'nprobe':>6} {'recall@10':>10} {'ms/query':>9} {'exact ms':>9}")
+    for nprobe in (1, 4, 16, 64):
+        ivf.nprobe = nprobe
+        result = benchmark_index(ivf, exact, queries, top_k=10)
+        print(f"{nprobe:>6} {result['recall@10']:>10.3f} {result['latency_ms']:>9.3f} "
+              f"{result['exact_latency_ms']:>9.3f}")
@@ -1,19 +1,28 @@
-import openai
+from openai import OpenAI
 class ChatGPTPredictor:
-    def __init__(self, api_key):
+    def __init__(self, api_key, backend=None):
+        """
+        Args:
+            api_key: OpenAI API key (unused when a backend is given)
+            backend: Optional LLMBackend from APICopilot/LLMBackend.py (e.g. a local
+                HuggingFaceBackend or a StubBackend) answering instead of GPT-4o
+        """
         self.api_key = api_key
-        openai.api_key = self.api_key
+        self.backend = backend
+        self.client = OpenAI(api_key=self.api_key) if backend is None else None
 
     def predict_arguments(self, preceding_code, few_shot_examples):
         """Predict arguments using ChatGPT-4o."""
         prompt = self._build_prompt(preceding_code, few_shot_examples)
-        response = openai.ChatCompletion.create(
+        if self.backend is not None:
+            return self.backend.complete(prompt, temperature=0.2, max_tokens=128)
+        response = self.client.chat.completions.create(
             model="gpt-4o",
             messages=[{"role": "user", "content": prompt}],
             temperature=0.2,
             max_tokens=128,
         )
-        return response.choices[0].message['content']
+        return response.choices[0].message.content
 
     def _build_prompt(self, preceding_code, few_shot_examples):
         """Build a prompt with few-shot examples."""
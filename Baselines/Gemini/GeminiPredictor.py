@@ -1,13 +1,26 @@
-import google.generativeai as genai
+try:
+    import google.generativeai as genai
+except ImportError:  # only needed without a backend
+    genai = None
 
 class GeminiPredictor:
-    def __init__(self, api_key):
+    def __init__(self, api_key, backend=None):
+        """
+        Args:
+            api_key: Google AI API key (unused when a backend is given)
+            backend: Optional LLMBackend from APICopilot/LLMBackend.py (e.g. a local
+                HuggingFaceBackend or a StubBackend) answering instead of Gemini
+        """
         self.api_key = api_key
-        genai.configure(api_key=self.api_key)
+        self.backend = backend
+        if backend is None:
+            genai.configure(api_key=self.api_key)
 
     def predict_arguments(self, preceding_code, few_shot_examples):
         """Predict arguments using Gemini Flash 2.0."""
         prompt = self._build_prompt(preceding_code, few_shot_examples)
+        if self.backend is not None:
+            return self.backend.complete(prompt)
         model = genai.GenerativeModel("gemini-flash-2.0")
         response = model.generate_content(prompt)
         return response.text
@@ -1,13 +1,23 @@
 import requests
 
 class LlamaPredictor:
-    def __init__(self, api_key, api_url="https://api.llama.ai/v1/chat"):
+    def __init__(self, api_key, api_url="https://api.llama.ai/v1/chat", backend=None):
+        """
+        Args:
+            api_key: Llama API key (unused when a backend is given)
+            api_url: Chat endpoint of the hosted model
+            backend: Optional LLMBackend from APICopilot/LLMBackend.py, e.g. a
+                HuggingFaceBackend running a Llama checkpoint in-process
+        """
         self.api_key = api_key
         self.api_url = api_url
+        self.backend = backend
 
     def predict_arguments(self, preceding_code, few_shot_examples):
         """Predict arguments using Llama 3 70B."""
         prompt = self._build_prompt(preceding_code, few_shot_examples)
+        if self.backend is not None:
+            return self.backend.complete(prompt, temperature=0.2, max_tokens=128)
         headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json",
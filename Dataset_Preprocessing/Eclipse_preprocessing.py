@@ -1,5 +1,9 @@
 import os
 import re
+import shutil
+import tempfile
+from collections import deque
+from multiprocessing import Pool
 
 def find_java_files(root_dir):
     """Recursively finds all .java files within the given root directory."""
@@ -41,7 +45,33 @@ def preprocess_java_code(file_path):
         print(f"Error processing file: {file_path} - {e}")
         return None
 
-def extract_code_completion_pairs(preprocessed_code):
+def iter_code_completion_pairs(preprocessed_code, context_window=None):
+    """Yields the context-target pairs of extract_code_completion_pairs one at a time.
+
+    Every context is a slice of the whitespace-normalized code, so producing a
+    pair costs no more than the length of its context.
+
+    Args:
+        preprocessed_code (str): The preprocessed Java code.
+        context_window (int): Keep only the last context_window tokens before
+            the target as context (None = every preceding token).
+
+    Yields:
+        tuple: (context, target)
+    """
+    code = ' '.join(preprocessed_code.split())
+    # Start offsets of the tokens in the current context window
+    starts = deque(maxlen=context_window)
+    previous_end = None
+    for match in re.finditer(r'\S+', code):
+        if previous_end is not None:
+            yield code[starts[0]:previous_end], match.group()
+        # Without a window, every context starts at the first token
+        if context_window is not None or not starts:
+            starts.append(match.start())
+        previous_end = match.end()
+
+def extract_code_completion_pairs(preprocessed_code, context_window=None):
     """(Placeholder) Extracts context-target pairs for code completion.
 
     This is a simplified example. The actual logic will depend heavily on
@@ -49,47 +79,81 @@ def extract_code_completion_pairs(preprocessed_code):
 
     Args:
         preprocessed_code (str): The preprocessed Java code.
+        context_window (int): Maximum context length in tokens (None = unbounded).
 
     Returns:
         list: A list of tuples, where each tuple is (context, target).
     """
-    completion_pairs = []
-    # Example: Split the code into lines and consider the last token of a line
-    # as context and the next token (if any) as the target.
-    tokens = preprocessed_code.split()
-    for i in range(len(tokens) - 1):
-        context = " ".join(tokens[:i+1])
-        target = tokens[i+1]
-        completion_pairs.append((context, target))
-    return completion_pairs
+    # Example: consider every token as the target and the tokens before it as context.
+    return list(iter_code_completion_pairs(preprocessed_code, context_window))
+
+def _write_file_pairs(job):
+    """Process pool worker: writes the pairs of one Java file to its own part file.
+
+    Returns:
+        int: The number of pairs written, or None if the file could not be processed.
+    """
+    java_file, part_file, context_window = job
+    preprocessed_code = preprocess_java_code(java_file)
+    if not preprocessed_code:
+        return None
+    count = 0
+    with open(part_file, 'w', encoding='utf-8') as outfile:
+        for context, target in iter_code_completion_pairs(preprocessed_code, context_window):
+            outfile.write(f"context: {context}\ttarget: {target}\n")
+            count += 1
+    return count
+
+def write_code_completion_pairs(java_files, output_file, context_window=512, workers=None):
+    """Extracts the completion pairs of many Java files into one output file.
+
+    Files are processed in parallel by a process pool, each worker streaming
+    its pairs to a part file; part files are appended to output_file in the
+    order of java_files as soon as they are done, so memory use does not
+    grow with the corpus and the output is the same for any number of workers.
+
+    Args:
+        java_files (list): Paths of the Java files.
+        output_file (str): The path of the output file.
+        context_window (int): Maximum context length in tokens (None = unbounded).
+        workers (int): Worker processes (None = one per CPU, 1 = no pool).
+
+    Returns:
+        tuple: (files processed, pairs written)
+    """
+    part_dir = tempfile.mkdtemp(prefix="pairs-", dir=os.path.dirname(os.path.abspath(output_file)))
+    jobs = [(java_file, os.path.join(part_dir, f"{i}.txt"), context_window) for i, java_file in enumerate(java_files)]
+    processed = 0
+    total_pairs = 0
+    pool = Pool(workers) if workers != 1 else None
+    try:
+        results = pool.imap(_write_file_pairs, jobs, chunksize=4) if pool else map(_write_file_pairs, jobs)
+        with open(output_file, 'w', encoding='utf-8') as outfile:
+            for (java_file, part_file, _), count in zip(jobs, results):
+                print(f"Processing: {java_file}")
+                if count is None:
+                    continue
+                with open(part_file, 'r', encoding='utf-8') as part:
+                    shutil.copyfileobj(part, outfile)
+                os.remove(part_file)
+                processed += 1
+                total_pairs += count
+    finally:
+        if pool:
+            pool.terminate()
+        shutil.rmtree(part_dir, ignore_errors=True)
+    return processed, total_pairs
 
 if __name__ == "__main__":
     eclipse_project_path = "/path/to/your/eclipse/project"  # Replace with the actual path
     output_file = "eclipse_preprocessed_data.txt"
 
     java_files = find_java_files(eclipse_project_path)
-    all_completion_pairs = []
-
-    for java_file in java_files:
-        print(f"Processing: {java_file}")
-        preprocessed_code = preprocess_java_code(java_file)
-        if preprocessed_code:
-            # For a basic task, you might just want to save the cleaned code
-            # with open(output_file, 'a', encoding='utf-8') as outfile:
-            #     outfile.write(preprocessed_code)
-
-            # For a code completion task, you'll likely need to extract context-target pairs
-            completion_pairs = extract_code_completion_pairs(preprocessed_code)
-            all_completion_pairs.extend(completion_pairs)
-
-    # Save the extracted completion pairs
-    with open(output_file, 'w', encoding='utf-8') as outfile:
-        for context, target in all_completion_pairs:
-            outfile.write(f"context: {context}\ttarget: {target}\n")
+    processed, total_pairs = write_code_completion_pairs(java_files, output_file, context_window=512)
 
     print(f"\nPreprocessing complete. Results saved to {output_file}")
     print(f"Found {len(java_files)} Java files.")
-    print(f"Extracted {len(all_completion_pairs)} potential completion pairs (example-based).")
+    print(f"Extracted {total_pairs} potential completion pairs (example-based).")
 
     print("\n--- Important Considerations for a Real Code Completion Task ---")
     print("1. **More Sophisticated Parsing:** For accurate context and target extraction, especially for code completion, consider using a dedicated Java parsing library like JavaParser (as mentioned in the README recommendations). Libraries like this can provide you with the Abstract Syntax Tree (AST) of the code, which allows for much more precise identification of code elements and completion points.")
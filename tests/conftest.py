@@ -0,0 +1,86 @@
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+# The APICopilot modules import each other by module name
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "APICopilot"))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Dataset_Preprocessing"))
+
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    """
+    Local OpenAI-compatible chat completions endpoint. Answers every prompt
+    with reply(prompt) after `latency` seconds; the first `rate_limited`
+    requests get a 429 instead. Records the prompts it receives and the most
+    requests it had in flight at once.
+    """
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _FakeOpenAIHandler)
+        self.base_url = f"http://127.0.0.1:{self.server_address[1]}/v1"
+        self.reply = lambda prompt: f"echo: {prompt}"
+        self.latency = 0.0
+        self.rate_limited = 0
+        self.prompts = []
+        self.request_times = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+
+class _FakeOpenAIHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, payload, headers=()):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        server = self.server
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        prompt = body["messages"][0]["content"]
+        with server.lock:
+            server.request_times.append(time.monotonic())
+            if server.rate_limited > 0:
+                server.rate_limited -= 1
+                limited = True
+            else:
+                limited = False
+                server.prompts.append(prompt)
+                server.in_flight += 1
+                server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        if limited:
+            self._send(429, {"error": {"message": "rate limited", "type": "rate_limit"}}, [("retry-after", "0")])
+            return
+        time.sleep(server.latency)
+        with server.lock:
+            server.in_flight -= 1
+        self._send(200, {
+            "id": "chatcmpl-test", "object": "chat.completion", "created": 0, "model": body["model"],
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": server.reply(prompt)}}],
+        })
+
+
+@pytest.fixture
+def fake_openai():
+    server = FakeOpenAIServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,80 @@
+import pytest
+
+from ARExtractor import ARExtractor, _extract_python_ar_quadratic, _synthetic_python_module
+
+
+def test_python_ars_come_in_source_order():
+    code = "x = foo(bar(1))\n@deco(2)\ndef f():\n    return baz(qux(3), 4)\n"
+    ars = ARExtractor.extract_python_ar(code)
+    assert [ar['mcall'] for ar in ars] == ["foo(bar(1))", "bar(1)", "deco(2)", "baz(qux(3), 4)", "qux(3)"]
+    assert ars[0]['Args'] == [("bar(1)", 0)]
+    assert ars[1]['P'] == "x = foo("
+
+
+def test_python_offsets_count_characters_not_utf8_bytes():
+    code = "s = 'héllo – ✓'; t = g(s, 'ü')\nu = h('日本')\n"
+    ars = ARExtractor.extract_python_ar(code)
+    assert [code[ar.start:ar.end] for ar in ars] == ["g(s, 'ü')", "h('日本')"]
+    assert ars[0]['P'] == "s = 'héllo – ✓'; t = "
+    line_starts = ARExtractor._line_starts(code)
+    # 'é', '–' and '✓' take 2, 3 and 3 bytes; ast reports byte columns
+    assert ARExtractor._to_offset(code, line_starts, 1, len("s = 'héllo – ✓'; t = ".encode("utf-8"))) == ars[0].start
+    assert ARExtractor._to_offset(code, line_starts, 2, 4) == code.index("h('")
+
+
+@pytest.mark.parametrize("n_lines", [40, 400])
+def test_python_extraction_matches_the_quadratic_baseline(n_lines):
+    code = _synthetic_python_module(n_lines)
+    baseline = sorted(_extract_python_ar_quadratic(code), key=lambda ar: ar[0])
+    assert [(ar.start, ar['mcall'], ar['Args']) for ar in ARExtractor.extract_python_ar(code)] == baseline
+
+
+def java_calls(code):
+    return [(ar['mcall'], ar['Args']) for ar in ARExtractor.extract_java_ar(code)]
+
+
+@pytest.mark.parametrize("code, expected", [
+    ('log.info("f(a, b)", x);', [('log.info("f(a, b)", x)', [('"f(a, b)"', 0), ("x", 1)])]),
+    ("// g(c, d)\nout.print(e);", [("out.print(e)", [("e", 0)])]),
+    ("/* h.k(c, d) */ out.print(e, /* , */ f);", [("out.print(e, /* , */ f)", [("e", 0), ("/* , */ f", 1)])]),
+    ("sb.append(',', ')');", [("sb.append(',', ')')", [("','", 0), ("')'", 1)])]),
+    ('db.query("""\n    SELECT a(1, 2) FROM "t"\n    """, limit);',
+     [('db.query("""\n    SELECT a(1, 2) FROM "t"\n    """, limit)', [('"""\n    SELECT a(1, 2) FROM "t"\n    """', 0),
+                                                                   ("limit", 1)])]),
+    ("cache.put(key, new HashMap<String, List<Integer>>());",
+     [("cache.put(key, new HashMap<String, List<Integer>>())",
+       [("key", 0), ("new HashMap<String, List<Integer>>()", 1)])]),
+    ("a.b(c < d, e > f);", [("a.b(c < d, e > f)", [("c < d", 0), ("e > f", 1)])]),
+    ("list.forEach((x, y) -> map.put(x, y));",
+     [("list.forEach((x, y) -> map.put(x, y))", [("(x, y) -> map.put(x, y)", 0)]),
+      ("map.put(x, y)", [("x", 0), ("y", 1)])]),
+    ("r.resize(img, /* Missing Arguments */);", [("r.resize(img, /* Missing Arguments */)", [("img", 0), (None, 1)])]),
+])
+def test_java_scanner_skips_literals_comments_and_generics(code, expected):
+    assert java_calls(code) == expected
+
+
+def test_java_calls_with_explicit_type_arguments():
+    code = "List<String> l = Collections.<String>emptyList(); r = obj.<Map<K, V>>call(u, v);"
+    assert java_calls(code) == [("Collections.<String>emptyList()", []),
+                                ("obj.<Map<K, V>>call(u, v)", [("u", 0), ("v", 1)])]
+    assert java_calls("ok = m < n && k >b.c(d);") == [("b.c(d)", [("d", 0)])]
+
+
+def test_java_scanner_recovers_from_unbalanced_calls():
+    # Unclosed calls are dropped; the calls after them are still found
+    assert java_calls("a.b(c, d] e.f(g);") == [("e.f(g)", [("g", 0)])]
+    assert java_calls("x.y(1, 2; z.w(3);") == [("z.w(3)", [("3", 0)])]
+    assert java_calls("u.v(1)); s.t(2);") == [("u.v(1)", [("1", 0)]), ("s.t(2)", [("2", 0)])]
+
+
+@pytest.mark.parametrize("arguments, expected", [
+    ('"a, b", c', ['"a, b"', "c"]),
+    ("new int[]{1, 2}, m.get(i, j)", ["new int[]{1, 2}", "m.get(i, j)"]),
+    ("Map<String, Integer> m, x", ["Map<String, Integer> m", "x"]),
+    ("a < b, c > d", ["a < b", "c > d"]),
+    ("(p, q) -> p + q, ','", ["(p, q) -> p + q", "','"]),
+    ("", []),
+])
+def test_split_arguments(arguments, expected):
+    assert ARExtractor.split_arguments(arguments) == expected
@@ -0,0 +1,38 @@
+import asyncio
+
+import pytest
+
+from ArgumentRecommender import ArgumentRecommender
+
+
+def test_blocking_recommend_many_inside_a_running_loop_points_to_the_async_api(fake_openai):
+    fake_openai.reply = lambda prompt: "t.resize(img, 300, 200);"
+    recommender = ArgumentRecommender(api_key="test", base_url=fake_openai.base_url)
+
+    async def run():
+        with pytest.raises(RuntimeError, match="arecommend_many"):
+            recommender.recommend_many(["p"])
+        return await recommender.arecommend_many(["p"])
+
+    assert asyncio.run(run()) == [["img", "300", "200"]]
+
+
+def test_recommender_with_stub_backend_end_to_end(tmp_path):
+    from LLMBackend import StubBackend
+    from ResponseCache import ResponseCache
+
+    prompts = ["Complete: t.resize(img, 300, /* Missing Arguments */",
+               "Complete: settings.update(\"admin\", ",
+               "Complete: t.resize(img, 300, /* Missing Arguments */"]
+    backend = StubBackend(responses={prompts[1]: "settings.update(\"admin\", true);"})
+    cache = ResponseCache(str(tmp_path / "responses.sqlite"))
+    recommender = ArgumentRecommender(api_key=None, backend=backend, expected_types=None, cache=cache)
+    assert recommender.recommend_many(prompts) == [["img", "300"], ["\"admin\"", "true"], ["img", "300"]]
+    assert recommender.recommend_arguments(prompts[0]) == ["img", "300"]
+    assert backend.stats()["completed"] == 2
+
+    replay = ArgumentRecommender(api_key=None, backend=StubBackend(), cache=str(tmp_path / "responses.sqlite"),
+                                 replay=True)
+    assert replay.recommend_many(prompts[:2]) == [["img", "300"], ["\"admin\"", "true"]]
+    with pytest.raises(KeyError):
+        replay.recommend_arguments("never seen")
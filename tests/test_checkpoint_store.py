@@ -0,0 +1,93 @@
+import pytest
+
+from CheckpointStore import CheckpointStore
+
+
+def test_partial_last_line_is_truncated_on_reopen(tmp_path):
+    store = CheckpointStore(str(tmp_path))
+    store.put("ar1", "triples", "in1", [["img", "typeOf", "Image"]])
+    store.put("ar2", "triples", "in2", [])
+    store.close()
+    complete = (tmp_path / "checkpoints.jsonl").stat().st_size
+    with open(tmp_path / "checkpoints.jsonl", "ab") as f:
+        f.write(b'{"ar": "ar3", "stage": "triples", "inp')
+
+    store = CheckpointStore(str(tmp_path))
+    assert (tmp_path / "checkpoints.jsonl").stat().st_size == complete
+    assert len(store) == 2
+    assert store.get("ar1", "triples", "in1") == [["img", "typeOf", "Image"]]
+    assert store.get("ar3", "triples", "in3") is None
+    # Appends after the recovered tail are readable
+    store.put("ar3", "triples", "in3", [["a", "b", "c"]])
+    store.close()
+    store = CheckpointStore(str(tmp_path))
+    assert store.get("ar3", "triples", "in3") == [["a", "b", "c"]]
+    store.close()
+
+
+def test_fingerprint_mismatch_is_a_miss(tmp_path):
+    store = CheckpointStore(str(tmp_path))
+    inputs = CheckpointStore.fingerprint("ar1", "gpt-4o", 1)
+    store.put("ar1", "prompt", inputs, "old prompt")
+    assert store.get("ar1", "prompt", CheckpointStore.fingerprint("ar1", "gpt-4o", 2)) is None
+    assert not store.has("ar1", "prompt", CheckpointStore.fingerprint("ar1", "gpt-4o", 2))
+    assert store.latest("ar1", "prompt") == "old prompt"
+    assert store.get("ar1", "prompt", inputs) == "old prompt"
+    # A newer record for the same stage supersedes the older one
+    store.put("ar1", "prompt", "other", "new prompt")
+    assert store.get("ar1", "prompt", inputs) is None
+    assert store.stats()["hits"] == 1 and store.stats()["misses"] == 2
+    assert CheckpointStore.fingerprint(("a", 1)) == CheckpointStore.fingerprint(["a", 1])
+    store.close()
+
+
+JAVA_ARS = [
+    {'P': f'Image image{i} = new Image("{i}.png");\nImageTransformer t = new ImageTransformer();\n',
+     'mcall': f"t.resize(image{i}, /* Missing Arguments */)", 'Args': [(f"image{i}", 0), (None, 1)]}
+    for i in range(5)
+]
+
+
+@pytest.fixture
+def make_app(tmp_path, monkeypatch):
+    import Main
+    from EmbeddingService import EmbeddingService, HashingEmbeddingService
+    from LLMBackend import StubBackend
+
+    # Main names preprocessors it does not import; the pipeline is fed ARs directly here
+    monkeypatch.setattr(Main, "EclipsePreprocessing", lambda path: None, raising=False)
+    monkeypatch.setitem(EmbeddingService._shared, "codellama/CodeLlama-7b-hf", HashingEmbeddingService())
+
+    def make():
+        backend = StubBackend()
+        app = Main.APICopilot("eclipse", str(tmp_path), None, triple_cache_path=None, triple_mode="local",
+                              training_ars=JAVA_ARS[:2], checkpoint_dir=str(tmp_path / "checkpoints"),
+                              response_cache_path=None, llm_backend=backend)
+        return app, backend
+    return make
+
+
+def test_resumed_run_skips_done_ars(make_app, monkeypatch):
+    app, backend = make_app()
+    first = list(app.iter_recommendations(JAVA_ARS[:3], chunk_size=2))
+    assert backend.stats()["completed"] == 3
+    app.checkpoints.close()
+
+    # A rerun after an interruption recomputes only the ARs not marked done
+    app, backend = make_app()
+    retrieved = []
+    retrieve = app._retrieve_examples_for
+    monkeypatch.setattr(app, "_retrieve_examples_for", lambda ars: retrieved.extend(ars) or retrieve(ars))
+    results = list(app.iter_recommendations(JAVA_ARS, chunk_size=2))
+    assert [result['prompt'] for result in results[:3]] == [result['prompt'] for result in first]
+    assert [result['recommended_arguments'] for result in results[:3]] == \
+        [result['recommended_arguments'] for result in first]
+    assert retrieved == JAVA_ARS[3:]
+    assert backend.stats()["completed"] == 2
+    app.checkpoints.close()
+
+    # Without resume everything is recomputed
+    app, backend = make_app()
+    assert len(list(app.iter_recommendations(JAVA_ARS, chunk_size=2, resume=False))) == 5
+    assert backend.stats()["completed"] == 5
+    app.checkpoints.close()
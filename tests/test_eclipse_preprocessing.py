@@ -0,0 +1,65 @@
+import pytest
+
+from Eclipse_preprocessing import preprocess_java_code, write_code_completion_pairs
+
+SOURCES = {
+    "Editor.java": """package demo;
+// A comment that is dropped
+public class Editor {
+    /* block
+       comment */
+    public Image crop(Image img, int w) {
+        return img.crop(0, 0, w, "é\\t ü");
+    }
+}
+""",
+    "Empty.java": "",
+    "One.java": "token",
+    "Broken.java": b"class \xff\xfe {}",
+    "Loop.java": "for (int i = 0; i < n; i++) {\n\tsum += values[i];\n}\n" * 20,
+}
+
+
+def reference_pairs(preprocessed_code, context_window=None):
+    """The original quadratic extraction, with the context cut to the window"""
+    tokens = preprocessed_code.split()
+    pairs = []
+    for i in range(len(tokens) - 1):
+        start = 0 if context_window is None else max(0, i + 1 - context_window)
+        pairs.append((" ".join(tokens[start:i + 1]), tokens[i + 1]))
+    return pairs
+
+
+@pytest.fixture
+def java_files(tmp_path):
+    paths = []
+    for name, source in SOURCES.items():
+        path = tmp_path / name
+        if isinstance(source, bytes):
+            path.write_bytes(source)
+        else:
+            path.write_text(source, encoding="utf-8")
+        paths.append(str(path))
+    return paths
+
+
+@pytest.mark.parametrize("context_window", [None, 4])
+@pytest.mark.parametrize("workers", [1, 3])
+def test_output_matches_the_original_extraction(tmp_path, java_files, workers, context_window):
+    expected = []
+    processed = 0
+    for path in java_files:
+        code = preprocess_java_code(path)
+        if code:
+            processed += 1
+            expected.extend(f"context: {context}\ttarget: {target}\n"
+                            for context, target in reference_pairs(code, context_window))
+    output_file = tmp_path / "out" / "pairs.txt"
+    output_file.parent.mkdir()
+    counts = write_code_completion_pairs(java_files, str(output_file), context_window=context_window,
+                                         workers=workers)
+
+    assert output_file.read_bytes() == "".join(expected).encode("utf-8")
+    assert counts == (processed, len(expected))
+    # Part files are cleaned up
+    assert [path.name for path in output_file.parent.iterdir()] == ["pairs.txt"]
@@ -0,0 +1,34 @@
+import networkx as nx
+import pytest
+
+from EmbeddingService import HashingEmbeddingService
+from GraphMatcher import GraphMatcher, _mapping_set, _synthetic_kgs
+
+
+def test_budget_is_charged_when_pairs_fail_syntactic_feasibility():
+    # Isolated example nodes can never host the input edge, so every
+    # candidate pair fails syntactic feasibility
+    kg_examples = nx.MultiDiGraph()
+    kg_examples.add_nodes_from(f"node{i}" for i in range(500))
+    g_input = nx.MultiDiGraph()
+    g_input.add_edge("a", "b", label="takesArgument")
+    matcher = GraphMatcher(kg_examples, g_input, embedding_service=HashingEmbeddingService())
+    matcher.similarity_threshold = -2.0
+    matcher.filter_candidates = False
+
+    assert matcher.get_top_k_subgraphs(top_k=3, max_expansions=10) == []
+    assert not matcher.last_search['complete']
+    assert matcher.get_top_k_subgraphs(top_k=3, time_budget=0.0, max_expansions=10 ** 9) == []
+    assert matcher.last_search['stopped'] == "exceeded time budget"
+
+
+@pytest.mark.parametrize("n_calls", [50, 200])
+def test_candidate_filtering_keeps_the_same_mappings(n_calls):
+    kg_examples, g_input = _synthetic_kgs(n_calls)
+    found = {}
+    for filtered in (False, True):
+        matcher = GraphMatcher(kg_examples, g_input, embedding_service=HashingEmbeddingService())
+        matcher.filter_candidates = filtered
+        found[filtered] = _mapping_set(matcher.find_isomorphic_subgraphs())
+    assert len(found[True]) >= 20
+    assert found[True] == found[False]
@@ -0,0 +1,56 @@
+import asyncio
+import re
+
+import pytest
+
+from KnowledgeTripleExtractor import KnowledgeTripleExtractor
+
+
+def make_ar(i):
+    return {'P': f"Image image{i} = new Image(\"{i}.png\");", 'mcall': f"t.resize(image{i}, ", 'Args': []}
+
+
+def reply(prompt):
+    variable = re.search(r"Image (image\d+) =", prompt).group(1)
+    return f"({variable}, typeOf, Image)\n(t.resize, takesArgument, {variable})"
+
+
+def extractor(server, **kwargs):
+    server.reply = reply
+    return KnowledgeTripleExtractor(api_key="test", base_url=server.base_url, backoff_base=0.01,
+                                    backoff_max=0.05, **kwargs)
+
+
+def test_results_keep_input_order_and_duplicates_are_sent_once(fake_openai):
+    fake_openai.latency = 0.05
+    ars = [make_ar(i) for i in (3, 1, 2, 1, 3, 0)]
+    results = extractor(fake_openai, max_concurrency=8).extract_triples_many(ars)
+    assert results == [[(f"image{i}", "typeOf", "Image"), ("t.resize", "takesArgument", f"image{i}")]
+                       for i in (3, 1, 2, 1, 3, 0)]
+    assert len(fake_openai.prompts) == 4
+
+
+def test_rate_limited_requests_are_retried(fake_openai):
+    fake_openai.rate_limited = 5
+    ars = [make_ar(i) for i in range(4)]
+    results = extractor(fake_openai, max_concurrency=2).extract_triples_many(ars)
+    assert [result[0][0] for result in results] == ["image0", "image1", "image2", "image3"]
+    assert fake_openai.rate_limited == 0
+    assert len(fake_openai.request_times) == 9
+
+
+def test_failures_after_all_retries_give_empty_triples(fake_openai):
+    fake_openai.rate_limited = 100
+    results = extractor(fake_openai, max_retries=1).extract_triples_many([make_ar(0)])
+    assert results == [[]]
+
+
+def test_blocking_call_inside_a_running_loop_points_to_the_async_api(fake_openai):
+    triple_extractor = extractor(fake_openai)
+
+    async def run():
+        with pytest.raises(RuntimeError, match="aextract_triples_many"):
+            triple_extractor.extract_triples_many([make_ar(0)])
+        return await triple_extractor.aextract_triples_many([make_ar(0)])
+
+    assert asyncio.run(run())[0][0] == ("image0", "typeOf", "Image")
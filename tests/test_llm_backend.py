@@ -0,0 +1,56 @@
+import asyncio
+
+import pytest
+
+from LLMBackend import LLMBackend, StubBackend, format_backend_stats
+
+
+@pytest.mark.parametrize("prompt, completion", [
+    ("int f(int x) { return x; } int y = f(", "f();"),
+    ("Input: transformer.resize(originalImage, /* Missing Arguments */", "transformer.resize(originalImage);"),
+    ("a.b(c(d), e, ", "a.b(c(d), e);"),
+    ("x = (a + g(h(1), ", "g(h(1));"),
+    ("Complete this call:\nsettings.update(\"admin\",\n", "settings.update(\"admin\");"),
+    ("done(1);", ""),
+])
+def test_stub_closes_the_last_open_call(prompt, completion):
+    assert StubBackend().complete(prompt) == completion
+
+
+def test_stub_answers_from_responses_first():
+    stub = StubBackend(responses={"known": "k(1);"})
+    assert stub.complete_many(["known", "f("]) == ["k(1);", "f();"]
+    assert StubBackend(responses=str.upper).complete("abc") == "ABC"
+
+
+class SyncOnly(LLMBackend):
+    def complete_many(self, prompts, temperature=0.0, max_tokens=256):
+        outputs = [ValueError(prompt) if prompt == "bad" else prompt[::-1] for prompt in prompts]
+        for output in outputs:
+            self._record(0.0, 1.0, isinstance(output, BaseException))
+        return outputs
+
+
+class AsyncOnly(LLMBackend):
+    async def acomplete_many(self, prompts, temperature=0.0, max_tokens=256):
+        await asyncio.sleep(0)
+        return [ValueError(prompt) if prompt == "bad" else prompt[::-1] for prompt in prompts]
+
+
+@pytest.mark.parametrize("backend_class", [SyncOnly, AsyncOnly])
+def test_complete_variants_derive_from_each_other(backend_class):
+    backend = backend_class()
+    assert backend.complete("abc") == "cba"
+    outputs = backend.complete_many(["ab", "bad"])
+    assert outputs[0] == "ba" and isinstance(outputs[1], ValueError)
+    assert asyncio.run(backend.acomplete_many(["xy"])) == ["yx"]
+    with pytest.raises(ValueError):
+        backend.complete("bad")
+
+
+def test_stats_count_completions_and_failures():
+    backend = SyncOnly()
+    backend.complete_many(["a", "bad", "c"])
+    stats = backend.stats()
+    assert (stats["completed"], stats["failed"]) == (3, 1)
+    assert "backend" in format_backend_stats([backend, StubBackend()])
@@ -0,0 +1,94 @@
+import pytest
+
+from ARExtractor import ARExtractor
+from KnowledgeTripleExtractor import KnowledgeTripleExtractor
+from LLMBackend import StubBackend
+from LocalTripleExtractor import LocalTripleExtractor
+
+JAVA_AR = {
+    'P': """class Editor {
+    // Image ignored = load("x;y");
+    void apply(final Image img, int width) {
+        String label = "w={" + width;
+        Canvas canvas = new Canvas(640, 480);
+        Image scaled = """,
+    'mcall': "canvas.draw(img, label, /* Missing Arguments */)",
+    'Args': [('img', 0), ('label', 1), (None, 2)],
+}
+PYTHON_AR = {
+    'P': "def thumb(path: str, size: int):\n    img = Image.open(path)\n    out = ",
+    'mcall': "img.resize(size // 2, \"a, b\", size, ",
+    'Args': [],
+}
+UNKNOWN_AR = {'P': "int x = 1;\n", 'mcall': "helper.run(unknown, other, ", 'Args': []}
+
+
+def test_java_triples():
+    extractor = LocalTripleExtractor("java")
+    triples = extractor.extract_triples(JAVA_AR)
+    assert triples == [
+        ("canvas", "hasMethod", "draw"),
+        ("canvas.draw", "takesArgument", "img"),
+        ("canvas.draw", "takesArgument", "label"),
+        ("canvas.draw", "takesArgument", "null"),
+        ("scaled", "assignedFrom", "canvas.draw"),
+        ("scaled", "typeOf", "Image"),
+        ("canvas", "typeOf", "Canvas"),
+        ("canvas", "hasValue", "640"),
+        ("canvas", "hasValue", "480"),
+        ("img", "typeOf", "Image"),
+        ("label", "typeOf", "String"),
+    ]
+    assert extractor.coverage(JAVA_AR, triples) == 1.0
+
+
+def test_python_triples():
+    extractor = LocalTripleExtractor("python")
+    triples = extractor.extract_triples(PYTHON_AR)
+    assert triples == [
+        ("img", "hasMethod", "resize"),
+        ("img.resize", "takesArgument", "size // 2"),
+        ("img.resize", "takesArgument", '"a, b"'),
+        ("img.resize", "takesArgument", "size"),
+        ("img.resize", "takesArgument", "null"),
+        ("out", "assignedFrom", "img.resize"),
+        ("img", "assignedFrom", "Image.open"),
+        ("size", "typeOf", "int"),
+    ]
+    assert extractor.coverage(PYTHON_AR, triples) == 1.0
+
+
+@pytest.mark.parametrize("code, language, expected", [
+    ("f(a // 2, b)", "python", ["a // 2", "b"]),
+    ("f(a // 2, b)", "java", ["a // 2, b)"]),  # a comment in Java: the call stays open
+    ("f('''x,\n y''', [1, 2], ", "python", ["'''x,\n y'''", "[1, 2]", ""]),
+    ("f(\"a)\", g(b, c), ", "java", ['"a)"', "g(b, c)", ""]),
+])
+def test_call_arguments_use_the_language_lexer(code, language, expected):
+    assert ARExtractor.call_arguments(code, 1, language) == expected
+
+
+def test_low_coverage():
+    extractor = LocalTripleExtractor("java")
+    assert extractor.coverage(UNKNOWN_AR, extractor.extract_triples(UNKNOWN_AR)) == 0.0
+
+
+def test_local_first_falls_back_to_the_llm_on_low_coverage():
+    prompts = []
+
+    def answer(prompt):
+        prompts.append(prompt)
+        return "(unknown, typeOf, Worker)\n(other, typeOf, Worker)"
+
+    extractor = KnowledgeTripleExtractor(mode="local-first", backend=StubBackend(responses=answer))
+    assert extractor.extract_triples(JAVA_AR) == LocalTripleExtractor("java").extract_triples(JAVA_AR)
+    assert prompts == []
+    llm_triples = [("unknown", "typeOf", "Worker"), ("other", "typeOf", "Worker")]
+    assert extractor.extract_triples(UNKNOWN_AR) == llm_triples
+    assert len(prompts) == 1
+    assert extractor.extract_triples_many([UNKNOWN_AR, JAVA_AR])[0] == llm_triples
+    assert len(prompts) == 2
+
+    local = KnowledgeTripleExtractor(mode="local", backend=StubBackend(responses=answer))
+    assert local.extract_triples(UNKNOWN_AR)[0] == ("helper", "hasMethod", "run")
+    assert len(prompts) == 2
@@ -0,0 +1,89 @@
+import random
+import threading
+import time
+
+import pytest
+
+from PipelineExecutor import PipelineExecutor, Stage, _slow_square
+
+
+def jittered(fn):
+    rng = random.Random(0)
+    lock = threading.Lock()
+
+    def run(x):
+        with lock:
+            delay = rng.random() * 0.005
+        time.sleep(delay)
+        return fn(x)
+    return run
+
+
+def test_results_keep_input_order_with_several_workers_per_stage():
+    executor = PipelineExecutor([
+        Stage("add", jittered(lambda x: x + 1), workers=6),
+        Stage("square", _slow_square, workers=2, kind="process"),
+        Stage("pair", jittered(str), workers=4, select=lambda x: x * 2, merge=lambda x, doubled: (x, doubled)),
+    ], queue_size=4)
+    assert list(executor.run(range(60))) == [((x + 1) ** 2, str((x + 1) ** 2 * 2)) for x in range(60)]
+    assert [row['processed'] for row in executor.stats()] == [60, 60, 60]
+
+
+def test_unordered_results_are_complete():
+    executor = PipelineExecutor([Stage("add", jittered(lambda x: x + 1), workers=6)], ordered=False)
+    assert sorted(executor.run(range(100))) == list(range(1, 101))
+
+
+def test_stage_failure_is_raised_for_its_item():
+    def fail_on_seven(x):
+        if x == 7:
+            raise ValueError("bad item")
+        return x
+
+    executor = PipelineExecutor([Stage("check", fail_on_seven, workers=3), Stage("copy", str, workers=2)])
+    seen = []
+    with pytest.raises(RuntimeError, match="stage 'check' failed") as failure:
+        for result in executor.run(range(20)):
+            seen.append(result)
+    assert isinstance(failure.value.__cause__, ValueError)
+    # Results before the failed item are yielded as far as they arrived before it
+    assert seen == [str(x) for x in range(len(seen))] and len(seen) <= 7
+    assert executor.stats()[0]['failed'] == 1
+
+
+def test_input_failure_is_raised():
+    def items():
+        yield 1
+        raise OSError("read error")
+
+    with pytest.raises(RuntimeError, match="stage 'input' failed"):
+        list(PipelineExecutor([Stage("copy", str)]).run(items()))
+
+
+@pytest.mark.parametrize("ordered", [True, False])
+def test_slow_downstream_stage_bounds_the_work_in_flight(ordered):
+    pulled = [0]
+
+    def items():
+        for x in range(200):
+            pulled[0] += 1
+            yield x
+
+    queue_size = 4
+    executor = PipelineExecutor([
+        Stage("fast", lambda x: x, workers=4),
+        Stage("slow", lambda x: (time.sleep(0.002), x)[1]),
+    ], queue_size=queue_size, ordered=ordered)
+    # Two input queues, the output queue, the workers and one item held by the feeder
+    bound = 3 * queue_size + 5 + 1
+    consumed = 0
+    most_in_flight = 0
+    for _ in executor.run(items()):
+        consumed += 1
+        most_in_flight = max(most_in_flight, pulled[0] - consumed)
+    assert consumed == 200
+    assert most_in_flight <= bound
+    for row in executor.stats():
+        assert row['max_queue_depth'] <= queue_size
+    # The slow stage's input queue is what fills up
+    assert executor.stats()[1]['max_queue_depth'] >= queue_size - 1
@@ -0,0 +1,50 @@
+import json
+import os
+
+from PromptDataset import PromptDataset
+
+RECORDS = [{"Arguments": f"a{i}, \"x, y\"", "Text": "é" * i} for i in range(25)]
+
+
+def test_write_indexes_every_record(tmp_path):
+    path = str(tmp_path / "records.jsonl")
+    dataset = PromptDataset.write(iter(RECORDS), path)
+    try:
+        assert len(dataset) == len(RECORDS)
+        assert dataset[7] == RECORDS[7]
+        assert dataset[-1] == RECORDS[-1]
+        assert dataset[3:6] == RECORDS[3:6]
+        assert list(dataset) == RECORDS
+        assert list(dataset.iter_from(20)) == RECORDS[20:]
+        assert os.path.exists(path + ".idx")
+    finally:
+        dataset.close()
+
+
+def test_from_json_streams_array_in_small_chunks(tmp_path):
+    source = tmp_path / "records.JSON"
+    source.write_text(json.dumps(RECORDS, indent=2), encoding="utf-8")
+    assert list(PromptDataset.iter_json_array(str(source), chunk_size=16)) == RECORDS
+
+    path = str(tmp_path / "converted.jsonl")
+    dataset = PromptDataset.from_json(str(source), path=path)
+    try:
+        assert dataset.path == path
+        assert dataset[12] == RECORDS[12]
+        assert list(PromptDataset.iter_records(str(source))) == list(PromptDataset.iter_records(path))
+    finally:
+        dataset.close()
+    assert not os.path.exists(tmp_path / "records.jsonl")
+
+
+def test_stale_index_is_rebuilt(tmp_path):
+    path = str(tmp_path / "records.jsonl")
+    PromptDataset.write(RECORDS[:5], path).close()
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(RECORDS[5]) + "\n")
+    dataset = PromptDataset(path)
+    try:
+        assert len(dataset) == 6
+        assert dataset[5] == RECORDS[5]
+    finally:
+        dataset.close()
@@ -0,0 +1,42 @@
+import pytest
+
+from PromptGenerator import PromptGenerator
+
+INPUT_AR = {
+    'P': "\n".join(f"Image image{i} = loader.load(\"{i}.png\");" for i in range(40)),
+    'mcall': "transformer.resize(image0, /* Missing Arguments */",
+    'Args': [(None, 1)],
+    'knowledge_triples': [("image0", "typeOf", "Image"), ("transformer.resize", "takesArgument", "image0")],
+}
+TOP_GRAPHS = [{'knowledge_triples': [(f"other{i}", "typeOf", "Image")] * 3} for i in range(3)]
+EXAMPLE_ARS = [{'ar': {'mcall': f"t{i}.resize(img, 300, 200)", 'Args': ["img", "300", "200"]},
+                'knowledge_triples': [(f"img{i}", "typeOf", "Image")] * 2} for i in range(3)]
+
+
+@pytest.mark.parametrize("budget", [250, 400, 600])
+def test_prompt_fits_the_budget(budget):
+    generator = PromptGenerator(INPUT_AR, TOP_GRAPHS, EXAMPLE_ARS, token_budget=budget)
+    counts = generator.token_counts()
+    assert counts['total'] <= budget and counts['over_budget'] == 0
+
+
+def test_prompt_over_budget_is_flagged():
+    generator = PromptGenerator(INPUT_AR, TOP_GRAPHS, EXAMPLE_ARS, token_budget=60)
+    with pytest.warns(UserWarning, match="over the budget of 60"):
+        counts = generator.token_counts()
+    assert counts['over_budget'] == 1 and counts['total'] > 60
+    assert set(generator.sections()) == {'instructions', 'input_triples', 'query'}
+
+
+def test_records_carry_only_the_sections_kept_in_the_prompt():
+    items = [(INPUT_AR, TOP_GRAPHS, EXAMPLE_ARS)]
+    record = next(PromptGenerator.render_many(items, token_budget=250, token_counts=True))
+    assert record["Prompt"] == PromptGenerator(INPUT_AR, TOP_GRAPHS, EXAMPLE_ARS, token_budget=250).generate_prompt()
+    assert "Top Matching Graph Triples:" not in record["Prompt"]
+    assert record["Top Matching Graph Triples"] == ""
+    assert record["Input Preceding Code"].endswith(INPUT_AR['mcall'])
+
+    record = next(PromptGenerator.render_many(items))
+    assert record["Top Matching Graph Triples"].count("\n") == 8
+    assert [key for key in record if key.startswith("Best Example")] == ["Best Example 1", "Best Example 2",
+                                                                         "Best Example 3"]
@@ -0,0 +1,76 @@
+import json
+
+import pytest
+
+from LLMBackend import StubBackend
+from PromptDataset import PromptDataset
+from ReplayEvaluator import ReplayEvaluator
+
+PROMPTS = [
+    {"Query": "Complete the arguments.", "Best Example 1": "max(a, b);",
+     "Input Preceding Code": "int big = Math.max("},
+    {"Prompt": "Input:\nsettings.update("},
+    {"Query": "Complete the arguments.", "Input Preceding Code": "String s = String.format("},
+]
+TRUTHS = [
+    {"Arguments": "first, second"},
+    {"Arguments": "\"admin\", Map.of(\"a\", 1)"},
+    {"Arguments": "\"%d, %d\", x,  y"},
+]
+ANSWERS = {
+    ReplayEvaluator.build_prompt(PROMPTS[0]): "int big = Math.max(first, second);",
+    ReplayEvaluator.build_prompt(PROMPTS[1]): "```\nsettings.update(\"admin\", Map.of(\"a\", 1));\n```",
+    ReplayEvaluator.build_prompt(PROMPTS[2]): "\"%d, %d\", x, y",
+}
+
+
+def write(tmp_path, prompts, truths):
+    prompts_path = str(tmp_path / "prompts.jsonl")
+    truths_path = str(tmp_path / "truths.JSON")
+    PromptDataset.write(prompts, prompts_path).close()
+    (tmp_path / "truths.JSON").write_text(json.dumps(truths), encoding="utf-8")
+    return prompts_path, truths_path
+
+
+@pytest.mark.parametrize("concurrency", [1, 4])
+def test_known_answers_score_perfectly(tmp_path, concurrency):
+    prompts_path, truths_path = write(tmp_path, PROMPTS, TRUTHS)
+    evaluator = ReplayEvaluator(StubBackend(responses=ANSWERS), prompts_path, truths_path, concurrency=concurrency)
+    output_path = str(tmp_path / "results.jsonl")
+    report = evaluator.evaluate(output_path=output_path)
+
+    assert report["prompts"] == 3
+    assert report["errors"] == 0
+    assert report["exact_match"] == 1.0
+    assert report["argument_accuracy"] == 1.0
+    for key in ("mean_latency", "p50_latency", "p95_latency", "p99_latency", "requests_per_second"):
+        assert report[key] >= 0.0
+    results = list(PromptDataset.iter_records(output_path))
+    assert [result["index"] for result in results] == [0, 1, 2]
+    assert results[2]["expected"] == ["\"%d, %d\"", "x", "y"]
+
+
+def test_wrong_and_failed_predictions_are_scored(tmp_path):
+    prompts_path, truths_path = write(tmp_path, PROMPTS, TRUTHS)
+    answers = dict(ANSWERS)
+    answers[ReplayEvaluator.build_prompt(PROMPTS[0])] = "Math.max(first, third);"
+
+    def predictor(prompt):
+        if prompt == ReplayEvaluator.build_prompt(PROMPTS[1]):
+            raise TimeoutError("no answer")
+        return answers[prompt]
+
+    report = ReplayEvaluator(predictor, prompts_path, truths_path).evaluate()
+    assert report["errors"] == 1
+    assert report["exact_match"] == pytest.approx(1 / 3)
+    assert report["argument_accuracy"] == pytest.approx(4 / 7)
+
+
+@pytest.mark.parametrize("prompts, truths", [(PROMPTS, TRUTHS[:2]), (PROMPTS[:2], TRUTHS)])
+def test_datasets_of_different_lengths_are_rejected(tmp_path, prompts, truths):
+    prompts_path, truths_path = write(tmp_path, prompts, truths)
+    evaluator = ReplayEvaluator(StubBackend(responses=ANSWERS), prompts_path, truths_path)
+    with pytest.raises(ValueError, match="ends after 2 records"):
+        evaluator.evaluate()
+    # Replaying only the records both datasets have is fine
+    assert evaluator.evaluate(limit=2)["exact_match"] == 1.0
@@ -0,0 +1,78 @@
+import asyncio
+import threading
+import time
+
+from RequestEngine import ChatRequestEngine, ConcurrencyLimit, TokenBucket
+
+
+def test_concurrency_limit_is_shared_across_threads(fake_openai):
+    fake_openai.latency = 0.1
+    engine = ChatRequestEngine(api_key="test", base_url=fake_openai.base_url, max_concurrency=4)
+    results = {}
+
+    def run(name):
+        results[name] = engine.complete_many([f"{name} {i}" for i in range(12)])
+
+    threads = [threading.Thread(target=run, args=(name,)) for name in ("a", "b", "c")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results["b"] == [f"echo: b {i}" for i in range(12)]
+    assert fake_openai.max_in_flight == 4
+
+
+def test_rate_limit_holds_across_chunks(fake_openai):
+    engine = ChatRequestEngine(api_key="test", base_url=fake_openai.base_url, requests_per_second=20)
+    start = time.monotonic()
+    for chunk in range(3):
+        engine.complete_many([f"{chunk} {i}" for i in range(20)])
+    # The first 20 requests are the burst; the other 40 are paced at 20 per second
+    assert time.monotonic() - start >= 1.8
+    assert len(fake_openai.prompts) == 60
+
+
+def test_blocking_complete_shares_the_limits(fake_openai):
+    fake_openai.latency = 0.1
+    engine = ChatRequestEngine(api_key="test", base_url=fake_openai.base_url, max_concurrency=2)
+    threads = [threading.Thread(target=engine.complete, args=(f"p{i}",)) for i in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert fake_openai.max_in_flight == 2
+
+
+def test_token_bucket_paces_reservations():
+    bucket = TokenBucket(rate=10, capacity=2)
+    delays = [bucket.reserve() for _ in range(4)]
+    assert delays[:2] == [0.0, 0.0]
+    assert 0.09 < delays[2] < 0.11 and 0.19 < delays[3] < 0.21
+
+
+def test_cancelled_waiter_passes_its_slot_on():
+    limit = ConcurrencyLimit(1)
+
+    async def run():
+        entered = []
+
+        async def hold():
+            async with limit:
+                await asyncio.sleep(0.05)
+
+        async def enter(name):
+            async with limit:
+                entered.append(name)
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        cancelled = asyncio.create_task(enter("cancelled"))
+        waiting = asyncio.create_task(enter("waiting"))
+        await asyncio.sleep(0.01)
+        cancelled.cancel()
+        await asyncio.wait_for(asyncio.gather(holder, waiting), timeout=1)
+        return entered
+
+    assert asyncio.run(run()) == ["waiting"]
+    with limit:
+        pass
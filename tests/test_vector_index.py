@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from VectorIndex import ExactIndex, IVFIndex, VectorIndex, load_index
+
+
+def unit_vectors(n, dim=16, seed=0):
+    vectors = np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def test_vector_index_is_abstract():
+    with pytest.raises(TypeError):
+        VectorIndex()
+
+
+def test_ivf_retrains_as_it_grows():
+    index = IVFIndex(nlist=8, train_size=1024)
+    index.add(unit_vectors(32))
+    assert index.is_trained and index.trained_on == 32
+    index.add(unit_vectors(64, seed=1))
+    assert index.trained_on == 32
+    index.add(unit_vectors(64, seed=2))
+    assert index.trained_on == 160
+    index.add(unit_vectors(4000, seed=3))
+    assert index.trained_on == 4160
+    index.add(unit_vectors(20000, seed=4))
+    # Fit on a full train_size sample: no more retraining
+    assert index.trained_on == 4160
+    assert len(np.concatenate(index._assignment_chunks)) == len(index)
+
+
+def test_explicit_training_is_kept():
+    index = IVFIndex(nlist=8, train_size=512)
+    index.train(unit_vectors(512))
+    centroids = index.centroids
+    index.add(unit_vectors(5000, seed=1))
+    assert index.centroids is centroids
+
+
+def test_full_probe_matches_exact_search(tmp_path):
+    data = unit_vectors(2000)
+    exact = ExactIndex()
+    exact.add(data)
+    index = IVFIndex(nlist=16, nprobe=16)
+    index.add(data[:100])
+    index.add(data[100:])
+    queries = unit_vectors(20, seed=5)
+    assert np.array_equal(index.search(queries, 5)[0], exact.search(queries, 5)[0])
+    index.save(tmp_path / "ivf.npz")
+    loaded = load_index(tmp_path / "ivf.npz")
+    assert loaded.trained_on == index.trained_on
+    assert np.array_equal(loaded.search(queries, 5)[0], exact.search(queries, 5)[0])